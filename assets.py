@@ -0,0 +1,400 @@
+"""Self-hosted, fingerprinted front-end bundles.
+
+`flask assets build` replaces the CDN tags in `base.html` with three files
+under `static/dist/`:
+
+- `css/site.<hash>.css`: the vendor stylesheets (Font Awesome purged of
+  icons no template uses, DM Sans, AOS, Locomotive Scroll),
+  `static/src/site.css`, and Tailwind compiled and purged from the
+  templates by the Tailwind CLI (TAILWIND_CMD), all minified. Fonts the
+  stylesheets reference are copied next to it.
+- `js/site.<hash>.js`: AOS, GSAP, ScrollTrigger, Locomotive Scroll and
+  `static/src/site.js`, loaded with `defer`.
+- `js/globe.<hash>.js`: three.js and Vanta, fetched by site.js only on
+  pages that show the globe.
+
+Vendor files are downloaded once from the pinned URLs in VENDOR into
+ASSETS_VENDOR_DIR (instance/vendor by default), so later builds work
+offline. Names map to files through `static/dist/manifest.json`; the
+`static_asset()` template helper resolves them, and `/static/dist/` is
+served with a one-year immutable Cache-Control. Until a build exists,
+`static_asset()` returns None and `base.html` falls back to the CDNs.
+"""
+import hashlib
+import json
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+import urllib.request
+from urllib.parse import urljoin, urlsplit
+
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+
+from compression import compress_static, send_precompressed
+
+RELOAD_INTERVAL = 5
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Google Fonts picks the font format from the User-Agent; ask for woff2.
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+VENDOR = {
+    'font-awesome.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.2/css/all.min.css',
+    'dm-sans.css': 'https://fonts.googleapis.com/css2?family=DM+Sans:wght@400;500;700&display=swap',
+    'aos.css': 'https://unpkg.com/aos@2.3.1/dist/aos.css',
+    'locomotive-scroll.css': 'https://cdnjs.cloudflare.com/ajax/libs/locomotive-scroll/4.1.4/locomotive-scroll.min.css',
+    'aos.js': 'https://unpkg.com/aos@2.3.1/dist/aos.js',
+    'gsap.js': 'https://cdnjs.cloudflare.com/ajax/libs/gsap/3.12.2/gsap.min.js',
+    'ScrollTrigger.js': 'https://cdnjs.cloudflare.com/ajax/libs/gsap/3.12.2/ScrollTrigger.min.js',
+    'locomotive-scroll.js': 'https://cdnjs.cloudflare.com/ajax/libs/locomotive-scroll/4.1.4/locomotive-scroll.min.js',
+    'three.js': 'https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js',
+    'vanta.globe.js': 'https://cdn.jsdelivr.net/npm/vanta@0.5.24/dist/vanta.globe.min.js',
+}
+
+# Bundle name -> sources, in load order. `vendor:` entries come from
+# VENDOR, `tailwind` is the Tailwind CLI output, anything else is a path
+# under static/. Tailwind goes last, as the Play CDN script used to inject
+# its styles after every other stylesheet.
+BUNDLES = {
+    'css/site.css': ['vendor:font-awesome.css', 'vendor:dm-sans.css', 'vendor:aos.css',
+                     'vendor:locomotive-scroll.css', 'src/site.css', 'tailwind'],
+    'js/site.js': ['vendor:aos.js', 'vendor:gsap.js', 'vendor:ScrollTrigger.js', 'vendor:locomotive-scroll.js',
+                   'src/site.js'],
+    'js/globe.js': ['vendor:three.js', 'vendor:vanta.globe.js'],
+}
+# Vendor stylesheets purged of rules for unused classes. AOS and Locomotive
+# Scroll are left whole: their scripts add classes the templates never
+# mention.
+PURGED = {'font-awesome.css'}
+# Files scanned for class names when purging (Tailwind reads the same
+# globs from tailwind.config.js).
+CONTENT_DIRS = [('templates', '.html'), (os.path.join('static', 'src'), '.js')]
+
+
+class BuildError(Exception):
+    pass
+
+
+def dist_folder(app):
+    return os.path.join(app.static_folder, 'dist')
+
+
+def vendor_folder(app):
+    return app.config.get('ASSETS_VENDOR_DIR') or os.path.join(app.instance_path, 'vendor')
+
+
+def fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+# --- Vendor files ---
+
+def fetch(url, path, offline=False):
+    """Return the bytes of `url`, downloading them to `path` the first time."""
+    if not os.path.exists(path):
+        if offline:
+            raise BuildError(f'{url} is not in the vendor cache ({path}); run the build once with network access')
+        request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                _write(path, response.read())
+        except OSError as e:
+            raise BuildError(f'Could not download {url}: {e}') from e
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _cached_name(url):
+    # Referenced files (fonts) are cached under a name unique to their URL.
+    return f'{hashlib.sha1(url.encode()).hexdigest()[:10]}-{os.path.basename(urlsplit(url).path)}'
+
+
+# --- CSS ---
+
+def used_tokens(root):
+    """Every class-like token in the templates and site scripts."""
+    tokens = set()
+    for folder, ext in CONTENT_DIRS:
+        for dirpath, _, files in os.walk(os.path.join(root, folder)):
+            for name in files:
+                if name.endswith(ext):
+                    with open(os.path.join(dirpath, name), encoding='utf-8-sig') as f:
+                        tokens.update(re.findall(r'[^\s"\'`<>=(){}]+', f.read()))
+    return tokens
+
+
+def _css_string(value):
+    # Non-ASCII characters (e.g. Font Awesome's private-use "\f09b" icons)
+    # are escaped, so the stylesheet doesn't depend on being read as UTF-8.
+    out = []
+    for char in value:
+        if char in '"\\':
+            out.append('\\' + char)
+        elif char == '\n' or ord(char) > 126:
+            out.append(f'\\{ord(char):x} ')
+        else:
+            out.append(char)
+    return f'"{"".join(out)}"'
+
+
+def _compact(tokens, url=None):
+    """Serialize tinycss2 nodes with comments dropped and whitespace collapsed."""
+    out = []
+    for token in tokens:
+        if token.type == 'comment':
+            continue
+        if token.type == 'whitespace':
+            out.append(' ')
+        elif token.type == 'url' and url:
+            out.append(f'url({url(token.value)})')
+        elif token.type == 'function':
+            if token.lower_name == 'url' and url:
+                target = ''.join(t.value for t in token.arguments if t.type == 'string')
+                out.append(f'url({url(target)})')
+            else:
+                out.append(f'{token.name}({_compact(token.arguments, url)})')
+        elif token.type == 'string':
+            out.append(_css_string(token.value))
+        elif token.type in ('() block', '[] block', '{} block'):
+            left, right = token.type[:2]
+            out.append(f'{left}{_compact(token.content, url)}{right}')
+        else:
+            out.append(token.serialize())
+    return re.sub(r'\s+', ' ', ''.join(out)).strip()
+
+
+def _selectors(prelude, used):
+    """The comma-separated selectors of `prelude` whose classes are all used."""
+    selectors, current = [], []
+    for token in [*prelude, None]:
+        if token is None or (token.type == 'literal' and token.value == ','):
+            selectors.append(current)
+            current = []
+        else:
+            current.append(token)
+    kept = []
+    for selector in selectors:
+        classes = {b.value for a, b in zip(selector, selector[1:])
+                   if a.type == 'literal' and a.value == '.' and b.type == 'ident'}
+        if used is None or classes <= used:
+            kept.append(_compact(selector))
+    return [selector for selector in kept if selector]
+
+
+def _declarations(content, url):
+    import tinycss2
+
+    parts = []
+    for declaration in tinycss2.parse_declaration_list(content, skip_comments=True, skip_whitespace=True):
+        if declaration.type == 'declaration':
+            important = '!important' if declaration.important else ''
+            parts.append(f'{declaration.name}:{_compact(declaration.value, url)}{important}')
+    return ';'.join(parts)
+
+
+def _rules(rules, used, url):
+    import tinycss2
+
+    out = []
+    for rule in rules:
+        if rule.type == 'qualified-rule':
+            selectors = _selectors(rule.prelude, used)
+            if selectors:
+                out.append(f'{",".join(selectors)}{{{_declarations(rule.content, url)}}}')
+        elif rule.type == 'at-rule':
+            keyword, prelude = rule.lower_at_keyword, _compact(rule.prelude)
+            head = f'@{keyword} {prelude}' if prelude else f'@{keyword}'
+            if rule.content is None:
+                if keyword != 'charset':
+                    out.append(f'{head};')
+            elif keyword in ('media', 'supports', 'layer', 'container'):
+                inner = _rules(tinycss2.parse_rule_list(rule.content, skip_comments=True, skip_whitespace=True),
+                               used, url)
+                if inner:
+                    out.append(f'{head}{{{inner}}}')
+            elif keyword.endswith('keyframes'):
+                inner = _rules(tinycss2.parse_rule_list(rule.content, skip_comments=True, skip_whitespace=True),
+                               None, url)
+                out.append(f'{head}{{{inner}}}')
+            else:  # font-face, page, property, ...
+                out.append(f'{head}{{{_declarations(rule.content, url)}}}')
+    return ''.join(out)
+
+
+def minify_css(css, used=None, url=None):
+    """Minify `css`, dropping rules for classes outside `used` (None keeps all).
+
+    Args:
+        css: Stylesheet source
+        used: Set of class names to keep, or None to keep every rule
+        url: Callable mapping each url() target to its replacement
+    """
+    import tinycss2
+
+    return _rules(tinycss2.parse_stylesheet(css, skip_comments=True, skip_whitespace=True), used, url)
+
+
+def tailwind(app):
+    """Compile Tailwind with the CLI, purged against tailwind.config.js content."""
+    cmd = shlex.split(app.config.get('TAILWIND_CMD') or 'tailwindcss')
+    args = [*cmd, '-c', 'tailwind.config.js', '-i', os.path.join('static', 'src', 'tailwind.css'), '--minify']
+    try:
+        result = subprocess.run(args, cwd=app.root_path, capture_output=True, check=True, timeout=300)
+    except FileNotFoundError as e:
+        raise BuildError(f'{cmd[0]} not found: install the Tailwind standalone CLI or set TAILWIND_CMD '
+                         f'(e.g. "npx tailwindcss@3")') from e
+    except subprocess.CalledProcessError as e:
+        raise BuildError(f'Tailwind failed: {e.stderr.decode(errors="replace")}') from e
+    return result.stdout.decode('utf-8')
+
+
+# --- Build ---
+
+def build(app, offline=False):
+    """Build every bundle into static/dist and write its manifest.
+
+    Returns:
+        The manifest: {'assets': {bundle name: dist path}, 'files': [...]}
+    """
+    dist, vendor = dist_folder(app), vendor_folder(app)
+    used = used_tokens(app.root_path)
+    assets, files = {}, []
+
+    def emit(name, data):
+        path = fingerprint(name, data)
+        _write(os.path.join(dist, path), data)
+        files.append(path)
+        return path
+
+    def vendor_url(source_url):
+        def resolve(target):
+            if target.startswith('data:'):
+                return target
+            absolute = urljoin(source_url, target)
+            data = fetch(absolute, os.path.join(vendor, 'files', _cached_name(absolute)), offline)
+            # Bundles live in dist/css and dist/js, referenced files in dist/files.
+            return '../' + emit(f'files/{os.path.basename(urlsplit(absolute).path)}', data)
+        return resolve
+
+    for bundle, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            if source == 'tailwind':
+                parts.append(tailwind(app))
+            elif source.startswith('vendor:'):
+                name = source[len('vendor:'):]
+                data = fetch(VENDOR[name], os.path.join(vendor, name), offline).decode('utf-8')
+                if bundle.endswith('.css'):
+                    data = minify_css(data, used if name in PURGED else None, vendor_url(VENDOR[name]))
+                parts.append(data)
+            else:
+                with open(os.path.join(app.static_folder, source), encoding='utf-8') as f:
+                    data = f.read()
+                parts.append(minify_css(data) if bundle.endswith('.css') else data)
+        separator = '\n' if bundle.endswith('.css') else '\n;\n'
+        assets[bundle] = emit(bundle, separator.join(parts).encode('utf-8'))
+
+    manifest = {'assets': assets, 'files': sorted(set(files))}
+    _prune(dist, manifest)
+    _write(os.path.join(dist, 'manifest.json'), json.dumps(manifest, indent=2).encode('utf-8'))
+    compress_static(dist, app.config.get('COMPRESS_MIN_SIZE', 1024))
+    return manifest
+
+
+def _prune(dist, manifest):
+    # Keep the previous build's files too: pages rendered before a deploy
+    # (and cached at the edge) still reference them.
+    keep = set(manifest['files'])
+    previous = read_manifest(os.path.join(dist, 'manifest.json'))
+    if previous:
+        keep.update(previous.get('files', ()))
+    for dirpath, _, names in os.walk(dist):
+        for name in names:
+            path = os.path.relpath(os.path.join(dirpath, name), dist).replace(os.sep, '/')
+            source = re.sub(r'\.(gz|br)$', '', path)
+            if source != 'manifest.json' and source not in keep:
+                os.remove(os.path.join(dirpath, name))
+
+
+# --- Serving ---
+
+def read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ManifestCache:
+    """Per-process copy of the manifest, reloaded when a build replaces it."""
+
+    def __init__(self, path):
+        self.path = path
+        self._assets = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_INTERVAL:
+            return self._assets
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                self._assets, self._mtime = {}, None
+                return self._assets
+            if mtime != self._mtime:
+                manifest = read_manifest(self.path) or {}
+                self._assets, self._mtime = manifest.get('assets', {}), mtime
+            return self._assets
+
+
+def static_asset(name):
+    """URL of the built bundle `name` (e.g. 'css/site.css'), or None before a build."""
+    path = current_app.extensions['assets'].get().get(name)
+    return url_for('assets', filename=path) if path else None
+
+
+def send_asset(filename):
+    # Names are content hashes, so a file never changes under its URL.
+    return send_precompressed(dist_folder(current_app), filename, IMMUTABLE_MAX_AGE)
+
+
+def init_assets(app):
+    app.extensions['assets'] = ManifestCache(os.path.join(dist_folder(app), 'manifest.json'))
+    app.add_url_rule('/static/dist/<path:filename>', endpoint='assets', view_func=send_asset)
+    app.add_template_global(static_asset)
+
+
+assets_cli = AppGroup('assets', help='Front-end asset commands.')
+
+
+@assets_cli.command('build')
+@click.option('--offline', is_flag=True, help='Fail instead of downloading vendor files missing from the cache.')
+def build_command(offline):
+    """Build the purged, fingerprinted CSS/JS bundles into static/dist."""
+    try:
+        manifest = build(current_app, offline=offline)
+    except BuildError as e:
+        raise click.ClickException(str(e))
+    dist = dist_folder(current_app)
+    for name, path in manifest['assets'].items():
+        click.echo(f'{name} -> dist/{path} ({os.path.getsize(os.path.join(dist, path))} bytes)')
+    click.echo(f"{len(manifest['files'])} files in {dist}")
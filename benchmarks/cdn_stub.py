@@ -0,0 +1,78 @@
+"""Local stand-in for a CDN purge API.
+
+Records every purge request sent by `cache_policy.HTTPPurger` and prints
+its surrogate keys, so purge hooks can be checked without a real CDN:
+
+    python benchmarks/cdn_stub.py --port 8765 &
+    CDN_PURGE_URL=http://127.0.0.1:8765/purge flask run
+    # edit a post in /admin, then:
+    curl http://127.0.0.1:8765/purges
+
+`GET /purges` returns the recorded purges as JSON; `DELETE /purges`
+clears them.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_lock = threading.Lock()
+purges = []
+
+
+class PurgeHandler(BaseHTTPRequestHandler):
+    def _reply(self, status, body=None):
+        data = json.dumps(body if body is not None else {}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        keys = self.headers.get('Surrogate-Key', '').split()
+        with _lock:
+            purges.append({'path': self.path, 'keys': keys, 'body': body.decode('utf-8', 'replace'),
+                           'token': self.headers.get('Fastly-Key')})
+        print(f'PURGE {self.path}: {" ".join(keys)}', flush=True)
+        self._reply(200, {'status': 'ok'})
+
+    def do_GET(self):
+        if self.path != '/purges':
+            return self._reply(404)
+        with _lock:
+            self._reply(200, list(purges))
+
+    def do_DELETE(self):
+        with _lock:
+            purges.clear()
+        self._reply(200)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=8765, host='127.0.0.1'):
+    """Start the stand-in in a background thread and return the server."""
+    server = ThreadingHTTPServer((host, port), PurgeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    server = ThreadingHTTPServer((args.host, args.port), PurgeHandler)
+    print(f'CDN purge stand-in on http://{args.host}:{args.port}/purge', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Bytes saved and CPU cost of response compression.
+
+Renders the public pages and feeds through the test client, then times
+gzip (and Brotli, when installed) at the per-request levels used by
+`compression.compress_response` and at the maximum levels used for
+precompressed documents and `flask static compress`. CPU time is process
+time, so it is not inflated by other load on the machine.
+
+Usage:
+    python benchmarks/compression.py [--repeat 50] [--paths / /blog /sitemap.xml]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_PATHS = ['/', '/blog', '/portfolio', '/search/?q=zoho', '/sitemap.xml', '/feed.xml', '/atom.xml']
+
+
+def cpu_ms(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = fn()
+    return (time.process_time() - start) * 1000 / repeat, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    import compression
+
+    app = create_app(migrations=False)
+    app.logger.setLevel('ERROR')
+    client = app.test_client()
+
+    levels = [('gzip', None), ('gzip', 9)]
+    if compression.brotli:
+        levels += [('br', None), ('br', 11)]
+    else:
+        print('Brotli not installed (pip install Brotli); gzip only.\n')
+
+    with app.app_context():
+        config_levels = {'gzip': app.config['COMPRESS_LEVEL'], 'br': app.config['COMPRESS_BR_QUALITY']}
+        names = [f'{encoding}-{config_levels[encoding] if level is None else level}' for encoding, level in levels]
+        print(f'{"path":<20}{"bytes":>9}' + ''.join(f'{name:>20}' for name in names))
+        totals = [0, [0] * len(levels), [0.0] * len(levels)]
+        for path in args.paths:
+            response = client.get(path)  # no Accept-Encoding: identity body
+            data = response.get_data()
+            if response.status_code != 200:
+                print(f'{path:<20}  HTTP {response.status_code}, skipped')
+                continue
+            row = f'{path:<20}{len(data):>9}'
+            totals[0] += len(data)
+            for i, (encoding, level) in enumerate(levels):
+                ms, encoded = cpu_ms(lambda: compression.compress(data, encoding, level), args.repeat)
+                totals[1][i] += len(encoded)
+                totals[2][i] += ms
+                row += f'{len(encoded):>9} {ms:>6.2f} ms '
+            print(row)
+
+        print(f'\n{"total":<20}{totals[0]:>9}'
+              + ''.join(f'{size:>9} {ms:>6.2f} ms ' for size, ms in zip(totals[1], totals[2])))
+        for name, size, ms in zip(names, totals[1], totals[2]):
+            saved = totals[0] - size
+            print(f'{name}: saves {saved} bytes ({saved / max(totals[0], 1):.0%}) for {ms:.2f} ms CPU '
+                  f'across {len(args.paths)} requests')
+
+        # What a cache hit costs instead: picking a stored variant.
+        body = compression.CompressedBody(data)
+        with app.test_request_context('/', headers={'Accept-Encoding': 'gzip, br'}):
+            ms, _ = cpu_ms(lambda: compression.precompressed_response(body, 'application/xml'), args.repeat)
+        print(f'\nPrecompressed hit ({args.paths[-1]}): {ms:.3f} ms CPU per request')
+
+        static_bytes = static_encoded = 0
+        for root, _, files in os.walk(app.static_folder):
+            for name in files:
+                path = os.path.join(root, name)
+                if os.path.splitext(name)[1].lower() in compression.STATIC_EXTENSIONS:
+                    with open(path, 'rb') as f:
+                        content = f.read()
+                    static_bytes += len(content)
+                    static_encoded += min(len(content), len(compression.compress(content, 'gzip', 9)))
+        print(f'Static text assets: {static_bytes} bytes, {static_encoded} bytes with gzip-9 siblings')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
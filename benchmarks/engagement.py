@@ -0,0 +1,100 @@
+"""Like/rating write throughput: one commit per event vs the buffered ingest.
+
+Copies the bundled database to a temporary directory and has --threads
+threads submit --events likes+ratings each, first committing an ORM
+Like and Rating per submission (the old view code), then through
+`engagement.record()`. Reports submissions per second until every event
+is in the database, and how long a submitting thread waited at worst.
+Nothing is written to instance/.
+
+Usage:
+    python benchmarks/engagement.py [--threads 8] [--events 250]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run(app, threads, events, submit):
+    worst = [0.0]
+
+    def worker():
+        with app.test_request_context():
+            for _ in range(events):
+                start = time.perf_counter()
+                submit()
+                worst[0] = max(worst[0], time.perf_counter() - start)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    ingest = app.extensions['engagement']
+    while ingest.pending or ingest.flushing:
+        time.sleep(0.005)
+    return time.perf_counter() - start, worst[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--events', type=int, default=250)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.TemporaryDirectory()
+    database = os.path.join(tmpdir.name, 'site.db')
+    shutil.copy(os.path.join(ROOT, 'instance', 'site.db'), database)
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{database}',
+        'CONTENT_STAMP_PATH': os.path.join(tmpdir.name, 'content.stamp'),
+        'SKILL_ANALYTICS_PATH': os.path.join(tmpdir.name, 'skill_analytics.json'),
+        'RELATED_INDEX_PATH': os.path.join(tmpdir.name, 'related.joblib'),
+        'ENGAGEMENT_SPOOL_DIR': os.path.join(tmpdir.name, 'engagement'),
+    })
+
+    from flask_migrate import upgrade
+
+    import engagement
+    from app import create_app
+    from extension import db
+    from model import BlogPost, Like, Rating
+
+    app = create_app()
+    app.logger.setLevel('ERROR')
+    with app.app_context():
+        upgrade()
+        post_id = db.session.scalars(db.select(BlogPost.id)).first()
+
+    def commit_each():
+        db.session.add(Like(post_id=post_id, liker_key=uuid.uuid4().hex))
+        db.session.add(Rating(post_id=post_id, score=5))
+        db.session.commit()
+
+    def buffered():
+        # A distinct guest per submission, so no like is deduplicated.
+        engagement.record('blog', post_id, like=True, rating=5, guest_email=f'{uuid.uuid4().hex}@example.com')
+
+    total = args.threads * args.events
+    print(f'{args.threads} threads x {args.events} submissions (a like and a rating each)\n')
+    try:
+        for name, submit in (('commit per event', commit_each), ('buffered ingest', buffered)):
+            elapsed, worst = run(app, args.threads, args.events, submit)
+            print(f'{name:<18}{total / elapsed:>9.0f} submissions/s   worst wait {worst * 1000:>7.1f} ms')
+    finally:
+        app.extensions['engagement'].close()
+        tmpdir.cleanup()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
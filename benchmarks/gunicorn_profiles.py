@@ -0,0 +1,139 @@
+"""Memory-per-worker and throughput benchmark for the gunicorn profiles.
+
+Starts gunicorn with ``gunicorn.conf.py`` once per profile, drives it with
+a fixed number of concurrent clients for a fixed duration, then reports
+requests/second together with RSS and PSS (proportional set size, i.e.
+memory with shared pages divided between the processes sharing them) for
+every worker. Linux only: memory is read from /proc/<pid>/smaps_rollup.
+
+Usage:
+    python benchmarks/gunicorn_profiles.py [--profiles gthread sync]
+        [--workers 2] [--clients 16] [--duration 10]
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_PATHS = ['/', '/blog', '/portfolio', '/image/blog/1', '/image/project/1']
+
+# Talk to the local server directly, never through an HTTP(S)_PROXY.
+opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            opener.open(url, timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'Server at {url} did not come up within {timeout}s')
+
+
+def children(pid):
+    """Return the pids of the direct children of `pid`."""
+    pids = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            pids.extend(int(p) for p in f.read().split())
+    return pids
+
+
+def memory_kb(pid):
+    """Return (rss_kb, pss_kb) for `pid`."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:'):
+                values[parts[0]] = int(parts[1])
+    return values.get('Rss:', 0), values.get('Pss:', 0)
+
+
+def drive(base_url, paths, clients, duration):
+    """Hit `paths` round-robin from `clients` threads for `duration` seconds."""
+    counts = [0] * clients
+    errors = [0] * clients
+    stop = time.monotonic() + duration
+
+    def client(index):
+        i = index
+        while time.monotonic() < stop:
+            try:
+                opener.open(base_url + paths[i % len(paths)], timeout=10).read()
+                counts[index] += 1
+            except Exception:
+                errors[index] += 1
+            i += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts), sum(errors)
+
+
+def run_profile(profile, workers, clients, duration, paths):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_PROFILE=profile, WEB_CONCURRENCY=str(workers),
+               PORT=str(port), GUNICORN_LOG_LEVEL='warning')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', os.devnull],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_until_up(base_url + '/')
+        # Warm every worker before measuring so imports/caches are counted.
+        drive(base_url, paths, clients, 1)
+        requests, errors = drive(base_url, paths, clients, duration)
+        worker_memory = [memory_kb(pid) for pid in children(proc.pid)]
+        master_memory = memory_kb(proc.pid)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+    return {
+        'profile': profile,
+        'rps': requests / duration,
+        'errors': errors,
+        'master': master_memory,
+        'workers': worker_memory,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', default=['gthread', 'sync'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--paths', nargs='+', default=DEFAULT_PATHS)
+    args = parser.parse_args(argv)
+
+    print(f'{"profile":<10}{"req/s":>10}{"errors":>8}{"worker RSS MiB":>16}{"worker PSS MiB":>16}{"master RSS MiB":>16}')
+    for profile in args.profiles:
+        result = run_profile(profile, args.workers, args.clients, args.duration, args.paths)
+        workers = result['workers'] or [(0, 0)]
+        rss = sum(m[0] for m in workers) / len(workers) / 1024
+        pss = sum(m[1] for m in workers) / len(workers) / 1024
+        print(f'{profile:<10}{result["rps"]:>10.1f}{result["errors"]:>8}{rss:>16.1f}{pss:>16.1f}'
+              f'{result["master"][0] / 1024:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
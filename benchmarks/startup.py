@@ -0,0 +1,90 @@
+"""Cold-start benchmark for the WSGI entrypoint.
+
+Runs ``python -X importtime -c "import wsgi"`` in a fresh interpreter,
+parses the import-time report and fails (exit code 1) when the total
+cumulative import time exceeds the budget or when a module that should
+be imported lazily shows up at startup.
+
+Usage:
+    python benchmarks/startup.py [--budget-ms 600] [--runs 3] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be imported while building the app. They are
+# only needed by specific requests (image processing, sanitizing) or by
+# CLI commands (migrations), and are imported where they are used.
+LAZY_MODULES = ['PIL', 'bleach', 'slugify', 'alembic', 'flask_migrate', 'numpy', 'scipy', 'sklearn', 'joblib', 'pandas', 'torch']
+
+DEFAULT_BUDGET_MS = 600
+
+
+def run_importtime(target='wsgi'):
+    """Import `target` in a fresh interpreter and return the parsed report.
+
+    Returns:
+        list of (self_us, cumulative_us, depth, module) tuples in import order
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'Importing {target} failed:\n{proc.stderr[-2000:]}')
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def total_ms(rows):
+    """Sum the cumulative time of the top-level imports, in milliseconds."""
+    return sum(cumulative for _, cumulative, depth, _ in rows if depth == 0) / 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.environ.get('STARTUP_BUDGET_MS', DEFAULT_BUDGET_MS)))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--target', default='wsgi')
+    args = parser.parse_args(argv)
+
+    # The first run warms the bytecode cache; report the best of the rest
+    # so the number reflects a worker boot rather than a fresh checkout.
+    runs = [run_importtime(args.target) for _ in range(max(args.runs, 1) + 1)][1:]
+    rows = min(runs, key=total_ms)
+    elapsed = total_ms(rows)
+
+    print(f'Cold start ({args.target}): {elapsed:.1f} ms '
+          f'(best of {len(runs)}, budget {args.budget_ms:.0f} ms)')
+    print(f'\nTop {args.top} imports by cumulative time:')
+    for self_us, cumulative_us, depth, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f'  {cumulative_us / 1000:8.1f} ms  {"  " * depth}{name}')
+
+    failures = []
+    imported = {name for _, _, _, name in rows}
+    eager = [m for m in LAZY_MODULES if m in imported]
+    if eager:
+        failures.append(f'modules imported eagerly at startup: {", ".join(eager)}')
+    if elapsed > args.budget_ms:
+        failures.append(f'startup took {elapsed:.1f} ms, over the {args.budget_ms:.0f} ms budget')
+
+    for failure in failures:
+        print(f'FAIL: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Time to first byte of long post pages, buffered vs streamed.
+
+Copies the bundled database to a temporary directory, adds a long blog
+post (--paragraphs of HTML content, --comments comments), serves the app
+with a threaded Werkzeug server and requests the post repeatedly with
+STREAM_TEMPLATES off and on, timing the first body byte and the full
+response. Nothing is written to instance/.
+
+Usage:
+    python benchmarks/streaming.py [--paragraphs 2000] [--comments 500] [--repeat 20]
+"""
+import argparse
+import http.client
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SLUG = 'streaming-benchmark-post'
+
+
+def seed(paragraphs, comments):
+    from extension import db
+    from model import BlogPost, Comment
+
+    paragraph = ('<p>Zoho Creator, Deluge and Python automation notes: connectors, webhooks, '
+                 'scheduled functions and the odd <code>invokeurl</code> call. ' * 4) + '</p>\n'
+    post = BlogPost(title='Streaming benchmark post', slug=SLUG, content=paragraph * paragraphs)
+    db.session.add(post)
+    db.session.flush()
+    db.session.add_all(Comment(content=f'Comment {i}: thanks, this saved me an afternoon.',
+                               guest_name=f'Reader {i}', post_id=post.id) for i in range(comments))
+    db.session.commit()
+
+
+def fetch(port, path):
+    """Return (ms to first body byte, ms to last byte, body bytes)."""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    connection.request('GET', path)
+    response = connection.getresponse()
+    first = response.read1(1)
+    ttfb = time.perf_counter() - start
+    size = len(first) + len(response.read())
+    total = time.perf_counter() - start
+    connection.close()
+    return ttfb * 1000, total * 1000, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--paragraphs', type=int, default=2000)
+    parser.add_argument('--comments', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.TemporaryDirectory()
+    database = os.path.join(tmpdir.name, 'site.db')
+    shutil.copy(os.path.join(ROOT, 'instance', 'site.db'), database)
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{database}',
+        'CONTENT_STAMP_PATH': os.path.join(tmpdir.name, 'content.stamp'),
+        'SKILL_ANALYTICS_PATH': os.path.join(tmpdir.name, 'skill_analytics.json'),
+        'RELATED_INDEX_PATH': os.path.join(tmpdir.name, 'related.joblib'),
+    })
+
+    from flask_migrate import upgrade
+    from werkzeug.serving import make_server
+
+    from app import create_app
+
+    app = create_app()
+    app.logger.setLevel('ERROR')
+    with app.app_context():
+        upgrade()
+        seed(args.paragraphs, args.comments)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    path = f'/blog/{SLUG}'
+    try:
+        print(f'{args.paragraphs} paragraphs, {args.comments} comments, {args.repeat} requests per mode\n')
+        print(f'{"mode":<10}{"bytes":>10}{"TTFB p50":>12}{"TTFB p95":>12}{"total p50":>12}')
+        for streamed in (False, True):
+            app.config['STREAM_TEMPLATES'] = streamed
+            fetch(server.port, path)  # warm up templates and connections
+            samples = [fetch(server.port, path) for _ in range(args.repeat)]
+            ttfb = sorted(sample[0] for sample in samples)
+            total = [sample[1] for sample in samples]
+            print(f'{"streamed" if streamed else "buffered":<10}{samples[0][2]:>10}'
+                  f'{statistics.median(ttfb):>9.1f} ms{ttfb[int(len(ttfb) * 0.95) - 1]:>9.1f} ms'
+                  f'{statistics.median(total):>9.1f} ms')
+    finally:
+        server.shutdown()
+        tmpdir.cleanup()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
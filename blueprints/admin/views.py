@@ -1,10 +1,12 @@
 from flask import Blueprint, render_template, flash, redirect, url_for, request, jsonify, current_app
 from flask_login import login_required, current_user
-from model import BlogPost, Project, User, UploadedImage, Skill, SubSkill, Comment, Rating, Like
+from model import BlogPost, Project, User, UploadedImage, Skill, SubSkill, Comment
 from form import BlogPostForm, ProjectForm, LoginForm, SkillForm, SubSkillForm
 from extension import db
 from utils import save_image_to_db, allowed_file, clean_content
-from slugify import slugify
+import engagement
+import skill_taxonomy
+from rate_limit import rate_limit
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -20,8 +22,7 @@ def dashboard():
         "skills": Skill.query.count(),
         "subskills": SubSkill.query.count(),
         "comments": Comment.query.count(),
-        "ratings": Rating.query.count(),
-        "likes": Like.query.count(),
+        **engagement.totals(),
     }
 
     latest_projects = Project.query.order_by(Project.date_posted.desc()).limit(5).all()
@@ -31,6 +32,16 @@ def dashboard():
                            latest_projects=latest_projects, latest_blogs=latest_blogs)
 
 
+@bp.route('/metrics')
+@login_required
+def metrics():
+    """Runtime metrics for this worker process, as JSON."""
+    from content_cache import metrics as cache_metrics
+    from database import pool_metrics
+    return jsonify({'db_pool': pool_metrics(), 'caches': cache_metrics(),
+                    'misses': current_app.extensions['error_counts'].top()})
+
+
 @bp.route('/')
 @login_required
 def index():
@@ -76,6 +87,8 @@ def manage_subskills():
 @bp.route('/blog/new', methods=['GET', 'POST'])
 @login_required
 def new_blog_post():
+    from slugify import slugify
+
     form = BlogPostForm()
     if form.validate_on_submit():
         image_data = None
@@ -112,6 +125,8 @@ def new_blog_post():
 @bp.route('/blog/<int:post_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_blog_post(post_id):
+    from slugify import slugify
+
     post = db.session.get(BlogPost, post_id)
     if not post:
         flash('Blog post not found.', 'error')
@@ -164,8 +179,9 @@ def delete_blog_post(post_id):
 @bp.route('/project/new', methods=['GET', 'POST'])
 @login_required
 def new_project():
+    from slugify import slugify
+
     form = ProjectForm()
-    skills = SubSkill.query.all()
     if form.validate_on_submit():
         image_data = None
         image_mimetype = None
@@ -203,18 +219,19 @@ def new_project():
         db.session.commit()
         flash('Project created successfully!', 'success')
         return redirect(url_for('portfolio.project_detail', slug=project.slug))
-    return render_template('admin/project_form.html', title='New Project', form=form, legend='New Project', skills=skills)
+    return render_template('admin/project_form.html', title='New Project', form=form, legend='New Project')
 
 @bp.route('/project/<int:project_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_project(project_id):
+    from slugify import slugify
+
     project = db.session.get(Project, project_id)
     if not project:
         flash('Project not found.', 'error')
         return redirect(url_for('admin.manage_projects'))
 
     form = ProjectForm()
-    skills = SubSkill.query.all()
     
     if form.validate_on_submit():
         if form.image.data:
@@ -255,7 +272,7 @@ def edit_project(project_id):
         form.demo_link.data = project.demo_link
         form.case_study_link.data = project.case_study_link
     return render_template('admin/project_form.html', title='Edit Project', form=form, 
-                         legend='Edit Project', current_image_id=project.id, model_name='project', skills=skills)
+                         legend='Edit Project', current_image_id=project.id, model_name='project')
 
 @bp.route('/project/<int:project_id>/delete', methods=['POST'])
 @login_required
@@ -311,7 +328,7 @@ def delete_skill(skill_id):
 @login_required
 def add_subskill():
     form = SubSkillForm()
-    form.skill_id.choices = [(s.id, s.name) for s in Skill.query.all()]
+    form.skill_id.choices = skill_taxonomy.skill_choices()
     if form.validate_on_submit():
         subskill = SubSkill()
         subskill.name = form.name.data
@@ -327,7 +344,7 @@ def add_subskill():
 def edit_subskill(subskill_id):
     subskill = SubSkill.query.get_or_404(subskill_id)
     form = SubSkillForm(obj=subskill)
-    form.skill_id.choices = [(s.id, s.name) for s in Skill.query.all()]
+    form.skill_id.choices = skill_taxonomy.skill_choices()
     if form.validate_on_submit():
         subskill.name = form.name.data
         subskill.skill_id = form.skill_id.data
@@ -393,6 +410,7 @@ def delete_user(user_id):
 
 # --- Image Upload ---
 @bp.route('/upload_image', methods=['POST'])
+@rate_limit('upload')
 @login_required
 def upload_image():
     if 'file' not in request.files:
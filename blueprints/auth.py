@@ -3,10 +3,12 @@ from flask_login import login_user, logout_user, current_user
 from model import User
 from form import LoginForm
 from extension import db
+from rate_limit import rate_limit
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 @bp.route('/login', methods=['GET', 'POST'])
+@rate_limit('login')
 def login():
     current_app.logger.info('Login page accessed')
     
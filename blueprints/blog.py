@@ -1,8 +1,13 @@
 from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app
 from flask_login import current_user
-from model import BlogPost, Comment, Like, Rating
+from model import BlogPost, Comment
 from form import CommentForm
 from extension import db
+import comment_pages
+import engagement
+import related_index
+import streaming
+from rate_limit import rate_limit
 
 bp = Blueprint('blog', __name__, url_prefix='/blog')
 
@@ -13,7 +18,7 @@ def index():
         page = request.args.get('page', 1, type=int)
         current_app.logger.debug(f'Fetching blog posts for page {page}')
         
-        blog_posts = BlogPost.query.order_by(BlogPost.date_posted.desc()).paginate(page=page, per_page=5, error_out=False)
+        blog_posts = BlogPost.query.order_by(BlogPost.date_posted.desc()).paginate(page=page, per_page=current_app.config['BLOG_PER_PAGE'], error_out=False)
         
         current_app.logger.info(f'Successfully retrieved {len(blog_posts.items)} posts for page {page}')
         return render_template('blog/index.html', blog_posts=blog_posts, title='My Blog')
@@ -22,6 +27,7 @@ def index():
         raise
 
 @bp.route('/<string:slug>', methods=["GET", "POST"])
+@rate_limit('feedback')
 def post(slug):
     current_app.logger.info(f'Accessing blog post: {slug}')
     try:
@@ -31,41 +37,40 @@ def post(slug):
         if form.validate_on_submit():
             current_app.logger.info(f'Processing feedback for blog post: {post.title}')
             try:
-                # Handle Like
-                if form.like.data == "true":
-                    like = Like()
-                    like.guest_name = form.guest_name.data if not current_user.is_authenticated else None
-                    like.guest_email = form.guest_email.data if not current_user.is_authenticated else None
-                    like.post_id = post.id
-                    db.session.add(like)
+                guest_name = form.guest_name.data if not current_user.is_authenticated else None
+                guest_email = form.guest_email.data if not current_user.is_authenticated else None
 
-                # Handle Comment & Rating
-                if form.content.data or form.rating.data:
+                # Comments are committed right away...
+                if form.content.data:
                     comment = Comment()
                     comment.content = form.content.data
-                    comment.guest_name = form.guest_name.data if not current_user.is_authenticated else None
-                    comment.guest_email = form.guest_email.data if not current_user.is_authenticated else None
+                    comment.guest_name = guest_name
+                    comment.guest_email = guest_email
                     comment.post_id = post.id
                     db.session.add(comment)
+                    db.session.commit()
 
-                    if form.rating.data:
-                        rating = Rating()
-                        rating.score = form.rating.data
-                        rating.guest_name = form.guest_name.data if not current_user.is_authenticated else None
-                        rating.guest_email = form.guest_email.data if not current_user.is_authenticated else None
-                        rating.post_id = post.id
-                        db.session.add(rating)
-
-                db.session.commit()
-                current_app.logger.info(f'Successfully saved feedback for blog post: {post.title}')
-                flash("Your feedback has been submitted!", "success")
-                return redirect(url_for("blog.post", slug=slug))
+                # ...likes and ratings are queued for the buffered engagement ingest.
+                if engagement.record('blog', post.id, like=form.like.data == "true", rating=form.rating.data,
+                                     guest_name=guest_name, guest_email=guest_email):
+                    current_app.logger.info(f'Successfully saved feedback for blog post: {post.title}')
+                    flash("Your feedback has been submitted!", "success")
+                    return redirect(url_for("blog.post", slug=slug))
+                return engagement.busy_response()
             except Exception as e:
                 db.session.rollback()
                 current_app.logger.error('Error saving feedback:', exc_info=True)
                 flash("There was an error submitting your feedback. Please try again.", "danger")
 
-        return render_template("blog/post.html", post=post, form=form, title=post.title)
+        related = related_index.related_items('blog', post.id)
+        return streaming.render_page("blog/post.html", post=post, form=form, title=post.title, related=related,
+                                     **comment_pages.template_context(post, 'blog.comments', slug=slug))
     except Exception as e:
         current_app.logger.error(f'Error accessing blog post {slug}:', exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+@bp.route('/<string:slug>/comments')
+def comments(slug):
+    """Comments after `?after=<cursor>` as JSON (the post page renders the first page)."""
+    post = BlogPost.query.filter_by(slug=slug).first_or_404()
+    return comment_pages.json_response(post.comments, 'blog.comments', slug=slug)
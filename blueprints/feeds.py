@@ -0,0 +1,62 @@
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+from compression import CompressedBody, precompressed_response
+from extension import db
+import feeds
+
+bp = Blueprint('feeds', __name__)
+
+FEED_TITLE = 'Stephen Awili | Blog'
+FEED_DESCRIPTION = 'Zoho development, Python automation and IT solutions.'
+
+
+def _base_url():
+    """Return (base_url, cacheable) for absolute URLs in the documents.
+
+    SITEMAP_BASE_URL, when set, keeps them independent of the Host header.
+    Otherwise the request's host is used, and the documents are only
+    cached for the hosts listed in SITEMAP_HOSTS, so arbitrary Host
+    headers can't each fill a cache entry.
+    """
+    base_url = current_app.config.get('SITEMAP_BASE_URL')
+    if base_url:
+        return base_url.rstrip('/'), True
+    scheme = current_app.config.get('SITEMAP_URL_SCHEME', 'https')
+    return f'{scheme}://{request.host}', request.host.lower() in current_app.config.get('SITEMAP_HOSTS', ())
+
+
+def _respond(key, build, mimetype, check=None):
+    """Serve `build(connection, base_url)` from the feeds cache, streaming it on a miss."""
+    base_url, cacheable = _base_url()
+    body = feeds.cached((key, base_url), lambda connection: build(connection, base_url), check, store=cacheable)
+    if isinstance(body, CompressedBody):
+        return precompressed_response(body, mimetype)
+    return Response(stream_with_context(body), mimetype=mimetype)
+
+
+@bp.route('/sitemap.xml')
+def sitemap():
+    current_app.logger.info('Serving sitemap')
+    return _respond('sitemap', feeds.sitemap, 'application/xml')
+
+
+@bp.route('/sitemap-<int:shard>.xml')
+def sitemap_shard(shard):
+    def check():
+        # Counted on a cache miss only; hits are served without a query.
+        if shard >= feeds.shard_count(db.session.connection()):
+            abort(404)
+
+    return _respond(('sitemap', shard), lambda connection, base_url: feeds.sitemap(connection, base_url, shard),
+                    'application/xml', check)
+
+
+@bp.route('/feed.xml')
+def rss():
+    return _respond('rss', lambda connection, base_url: feeds.rss(connection, base_url, FEED_TITLE, FEED_DESCRIPTION),
+                    'application/rss+xml')
+
+
+@bp.route('/atom.xml')
+def atom():
+    return _respond('atom', lambda connection, base_url: feeds.atom(connection, base_url, FEED_TITLE),
+                    'application/atom+xml')
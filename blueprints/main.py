@@ -1,9 +1,9 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app
+from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app, jsonify
 from flask_mail import Message
 from model import BlogPost, Project, Skill
-from extension import db
-from flask_mail import Mail
-mail = Mail()
+from extension import db, mail
+import skill_analytics
+import skill_taxonomy
 
 bp = Blueprint('main', __name__)
 
@@ -14,22 +14,18 @@ def home():
     try:
         latest_blogs = BlogPost.query.order_by(BlogPost.date_posted.desc()).limit(3).all()
         latest_projects = Project.query.order_by(Project.id.desc()).limit(3).all()
-        skills = Skill.query.all()
+        skills = skill_taxonomy.skills()
         
-        # get count of skills used in projects
-        from sqlalchemy.orm import aliased
-        from model import SubSkill as SubSkillModel
-        skill_count = db.session.query(
-            Project, Skill.id,
-            db.func.count(Skill.id)
-        ).join(Project.subskills.of_type(SubSkillModel)).group_by(Project.id, Skill.id).all()
+        # Count of projects per skill, maintained by skill_index
+        skill_count = {skill.id: skill.project_count for skill in skills}
         
         current_app.logger.debug(f'Retrieved {len(latest_blogs)} blogs, {len(latest_projects)} projects, {len(skills)} skills')
         return render_template('main/index.html', 
                              latest_blogs=latest_blogs, 
                              latest_projects=latest_projects, 
                              skills=skills, 
-                             skill_used=skill_count)
+                             skill_used=skill_count,
+                             skill_pairs=skill_analytics.top_pairs())
     except Exception as e:
         current_app.logger.error('Error in home page:', exc_info=True)
         raise
@@ -71,6 +67,13 @@ def contact():
         flash("There was an error sending your message. Please try again later.", "danger")
         return redirect(url_for("main.home"))
 
+@bp.route('/csrf-token')
+def csrf_token():
+    """CSRF token for forms on CDN-cached pages; site.js fetches it before submitting."""
+    from flask_wtf.csrf import generate_csrf
+
+    return jsonify(csrf_token=generate_csrf())
+
 # Robots.txt route
 @bp.route('/robots.txt')
 def robots_txt():
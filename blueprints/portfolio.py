@@ -1,8 +1,15 @@
-from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app
+from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app, abort
 from flask_login import current_user
-from model import Project, Skill, SubSkill, Comment, Like, Rating
+from model import Project, Skill, SubSkill, Comment, project_subskill, skill_project
 from form import CommentForm
 from extension import db
+import comment_pages
+import engagement
+import related_index
+import streaming
+import skill_analytics
+import skill_taxonomy
+from rate_limit import rate_limit
 
 bp = Blueprint('portfolio', __name__, url_prefix='/portfolio')
 
@@ -20,11 +27,14 @@ def index():
 def by_skill(skill_id):
     current_app.logger.info(f'Accessing projects by skill ID: {skill_id}')
     try:
-        skill = Skill.query.get_or_404(skill_id)
-        from sqlalchemy.orm import aliased
-        from model import SubSkill as SubSkillModel
-        projects = Project.query.join(Project.subskills.of_type(SubSkillModel)).join(Skill, SubSkillModel.skill_id == Skill.id).filter(Skill.id == skill_id).all()
-        return render_template("portfolio/index.html", projects=projects, filter_type="skill", filter_name=skill.name)
+        skill = skill_taxonomy.get_skill(skill_id)
+        if skill is None:
+            abort(404)
+        # Projects linked via subskills, from the materialized skill index
+        projects = Project.query.join(skill_project, skill_project.c.project_id == Project.id).filter(skill_project.c.skill_id == skill_id).all()
+        related = skill_analytics.related_subskills([subskill.id for subskill in skill.subskills])
+        return render_template("portfolio/index.html", projects=projects, filter_type="skill", filter_name=skill.name,
+                               related_skills=related)
     except Exception as e:
         current_app.logger.error(f'Error retrieving projects for skill {skill_id}:', exc_info=True)
         raise
@@ -33,14 +43,19 @@ def by_skill(skill_id):
 def by_subskill(subskill_id):
     current_app.logger.info(f'Accessing projects by subskill ID: {subskill_id}')
     try:
-        subskill = SubSkill.query.get_or_404(subskill_id)
-        projects = subskill.projects
-        return render_template("portfolio/index.html", projects=projects, filter_type="subskill", filter_name=subskill.name)
+        subskill = skill_taxonomy.get_subskill(subskill_id)
+        if subskill is None:
+            abort(404)
+        projects = Project.query.join(project_subskill, project_subskill.c.project_id == Project.id).filter(project_subskill.c.subskill_id == subskill_id).all()
+        return render_template("portfolio/index.html", projects=projects, filter_type="subskill", filter_name=subskill.name,
+                               related_skills=skill_analytics.related_subskills([subskill_id]),
+                               last_used=skill_analytics.last_used(subskill_id))
     except Exception as e:
         current_app.logger.error(f'Error retrieving projects for subskill {subskill_id}:', exc_info=True)
         raise
 
 @bp.route('/project/<string:slug>', methods=["GET", "POST"])
+@rate_limit('feedback')
 def project_detail(slug):
     current_app.logger.info(f'Accessing project detail: {slug}')
     try:
@@ -50,41 +65,40 @@ def project_detail(slug):
         if form.validate_on_submit():
             current_app.logger.info(f'Processing feedback for project: {project.title}')
             try:
-                # Handle Like
-                if form.like.data == "true":
-                    like = Like()
-                    like.guest_name = form.guest_name.data if not current_user.is_authenticated else None
-                    like.guest_email = form.guest_email.data if not current_user.is_authenticated else None
-                    like.project_id = project.id
-                    db.session.add(like)
+                guest_name = form.guest_name.data if not current_user.is_authenticated else None
+                guest_email = form.guest_email.data if not current_user.is_authenticated else None
 
-                # Handle Comment & Rating
-                if form.content.data or form.rating.data:
+                # Comments are committed right away...
+                if form.content.data:
                     comment = Comment()
                     comment.content = form.content.data
-                    comment.guest_name = form.guest_name.data if not current_user.is_authenticated else None
-                    comment.guest_email = form.guest_email.data if not current_user.is_authenticated else None
+                    comment.guest_name = guest_name
+                    comment.guest_email = guest_email
                     comment.project_id = project.id
                     db.session.add(comment)
+                    db.session.commit()
 
-                    if form.rating.data:
-                        rating = Rating()
-                        rating.score = form.rating.data
-                        rating.guest_name = form.guest_name.data if not current_user.is_authenticated else None
-                        rating.guest_email = form.guest_email.data if not current_user.is_authenticated else None
-                        rating.project_id = project.id
-                        db.session.add(rating)
-
-                db.session.commit()
-                current_app.logger.info(f'Successfully saved feedback for project: {project.title}')
-                flash("Your feedback has been submitted!", "success")
-                return redirect(url_for("portfolio.project_detail", slug=slug))
+                # ...likes and ratings are queued for the buffered engagement ingest.
+                if engagement.record('project', project.id, like=form.like.data == "true", rating=form.rating.data,
+                                     guest_name=guest_name, guest_email=guest_email):
+                    current_app.logger.info(f'Successfully saved feedback for project: {project.title}')
+                    flash("Your feedback has been submitted!", "success")
+                    return redirect(url_for("portfolio.project_detail", slug=slug))
+                return engagement.busy_response()
             except Exception as e:
                 db.session.rollback()
                 current_app.logger.error('Error saving feedback:', exc_info=True)
                 flash("There was an error submitting your feedback. Please try again.", "danger")
 
-        return render_template("portfolio/project_detail.html", project=project, form=form, title=project.title)
+        related = related_index.related_items('project', project.id)
+        return streaming.render_page("portfolio/project_detail.html", project=project, form=form, title=project.title, related=related,
+                                     **comment_pages.template_context(project, 'portfolio.project_comments', slug=slug))
     except Exception as e:
         current_app.logger.error(f'Error accessing project {slug}:', exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+@bp.route('/project/<string:slug>/comments')
+def project_comments(slug):
+    """Comments after `?after=<cursor>` as JSON (the project page renders the first page)."""
+    project = Project.query.filter_by(slug=slug).first_or_404()
+    return comment_pages.json_response(project.comments, 'portfolio.project_comments', slug=slug)
@@ -0,0 +1,22 @@
+from flask import Blueprint, render_template, request, current_app
+from extension import db
+from search_index import search
+
+bp = Blueprint('search', __name__, url_prefix='/search')
+
+PER_PAGE = 10
+
+@bp.route('/')
+def index():
+    query = request.args.get('q', '').strip()
+    after = request.args.get('after')
+    current_app.logger.info(f'Search for: {query!r}')
+    try:
+        results, next_cursor = [], None
+        if query:
+            results, next_cursor = search(db.session.connection(), query, limit=PER_PAGE, after=after)
+        return render_template('search/index.html', query=query, results=results,
+                               next_cursor=next_cursor, title='Search')
+    except Exception as e:
+        current_app.logger.error(f'Error searching for {query!r}:', exc_info=True)
+        raise
@@ -0,0 +1,354 @@
+"""Edge/CDN cache policy: Cache-Control, Surrogate-Key and purging.
+
+`init_cache_policy(app)` installs three pieces:
+
+- An after_request hook that gives endpoints listed in DEFAULT_RULES (or
+  CDN_CACHE_RULES) a public `Cache-Control` with `s-maxage` and
+  `stale-while-revalidate`, plus a `Surrogate-Key` header, but only for
+  anonymous GET/HEAD responses that did not touch per-visitor state (no
+  flashed messages, no CSRF token, no session writes). Post and project
+  pages qualify because their comment form leaves the token out (see
+  `CommentForm.Meta`); site.js fetches it from `/csrf-token` on submit. Every other
+  response is marked `private, no-cache` so no shared cache keeps it.
+- A session interface that never sets the session cookie on those
+  cacheable responses, so a CDN can't store one visitor's cookie and
+  hand it to everybody.
+- Purge hooks: after a commit that changes content, the surrogate keys of
+  the changed entities are passed to the configured purger (CDN_PURGE_URL),
+  so the edge drops exactly the pages that rendered them. The purge
+  request is sent from a background thread, never by the committing
+  request.
+
+Surrogate keys name what a page rendered: `post-<id>`, `project-<id>`,
+`skill-<id>` and `subskill-<id>` are added whenever such a row is loaded
+through the ORM during the request (see `tag()` for Core queries), and
+list pages add collection keys (`posts`, `projects`, `skills`) from their
+rule so they are purged when an item is created or deleted. Every
+cacheable response also carries `site`, to purge everything at once.
+
+The CDN should bypass its cache for requests carrying the session cookie
+(logged-in users); responses already send `Vary: Cookie` when the session
+was read.
+"""
+import atexit
+import json
+import os
+import threading
+import urllib.request
+
+import click
+from flask import current_app, g, has_app_context, has_request_context, request, session
+from flask.cli import AppGroup
+from flask.sessions import SecureCookieSessionInterface
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from model import BlogPost, Comment, Like, Project, Rating, Skill, SubSkill
+
+SITE_KEY = 'site'
+CACHEABLE_STATUSES = {200, 203, 301, 404, 410}
+PRIVATE = 'private, no-cache'
+
+_PAGE = {'s_maxage': 300, 'stale_while_revalidate': 3600}
+_DETAIL = {'s_maxage': 600, 'stale_while_revalidate': 86400}
+_FEED = {'s_maxage': 3600, 'stale_while_revalidate': 86400}
+_ASSET = {'max_age': 3600, 's_maxage': 86400, 'stale_while_revalidate': 604800}
+# Fingerprinted bundles: the URL changes whenever the content does.
+_IMMUTABLE = {'max_age': 31536000, 's_maxage': 31536000, 'immutable': True}
+
+# endpoint -> rule. `max_age` is for browsers (default 0: always
+# revalidate with the edge), `s_maxage`/`stale_while_revalidate` for
+# shared caches, `immutable` tells browsers not to revalidate at all,
+# `keys` are collection keys added to the page.
+DEFAULT_RULES = {
+    'home': dict(_PAGE, keys=('posts', 'projects', 'skills')),
+    'main.home': dict(_PAGE, keys=('posts', 'projects', 'skills')),
+    'about': _PAGE,
+    'main.about': _PAGE,
+    'blog': dict(_PAGE, keys=('posts',)),
+    'blog.index': dict(_PAGE, keys=('posts',)),
+    'blog_post': _DETAIL,
+    'blog.post': _DETAIL,
+    'portfolio': dict(_PAGE, keys=('projects',)),
+    'portfolio.index': dict(_PAGE, keys=('projects',)),
+    'portfolio_by_skill': dict(_PAGE, keys=('projects', 'skills')),
+    'portfolio.by_skill': dict(_PAGE, keys=('projects', 'skills')),
+    'portfolio_by_subskill': dict(_PAGE, keys=('projects', 'skills')),
+    'portfolio.by_subskill': dict(_PAGE, keys=('projects', 'skills')),
+    'project_detail': _DETAIL,
+    'portfolio.project_detail': _DETAIL,
+    'blog.comments': _DETAIL,
+    'portfolio.project_comments': _DETAIL,
+    'search.index': {'s_maxage': 60, 'stale_while_revalidate': 300, 'keys': ('posts', 'projects')},
+    'feeds.sitemap': dict(_FEED, keys=('posts', 'projects')),
+    'feeds.sitemap_shard': dict(_FEED, keys=('posts', 'projects')),
+    'feeds.rss': dict(_FEED, keys=('posts',)),
+    'feeds.atom': dict(_FEED, keys=('posts',)),
+    'get_image': _ASSET,
+    'static': dict(_ASSET, keys=('static',)),
+    'assets': dict(_IMMUTABLE, keys=('static',)),
+    'main.robots_txt': _ASSET,
+}
+
+_ENTITY_KEYS = {BlogPost: 'post', Project: 'project', Skill: 'skill', SubSkill: 'subskill'}
+_COLLECTION_KEYS = {BlogPost: 'posts', Project: 'projects', Skill: 'skills', SubSkill: 'skills'}
+_PURGE_KEY = 'cache_policy_purge'
+
+
+# --- Surrogate keys ---
+
+def tag(*keys):
+    """Add surrogate keys to the current response (no-op outside a request)."""
+    if has_request_context():
+        g.setdefault('surrogate_keys', set()).update(keys)
+
+
+def entity_key(obj):
+    return f'{_ENTITY_KEYS[type(obj)]}-{obj.id}'
+
+
+def _tag_loaded(target, context):
+    tag(entity_key(target))
+
+
+for _model in _ENTITY_KEYS:
+    event.listen(_model, 'load', _tag_loaded)
+
+
+def page_keys(rule):
+    """Surrogate keys of the response being built under `rule`."""
+    return g.get('surrogate_keys', set()) | set((rule or {}).get('keys', ())) | {SITE_KEY}
+
+
+def cache_control(rule):
+    parts = ['public', f"max-age={rule.get('max_age', 0)}", f"s-maxage={rule['s_maxage']}"]
+    if rule.get('stale_while_revalidate'):
+        parts.append(f"stale-while-revalidate={rule['stale_while_revalidate']}")
+    if rule.get('immutable'):
+        parts.append('immutable')
+    return ', '.join(parts)
+
+
+def is_cacheable(response, rule):
+    """Whether `response` to the current request may be stored by shared caches under `rule`."""
+    if rule is None or request.method not in ('GET', 'HEAD'):
+        return False
+    if response.status_code not in CACHEABLE_STATUSES:
+        return False
+    # A view can opt out explicitly; send_file's default `no-cache` is
+    # replaced by the rule.
+    if response.cache_control.private or response.cache_control.no_store:
+        return False
+    # Anything that depends on who is asking must stay out of shared caches.
+    if session.modified or '_flashes' in session or 'csrf_token' in g:
+        return False
+    return not current_user.is_authenticated
+
+
+def apply_policy(response):
+    rule = current_app.config['CDN_CACHE_RULES'].get(request.endpoint)
+    if not is_cacheable(response, rule):
+        g.cdn_cacheable = False
+        if not (response.cache_control.private or response.cache_control.no_store):
+            response.headers['Cache-Control'] = PRIVATE
+        return response
+    g.cdn_cacheable = True
+    response.headers['Cache-Control'] = cache_control(rule)
+    response.headers['Surrogate-Key'] = ' '.join(sorted(page_keys(rule)))
+    response.vary.add('Accept-Encoding')
+    # Cookies set by the view itself would be cached along with the page.
+    response.headers.pop('Set-Cookie', None)
+    return response
+
+
+class CacheAwareSessionInterface(SecureCookieSessionInterface):
+    """Skips the session cookie on responses the edge may cache."""
+
+    def save_session(self, app, session, response):
+        if g.get('cdn_cacheable'):
+            if not session.modified:
+                if session.accessed:
+                    response.vary.add('Cookie')
+                return
+            # Session written after the policy ran: not cacheable after all.
+            g.cdn_cacheable = False
+            response.headers['Cache-Control'] = PRIVATE
+            response.headers.pop('Surrogate-Key', None)
+        super().save_session(app, session, response)
+
+
+# --- Purging ---
+
+class Purger:
+    """Purge interface: drop cached responses tagged with any of `keys`."""
+
+    def purge(self, keys):
+        raise NotImplementedError
+
+    def flush(self, timeout=None):
+        """Wait until queued purges are sent (for purgers that queue)."""
+
+
+class NullPurger(Purger):
+    """Used when no CDN is configured; only logs."""
+
+    def purge(self, keys):
+        current_app.logger.debug('CDN purge (no CDN configured): %s', ' '.join(sorted(keys)))
+
+
+class HTTPPurger(Purger):
+    """POSTs the keys to a purge endpoint from a background thread.
+
+    `purge()` only queues the keys, so a commit (a visitor's comment
+    included) never waits on the CDN API. The sender thread merges
+    everything queued while a request was in flight into the next one.
+    The keys are sent both in a `Surrogate-Key` header (the format Fastly's
+    purge-by-key API expects) and as a JSON body, with the token in
+    `Fastly-Key` and `Authorization: Bearer` headers.
+    """
+
+    def __init__(self, url, token=None, timeout=3, logger=None):
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.logger = logger
+        self._reset()
+
+    def _reset(self):
+        # Also run in a forked worker, which must start its own thread.
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.pending = set()
+        self.sending = False
+        self.thread = None
+
+    def purge(self, keys):
+        with self.condition:
+            if self.pid != os.getpid():
+                self._reset()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='cdn-purge', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush, self.timeout)
+            self.pending.update(keys)
+            self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        with self.condition:
+            if self.pid == os.getpid():
+                self.condition.wait_for(lambda: not self.pending and not self.sending, timeout)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+                keys, self.pending, self.sending = self.pending, set(), True
+            try:
+                self.send(keys)
+            except Exception:
+                if self.logger:
+                    self.logger.error('CDN purge failed for keys: %s', ' '.join(sorted(keys)), exc_info=True)
+            finally:
+                with self.condition:
+                    self.sending = False
+                    self.condition.notify_all()
+
+    def send(self, keys):
+        keys = sorted(keys)
+        headers = {'Content-Type': 'application/json', 'Surrogate-Key': ' '.join(keys)}
+        if self.token:
+            headers['Fastly-Key'] = self.token
+            headers['Authorization'] = f'Bearer {self.token}'
+        purge_request = urllib.request.Request(self.url, data=json.dumps({'surrogate_keys': keys}).encode(),
+                                               headers=headers, method='POST')
+        with urllib.request.urlopen(purge_request, timeout=self.timeout) as response:
+            response.read()
+
+
+def on_purge(app, callback):
+    """Also call `callback(keys)` whenever `app` purges keys (e.g. local caches)."""
+    app.extensions.setdefault('purge_listeners', []).append(callback)
+
+
+def purge(keys):
+    """Purge `keys` with the current app's purger, logging failures."""
+    keys = set(keys)
+    if not keys:
+        return
+    for callback in current_app.extensions.get('purge_listeners', ()):
+        try:
+            callback(keys)
+        except Exception:
+            current_app.logger.error('Purge listener failed for keys: %s', ' '.join(sorted(keys)), exc_info=True)
+    try:
+        current_app.extensions['cdn_purger'].purge(keys)
+    except Exception:
+        current_app.logger.error('CDN purge failed for keys: %s', ' '.join(sorted(keys)), exc_info=True)
+
+
+def _changed_keys(session):
+    keys = set()
+    for obj in session.new:
+        if type(obj) in _ENTITY_KEYS:
+            keys.update((entity_key(obj), _COLLECTION_KEYS[type(obj)]))
+    for obj in session.deleted:
+        if type(obj) in _ENTITY_KEYS:
+            keys.update((entity_key(obj), _COLLECTION_KEYS[type(obj)]))
+    for obj in session.dirty:
+        if type(obj) in _ENTITY_KEYS and session.is_modified(obj):
+            keys.add(entity_key(obj))
+            # A project added to or removed from a subskill changes which
+            # projects the filter pages list.
+            if isinstance(obj, Project) and inspect(obj).attrs.subskills.history.has_changes():
+                keys.add('projects')
+    # Feedback is rendered on the post/project page it belongs to.
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, (Comment, Like, Rating)):
+            if obj.post_id:
+                keys.add(f'post-{obj.post_id}')
+            if obj.project_id:
+                keys.add(f'project-{obj.project_id}')
+    return keys
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    keys = _changed_keys(session)
+    if keys:
+        session.info.setdefault(_PURGE_KEY, set()).update(keys)
+
+
+@event.listens_for(Session, 'after_commit')
+def _purge_changes(session):
+    keys = session.info.pop(_PURGE_KEY, None)
+    if keys and has_app_context() and 'cdn_purger' in current_app.extensions:
+        purge(keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_PURGE_KEY, None)
+
+
+def init_cache_policy(app):
+    app.config['CDN_CACHE_RULES'] = {**DEFAULT_RULES, **(app.config.get('CDN_CACHE_RULES') or {})}
+    app.session_interface = CacheAwareSessionInterface()
+    app.after_request(apply_policy)
+    purge_url = app.config.get('CDN_PURGE_URL')
+    app.extensions['cdn_purger'] = (
+        HTTPPurger(purge_url, app.config.get('CDN_PURGE_TOKEN'), app.config.get('CDN_PURGE_TIMEOUT', 3), app.logger)
+        if purge_url else NullPurger()
+    )
+
+
+cdn_cli = AppGroup('cdn', help='CDN cache commands.')
+
+
+@cdn_cli.command('purge')
+@click.argument('keys', nargs=-1, required=True)
+def purge_command(keys):
+    """Purge cached responses tagged with any of KEYS (e.g. post-3, site)."""
+    purge(keys)
+    current_app.extensions['cdn_purger'].flush()
+    click.echo(f"Purged: {' '.join(sorted(keys))}")
@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template
-from model import Project, BlogPost, User, Skill, SubSkill, Comment, Rating, Like
+from model import Project, BlogPost, User, Skill, SubSkill, Comment
 from flask_login import login_required
 from extension import db
+import engagement
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/admin")
 
@@ -16,8 +17,7 @@ def admin_dashboard():
         "skills": Skill.query.count(),
         "subskills": SubSkill.query.count(),
         "comments": Comment.query.count(),
-        "ratings": Rating.query.count(),
-        "likes": Like.query.count(),
+        **engagement.totals(),
     }
 
     # Example: top 5 latest projects
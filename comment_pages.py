@@ -0,0 +1,136 @@
+"""Keyset-paginated comments for blog posts and projects.
+
+Comments are listed oldest first, ordered by (date_posted, id), which is
+what the `(post_id, date_posted, id)` / `(project_id, date_posted, id)`
+indexes on `comment` serve. Pages after the first continue from an opaque
+cursor naming the last comment shown, so every page is one index range
+scan of `limit` rows however many comments an entity has (no OFFSET).
+
+The detail pages render the first page; `/blog/<slug>/comments` and
+`/portfolio/project/<slug>/comments` return the next ones as JSON. The
+total shown above the list is `BlogPost.comment_count` /
+`Project.comment_count`, which a session flush hook recounts for every
+post or project that gained, lost or moved a comment, inside the same
+transaction.
+"""
+import base64
+import json
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import current_app, jsonify, request, url_for
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from model import BlogPost, Comment, Project
+
+# Comment foreign key -> the table whose comment_count it feeds.
+COUNTED = {'post_id': BlogPost, 'project_id': Project}
+
+
+def encode_cursor(comment):
+    raw = json.dumps([comment.date_posted.isoformat(), comment.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (date_posted, comment_id) from a cursor string, or None if it is invalid."""
+    if not cursor:
+        return None
+    try:
+        date_posted, comment_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(date_posted), int(comment_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def page(query, limit, after=None):
+    """One page of the comments in `query` (e.g. `post.comments`), oldest first.
+
+    Args:
+        query: Comment query already filtered to one post or project
+        limit: Page size
+        after: Cursor returned with the previous page
+
+    Returns:
+        Tuple of (comments, next_cursor); next_cursor is None on the last page.
+    """
+    query = query.order_by(Comment.date_posted, Comment.id)
+    position = decode_cursor(after)
+    if position is not None:
+        query = query.filter(sa.tuple_(Comment.date_posted, Comment.id) > position)
+    comments = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(comments[limit - 1]) if len(comments) > limit else None
+    return comments[:limit], next_cursor
+
+
+def as_json(comment):
+    return {
+        'id': comment.id,
+        'author': comment.guest_name or 'Anonymous',
+        'content': comment.content,
+        'date_posted': comment.date_posted.isoformat(),
+    }
+
+
+def template_context(entity, endpoint, **values):
+    """Template variables for a detail page: the first page and the URL of the next.
+
+    `entity` is the BlogPost or Project; `endpoint`/`values` name the JSON
+    view serving the following pages.
+    """
+    comments, next_cursor = page(entity.comments, current_app.config['COMMENTS_PER_PAGE'])
+    return {
+        'comments': comments,
+        'comment_count': entity.comment_count,
+        'comments_next': url_for(endpoint, after=next_cursor, **values) if next_cursor else None,
+    }
+
+
+def json_response(query, endpoint, **values):
+    """The page of `query` after the request's `?after=` cursor, as JSON."""
+    comments, next_cursor = page(query, current_app.config['COMMENTS_PER_PAGE'], request.args.get('after'))
+    return jsonify({
+        'comments': [as_json(comment) for comment in comments],
+        'next': url_for(endpoint, after=next_cursor, **values) if next_cursor else None,
+    })
+
+
+def refresh_counts(connection, column, ids=None):
+    """Recount comment_count for the posts (`column='post_id'`) or projects with `ids`, or for all of them."""
+    table = COUNTED[column].__table__
+    count = (
+        sa.select(sa.func.count())
+        .select_from(Comment.__table__)
+        .where(Comment.__table__.c[column] == table.c.id)
+        .scalar_subquery()
+    )
+    stmt = sa.update(table).values(comment_count=count)
+    if ids is not None:
+        if not ids:
+            return
+        stmt = stmt.where(table.c.id.in_(ids))
+    connection.execute(stmt)
+
+
+@event.listens_for(Session, 'after_flush')
+def _recount_comments(session, flush_context):
+    # Old and new parents of every added, moved or deleted comment; the
+    # attribute history is still available until the flush completes.
+    changed = {column: set() for column in COUNTED}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, Comment):
+            continue
+        state = inspect(obj)
+        for column, ids in changed.items():
+            history = state.attrs[column].history
+            if obj in session.dirty and not history.has_changes():
+                continue
+            ids.update(history.deleted)
+            ids.add(getattr(obj, column))
+    connection = None
+    for column, ids in changed.items():
+        ids.discard(None)
+        if ids:
+            connection = connection or session.connection()
+            refresh_counts(connection, column, ids)
@@ -0,0 +1,261 @@
+"""Response compression: dynamic, precompressed and static.
+
+- `compress_response` (an after_request hook) gzips, or Brotli-compresses
+  when the `brotli` package is installed, text responses of at least
+  COMPRESS_MIN_SIZE bytes, using whichever encoding the client's
+  Accept-Encoding prefers.
+  Streamed responses are compressed chunk by chunk, flushing after each
+  chunk so the client can start rendering it.
+- `CompressedBody` holds a document together with its encoded variants,
+  so a cached page (e.g. the feeds cache) is compressed once when it is
+  stored rather than on every hit; `precompressed_response` serves the
+  right variant.
+- `flask static compress` writes `.gz`/`.br` siblings for the files in
+  `static/`, and the static view sends them directly when accepted.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+from werkzeug.wrappers import Response
+
+try:
+    import brotli
+except ImportError:  # optional: pip install Brotli
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/atom+xml', 'application/javascript', 'application/json', 'application/manifest+json',
+    'application/rss+xml', 'application/xml', 'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon',
+}
+# Static files worth precompressing, by extension.
+STATIC_EXTENSIONS = {'.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml', '.html', '.ico',
+                     '.webmanifest'}
+# (suffix, encoding) for precompressed static siblings, in preference order.
+STATIC_SUFFIXES = (('.br', 'br'), ('.gz', 'gzip'))
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def negotiate(encodings=None):
+    """Return the best of `encodings` accepted by the request, or None."""
+    best, best_quality = None, 0
+    for encoding in encodings or available_encodings():
+        quality = request.accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, level=None):
+    """Encode `data` with `encoding` ('gzip' or 'br').
+
+    `level` defaults to COMPRESS_LEVEL / COMPRESS_BR_QUALITY, which favour
+    speed for responses compressed per request.
+    """
+    config = current_app.config
+    if encoding == 'br':
+        quality = config.get('COMPRESS_BR_QUALITY', 4) if level is None else level
+        return brotli.compress(data, quality=quality)
+    level = config.get('COMPRESS_LEVEL', 6) if level is None else level
+    # mtime=0 keeps the output (and so its ETag) stable across runs.
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _tag_etag(response, encoding):
+    # Each encoding is a different representation and needs its own ETag.
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+
+
+# --- Dynamic responses ---
+
+def compress_stream(chunks, encoding, level=None):
+    """Encode an iterable of chunks, flushing the encoder after each one."""
+    if level is None:
+        # Resolved now: the stream is consumed after the app context is gone.
+        level = current_app.config.get('COMPRESS_BR_QUALITY' if encoding == 'br' else 'COMPRESS_LEVEL',
+                                       4 if encoding == 'br' else 6)
+    return _compressed_chunks(chunks, encoding, level)
+
+
+def _compressed_chunks(chunks, encoding, level):
+    try:
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=level)
+            for chunk in chunks:
+                data = compressor.process(chunk.encode() if isinstance(chunk, str) else chunk) + compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        else:
+            # wbits=31: gzip container rather than raw zlib.
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+            for chunk in chunks:
+                data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+                yield data + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
+    finally:
+        # Closing the source runs its cleanup (e.g. stream_with_context
+        # popping the request context).
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or not is_compressible(response.mimetype)):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        # No size check or ETag: the body does not exist yet.
+        encoding = negotiate()
+        if encoding is not None:
+            response.response = compress_stream(response.response, encoding)
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+    encoding = negotiate()
+    if encoding is None:
+        return response
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    _tag_etag(response, encoding)
+    return response
+
+
+# --- Precompressed documents ---
+
+class CompressedBody:
+    """A document plus its encoded variants, compressed once up front."""
+
+    def __init__(self, data, min_size=1024):
+        self.data = data
+        self.etag = hashlib.sha1(data).hexdigest()
+        self.variants = {}
+        if len(data) >= min_size:
+            # Stored bodies are compressed once, so spend the CPU on the
+            # best ratio.
+            for encoding in available_encodings():
+                self.variants[encoding] = compress(data, encoding, level=11 if encoding == 'br' else 9)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def precompressed_response(body, mimetype):
+    """Conditional response serving the variant of `body` the client accepts."""
+    encoding = negotiate(tuple(body.variants))
+    response = Response(body.variants[encoding] if encoding else body.data, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f'{body.etag}-{encoding}')
+    else:
+        response.set_etag(body.etag)
+    return response.make_conditional(request)
+
+
+# --- Static files ---
+
+def send_precompressed(directory, filename, max_age=None):
+    """Send `filename` from `directory`, preferring a `.br`/`.gz` sibling."""
+    mimetype = mimetypes.guess_type(filename)[0]
+    siblings = {}
+    if is_compressible(mimetype):
+        siblings = {encoding: filename + suffix for suffix, encoding in STATIC_SUFFIXES
+                    if os.path.isfile(safe_join(directory, filename + suffix) or '')}
+    encoding = negotiate(tuple(siblings)) if siblings else None
+    response = send_from_directory(directory, siblings[encoding] if encoding else filename,
+                                   mimetype=mimetype, max_age=max_age)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if siblings:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def send_static_file(filename):
+    """Static view that prefers a precompressed `.br`/`.gz` sibling."""
+    return send_precompressed(current_app.static_folder, filename, current_app.get_send_file_max_age(filename))
+
+
+def compress_static(folder, min_size=1024):
+    """Write `.gz` (and `.br`) siblings for the compressible files under `folder`.
+
+    Siblings that are newer than their source are left alone, and ones
+    that would not be smaller are not written (a stale one is removed).
+
+    Returns:
+        List of (path, original size, {encoding: compressed size})
+    """
+    results = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() not in STATIC_EXTENSIONS:
+                continue
+            size = os.path.getsize(path)
+            if size < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            sizes = {}
+            for suffix, encoding in STATIC_SUFFIXES:
+                if encoding not in available_encodings():
+                    continue
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    sizes[encoding] = os.path.getsize(target)
+                    continue
+                encoded = compress(data, encoding, level=11 if encoding == 'br' else 9)
+                if len(encoded) >= size:
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                tmp_path = f'{target}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(encoded)
+                os.replace(tmp_path, target)
+                sizes[encoding] = len(encoded)
+            results.append((path, size, sizes))
+    return results
+
+
+def init_compression(app):
+    app.after_request(compress_response)
+    if app.static_folder and 'static' in app.view_functions:
+        app.view_functions['static'] = send_static_file
+
+
+static_cli = AppGroup('static', help='Static file commands.')
+
+
+@static_cli.command('compress')
+def compress_static_command():
+    """Write .gz/.br siblings for compressible files in static/."""
+    results = compress_static(current_app.static_folder, current_app.config.get('COMPRESS_MIN_SIZE', 1024))
+    for path, size, sizes in results:
+        encoded = ', '.join(f'{encoding} {length}' for encoding, length in sizes.items()) or 'not smaller'
+        click.echo(f'{os.path.relpath(path, current_app.static_folder)}: {size} -> {encoded}')
+    if brotli is None:
+        click.echo('Brotli not installed (pip install Brotli); wrote gzip only.')
+    click.echo(f'{len(results)} files')
@@ -3,11 +3,162 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def engine_options(database_uri, pool_size=5, max_overflow=10, pool_recycle=1800,
+                   statement_timeout_ms=15000, sqlite_timeout=5):
+    """Build SQLALCHEMY_ENGINE_OPTIONS tuned for the backend of `database_uri`.
+
+    Pool sizes and timeouts can be overridden through DB_POOL_SIZE,
+    DB_MAX_OVERFLOW, DB_POOL_RECYCLE and DB_STATEMENT_TIMEOUT_MS.
+
+    Args:
+        database_uri: The SQLALCHEMY_DATABASE_URI the options apply to
+        pool_size: Persistent connections kept per worker process (Postgres)
+        max_overflow: Extra connections allowed under burst load (Postgres)
+        pool_recycle: Seconds before a pooled connection is replaced (Postgres)
+        statement_timeout_ms: Server-side statement timeout (Postgres)
+        sqlite_timeout: Seconds the sqlite3 driver waits on a locked database
+
+    Returns:
+        dict: Keyword arguments for `sqlalchemy.create_engine`
+    """
+    if not database_uri:
+        return {}
+    if database_uri.startswith('sqlite'):
+        # SQLite pragmas (WAL etc.) are applied per connection by
+        # `database.configure_engines`, see SQLITE_PRAGMAS.
+        return {'connect_args': {'timeout': sqlite_timeout}}
+    if database_uri.startswith('postgres'):
+        return {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', pool_size)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', max_overflow)),
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', pool_recycle)),
+            'pool_pre_ping': True,
+            'pool_use_lifo': True,
+            'connect_args': {
+                'options': f"-c statement_timeout={int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', statement_timeout_ms))}",
+            },
+        }
+    return {'pool_pre_ping': True}
+
+
 class Config:
     """Base configuration class with common settings."""
     # Load all settings from environment variables with no defaults for sensitive data
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pragmas applied to every new SQLite connection. WAL lets readers run
+    # alongside a writer, and busy_timeout makes concurrent gunicorn
+    # workers wait for the write lock instead of failing with
+    # "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,  # ms
+        'mmap_size': 256 * 1024 * 1024,  # bytes
+        'cache_size': -16000,  # negative = KiB, i.e. ~16MB page cache
+        'temp_store': 'MEMORY',
+    }
+    # Optional read replicas (comma-separated URLs). Public GET traffic
+    # reads from them; admin pages and writes use the primary.
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+    DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', '10'))
+    DATABASE_REPLICA_HEALTH_INTERVAL = int(os.environ.get('DATABASE_REPLICA_HEALTH_INTERVAL', '30'))
+    # Skill co-occurrence snapshot written by `flask skills build-analytics`
+    # (defaults to instance/skill_analytics.json).
+    SKILL_ANALYTICS_PATH = os.environ.get('SKILL_ANALYTICS_PATH')
+    # TF-IDF model behind related posts/projects, written by
+    # `flask related rebuild` (defaults to instance/related_index.joblib).
+    RELATED_INDEX_PATH = os.environ.get('RELATED_INDEX_PATH')
+    # Content commits queue updates of both and start `flask skills
+    # refresh-analytics` / `flask related refresh` to apply them (see
+    # refresh_jobs.py). Turn off to run those commands from cron instead.
+    BACKGROUND_REFRESH = os.environ.get('BACKGROUND_REFRESH', '1').lower() in ('1', 'true', 'yes')
+    # Edge/CDN caching (see cache_policy.py). CDN_CACHE_RULES overrides the
+    # per-endpoint defaults; CDN_PURGE_URL receives surrogate-key purges
+    # after content commits.
+    CDN_CACHE_RULES = {}
+    CDN_PURGE_URL = os.environ.get('CDN_PURGE_URL')
+    CDN_PURGE_TOKEN = os.environ.get('CDN_PURGE_TOKEN')
+    CDN_PURGE_TIMEOUT = float(os.environ.get('CDN_PURGE_TIMEOUT', '3'))
+    # Response compression (see compression.py): text responses of at least
+    # COMPRESS_MIN_SIZE bytes are gzipped (or Brotli-compressed when the
+    # Brotli package is installed) at these speed-oriented levels.
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', '6'))
+    COMPRESS_BR_QUALITY = int(os.environ.get('COMPRESS_BR_QUALITY', '4'))
+    # Front-end bundles built by `flask assets build` (see assets.py).
+    # TAILWIND_CMD runs the Tailwind CLI (e.g. "npx tailwindcss@3");
+    # downloaded vendor files are cached in ASSETS_VENDOR_DIR
+    # (defaults to instance/vendor).
+    TAILWIND_CMD = os.environ.get('TAILWIND_CMD', 'tailwindcss')
+    ASSETS_VENDOR_DIR = os.environ.get('ASSETS_VENDOR_DIR')
+    # Static pre-render (see freeze.py): `flask freeze` writes the public
+    # pages to FREEZE_DIR (defaults to instance/frozen); with STATIC_FIRST
+    # set, anonymous GETs for fresh frozen pages are served from there.
+    FREEZE_DIR = os.environ.get('FREEZE_DIR')
+    STATIC_FIRST = os.environ.get('STATIC_FIRST', '').lower() in ('1', 'true', 'yes')
+    # In-process page cache for anonymous visitors (see page_cache.py),
+    # invalidated through PAGE_STAMP_PATH (defaults to instance/pages.stamp).
+    # Misses are built once per key; CACHE_LOCK_DIR also limits rebuilds of
+    # a key to one worker at a time (see content_cache.ContentCache).
+    PAGE_CACHE = os.environ.get('PAGE_CACHE', '').lower() in ('1', 'true', 'yes')
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', '128'))
+    PAGE_CACHE_MAX_BYTES = 512 * 1024
+    PAGE_CACHE_WAIT = 5
+    PAGE_STAMP_PATH = os.environ.get('PAGE_STAMP_PATH')
+    CACHE_LOCK_DIR = os.environ.get('CACHE_LOCK_DIR')
+    # Cache warming (see warm.py): each worker requests the index pages and
+    # the CACHE_WARM_LIMIT latest posts and projects (and their images) at
+    # boot and CACHE_WARM_DELAY seconds after an admin commit, at most
+    # CACHE_WARM_CONCURRENCY requests at a time.
+    CACHE_WARM = os.environ.get('CACHE_WARM', '1').lower() in ('1', 'true', 'yes')
+    CACHE_WARM_LIMIT = int(os.environ.get('CACHE_WARM_LIMIT', '10'))
+    CACHE_WARM_CONCURRENCY = int(os.environ.get('CACHE_WARM_CONCURRENCY', '1'))
+    CACHE_WARM_DELAY = 2
+    BLOG_PER_PAGE = 5
+    # Streamed rendering of post/project pages (see streaming.py): the
+    # head is flushed before the content and comments are rendered.
+    STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES', '').lower() in ('1', 'true', 'yes')
+    STREAM_CHUNK_SIZE = 8192
+    # Comments per page on post/project pages and their JSON endpoints.
+    COMMENTS_PER_PAGE = 20
+    # Buffered like/rating ingest (see engagement.py): flush after
+    # ENGAGEMENT_FLUSH_MS or ENGAGEMENT_BATCH_SIZE events; refuse new
+    # events once ENGAGEMENT_MAX_PENDING are waiting on the database.
+    # Spools default to instance/engagement.
+    ENGAGEMENT_FLUSH_MS = int(os.environ.get('ENGAGEMENT_FLUSH_MS', 250))
+    ENGAGEMENT_BATCH_SIZE = int(os.environ.get('ENGAGEMENT_BATCH_SIZE', 100))
+    ENGAGEMENT_MAX_PENDING = int(os.environ.get('ENGAGEMENT_MAX_PENDING', 5000))
+    ENGAGEMENT_ENQUEUE_TIMEOUT = 0.5
+    ENGAGEMENT_SPOOL_DIR = os.environ.get('ENGAGEMENT_SPOOL_DIR')
+    ENGAGEMENT_FSYNC = os.environ.get('ENGAGEMENT_FSYNC', '').lower() in ('1', 'true', 'yes')
+    # Token-bucket limits on the feedback, login and upload POSTs (see
+    # rate_limit.py). RATE_LIMITS overrides the per-policy defaults;
+    # RATE_LIMIT_STORAGE (a file path) shares the buckets between workers.
+    # Behind a proxy/CDN, clients are told apart by RATE_LIMIT_KEY_HEADER
+    # (e.g. CF-Connecting-IP) or by X-Forwarded-For, of which the last
+    # RATE_LIMIT_PROXY_COUNT entries are added by trusted proxies.
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    RATE_LIMITS = {}
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE')
+    RATE_LIMIT_KEY_HEADER = os.environ.get('RATE_LIMIT_KEY_HEADER')
+    RATE_LIMIT_PROXY_COUNT = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', 0))
+    # Logged-in users are cached per worker for USER_CACHE_TTL seconds (see
+    # user_cache.py); commits to users touch USER_STAMP_PATH (defaults to
+    # instance/users.stamp) so every worker drops them.
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', '60'))
+    USER_STAMP_PATH = os.environ.get('USER_STAMP_PATH')
+    # Database maintenance (see maintenance.py): SQLite snapshots go to
+    # BACKUP_DIR (default instance/backups), the newest BACKUP_KEEP are kept.
+    # Deleting posts/projects/images starts `flask maintenance run` when the
+    # last run (recorded in MAINTENANCE_STATE_PATH, default
+    # instance/maintenance.json) is older than MAINTENANCE_INTERVAL seconds.
+    BACKUP_DIR = os.environ.get('BACKUP_DIR')
+    BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', '7'))
+    MAINTENANCE_INTERVAL = int(os.environ.get('MAINTENANCE_INTERVAL', '86400'))
+    MAINTENANCE_STATE_PATH = os.environ.get('MAINTENANCE_STATE_PATH')
     UPLOAD_FOLDER = 'static/other_uploads'
     
     # Logging Configuration
@@ -19,6 +170,9 @@ class Config:
     ERROR_LOG_FILE = 'error.log'
     ACCESS_LOG_FILE = 'access.log'
     LOGGING_LEVEL = 'INFO'  # Default level
+    # 404/405 responses are counted per path and logged the first time and
+    # then once every ERROR_LOG_SAMPLE times (see error_handlers.py)
+    ERROR_LOG_SAMPLE = int(os.environ.get('ERROR_LOG_SAMPLE', '100'))
     
     # Mail settings - no default values for sensitive data
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -42,14 +196,22 @@ class Config:
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
     
-    # Sitemap settings
+    # Sitemap/feed settings (see feeds.py)
     SITEMAP_URL_SCHEME = os.environ.get('SITEMAP_URL_SCHEME', 'https')
-    SITEMAP_GENERATOR_OPTIONS = {'base_url': os.environ.get('SITEMAP_BASE_URL')}
+    # Without SITEMAP_BASE_URL, URLs use the request's host, and sitemap/feeds
+    # are only cached for the hosts in SITEMAP_HOSTS (comma-separated).
+    SITEMAP_BASE_URL = os.environ.get('SITEMAP_BASE_URL')
+    SITEMAP_HOSTS = [host.strip().lower() for host in os.environ.get('SITEMAP_HOSTS', '').split(',') if host.strip()]
+    # Touched on every content commit; its mtime invalidates the cached
+    # sitemap/feeds in all workers (defaults to instance/content.stamp).
+    CONTENT_STAMP_PATH = os.environ.get('CONTENT_STAMP_PATH')
 
 class DevelopmentConfig(Config):
     """Development configuration."""
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///instance/site.db'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI, pool_size=2, max_overflow=3,
+                                               statement_timeout_ms=30000)
     # Enable more detailed error pages
     EXPLAIN_TEMPLATE_LOADING = True
     
@@ -66,6 +228,10 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///instance/test.db'
     # Disable CSRF tokens in testing
     WTF_CSRF_ENABLED = False
+    # Queued index refreshes are applied by the tests themselves
+    BACKGROUND_REFRESH = False
+    # Tests warm explicitly (see tests/test_warm.py)
+    CACHE_WARM = False
     
     # Testing logging settings
     LOGGING_LEVEL = 'DEBUG'
@@ -102,6 +268,7 @@ class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     if not SQLALCHEMY_DATABASE_URI:
         raise ValueError("Production database URL must be set")
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     
     # Force HTTPS
     SITEMAP_URL_SCHEME = 'https'
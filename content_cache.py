@@ -0,0 +1,242 @@
+"""Process-local caches invalidated by content commits.
+
+Every commit that creates, edits or deletes a blog post, project, skill or
+subskill touches a stamp file (CONTENT_STAMP_PATH, instance/content.stamp
+by default). Its mtime is the content version: each worker compares it
+with the version its cached entries were built for, so a commit in one
+gunicorn worker invalidates the caches of all of them without any shared
+memory or extra service.
+"""
+import contextlib
+import hashlib
+import os
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from model import BlogPost, Project, Skill, SubSkill
+from utils import file_lock
+
+CONTENT_MODELS = (BlogPost, Project, Skill, SubSkill)
+_DIRTY_KEY = 'content_cache_dirty'
+
+
+def stamp_path(app):
+    return app.config.get('CONTENT_STAMP_PATH') or os.path.join(app.instance_path, 'content.stamp')
+
+
+def file_version(path):
+    """Return the mtime of the stamp file at `path` (None if it doesn't exist yet)."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def touch_file(path):
+    """Move the stamp file's mtime forward, creating it if needed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a'):
+        pass
+    # Always move the mtime forward, so two commits within the clock's
+    # resolution still produce two different versions.
+    now = time.time_ns()
+    os.utime(path, ns=(now, max(now, os.stat(path).st_mtime_ns + 1)))
+
+
+def content_version(app=None):
+    """Return the current content version (None before the first change)."""
+    return file_version(stamp_path(app or current_app))
+
+
+def touch(app=None):
+    """Mark content as changed, invalidating every worker's caches."""
+    touch_file(stamp_path(app or current_app))
+
+
+class Flight:
+    """One in-progress build of a cache key (see `ContentCache.begin`).
+
+    The builder calls `finish(value)` to store the value and wake the
+    requests waiting for it, or `abandon()` if the build failed.
+    """
+
+    def __init__(self, cache, key, version):
+        self.cache = cache
+        self.key = key
+        self.version = version
+        self.value = None
+        self.done = threading.Event()
+        self.started = time.monotonic()
+        self._shared_lock = contextlib.ExitStack()
+
+    def lock_shared(self, lock_dir, blocking):
+        """Take the cross-worker lock for this key; False if another worker holds it."""
+        digest = hashlib.sha1(repr(self.key).encode()).hexdigest()
+        return self._shared_lock.enter_context(file_lock(os.path.join(lock_dir, digest), blocking))
+
+    def finish(self, value):
+        self.value = value
+        self.cache.set(self.key, value, self.version)
+        self.abandon()
+
+    def abandon(self):
+        self._shared_lock.close()
+        self.cache._land(self)
+
+
+class ContentCache:
+    """Dict-like cache whose entries are dropped when content changes.
+
+    With `max_entries`, the oldest entry is evicted to make room for a new one.
+    `version` returns the version entries are valid for (default:
+    `content_version`). `name` lists the cache in `metrics()`.
+
+    `get_or_build()`/`begin()` coalesce misses: one caller per key builds
+    the value while the others wait for it, or are handed the entry from
+    before the last change (stale-while-revalidate). With CACHE_LOCK_DIR
+    set, builders also take a per-key file lock, so only one worker at a
+    time rebuilds a key; workers holding a stale entry serve it instead
+    of waiting.
+    """
+
+    def __init__(self, max_entries=None, version=None, name=None):
+        self.max_entries = max_entries
+        self.version = version or content_version
+        self._entries = {}
+        self._stale = {}
+        self._flights = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(('hits', 'misses', 'stale', 'coalesced', 'builds'), 0)
+        if name:
+            _caches[name] = self
+
+    def _sync(self, version):
+        if version != self._version:
+            # Entries of the previous version are only served while a
+            # rebuild of the same key is in progress.
+            self._stale = self._entries
+            self._entries = {}
+            self._version = version
+
+    def get(self, key):
+        version = self.version()
+        with self._lock:
+            self._sync(version)
+            return self._entries.get(key)
+
+    def set(self, key, value, version):
+        """Store `value` if content is still at `version` (when it was built)."""
+        current = self.version()
+        with self._lock:
+            self._sync(current)
+            if version == self._version:
+                self._entries.pop(key, None)
+                if self.max_entries is not None and len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+                self._entries[key] = value
+
+    def begin(self, key, timeout=10):
+        """Look up `key`, coalescing concurrent misses.
+
+        Returns:
+            Tuple of (value, flight). Without a flight, value is the cached
+            entry, the stale one while another caller rebuilds it, or the
+            value another caller just built. With a flight, the caller must
+            build the value and pass it to `flight.finish()` (or call
+            `flight.abandon()`).
+        """
+        version = self.version()
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._sync(version)
+                if key in self._entries:
+                    self.stats['hits'] += 1
+                    return self._entries[key], None
+                stale = self._stale.get(key)
+                flight = self._flights.get(key)
+                if flight is not None and time.monotonic() - flight.started > timeout:
+                    # The builder died or never finished (e.g. an unread
+                    # response stream); let this caller take over.
+                    flight = None
+                if flight is None:
+                    flight = self._flights[key] = Flight(self, key, version)
+                    self.stats['misses'] += 1
+                    break
+                self.stats['stale' if stale is not None else 'coalesced'] += 1
+            if stale is not None:
+                return stale, None
+            if flight.done.wait(max(deadline - time.monotonic(), 0)) and flight.value is not None:
+                return flight.value, None
+            if time.monotonic() >= deadline:
+                # Give up waiting and build without coalescing.
+                return None, Flight(self, key, version)
+        lock_dir = current_app.config.get('CACHE_LOCK_DIR') if has_app_context() else None
+        if lock_dir and not flight.lock_shared(lock_dir, blocking=stale is None):
+            # Another worker is rebuilding this key: serve stale meanwhile.
+            flight.abandon()
+            with self._lock:
+                self.stats['stale'] += 1
+            return stale, None
+        with self._lock:
+            self.stats['builds'] += 1
+        return None, flight
+
+    def _land(self, flight):
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.done.set()
+
+    def get_or_build(self, key, build, timeout=10):
+        """Return the entry for `key`, calling `build()` on a miss (once per key at a time)."""
+        value, flight = self.begin(key, timeout)
+        if flight is None:
+            return value
+        try:
+            value = build()
+        except BaseException:
+            flight.abandon()
+            raise
+        flight.finish(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stale.clear()
+
+
+_caches = {}
+
+
+def metrics():
+    """Hit/miss/coalescing counters of the named caches in this worker."""
+    return {name: dict(cache.stats, entries=len(cache._entries)) for name, cache in _caches.items()}
+
+
+# --- Bump the version on content commits ---
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    if any(isinstance(obj, CONTENT_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _touch_stamp(session):
+    if session.info.pop(_DIRTY_KEY, False) and has_app_context():
+        try:
+            touch()
+        except OSError:
+            current_app.logger.error('Failed to update content stamp', exc_info=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_DIRTY_KEY, None)
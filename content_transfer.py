@@ -0,0 +1,324 @@
+"""`flask content export` / `flask content import`: move or back up the site data.
+
+An export is a directory holding, for every table that isn't derived from
+the others (users, posts, projects, skills, subskills, project_subskill,
+comments, ratings, likes and uploaded images):
+
+- `<table>/<n>.jsonl`: the rows in primary-key order, one JSON object per
+  line, in chunks of at most `--batch-size` rows (and CHUNK_BLOB_BYTES of
+  images), read in a single transaction so the export is consistent;
+- `blobs/<sha256>`: each image BLOB once, referenced from its row as
+  `{"$blob": "<sha256>"}`; an import holds at most one chunk's images;
+- `manifest.json`, written last: the tables, their chunk files, row counts
+  and the schema (alembic) revision.
+
+`import` loads an export into the configured database, which must have the
+same schema revision (run `flask db upgrade` first) and no rows yet;
+tables the migrations don't create are created from the models. Each
+chunk is one bulk insert in its own transaction. Tables are loaded in
+foreign key order, those that don't depend on each other in parallel
+(`--jobs`; SQLite allows a single writer and always uses one). Finished
+chunks are recorded in `import.checkpoint.json` in the export directory
+(created before the first chunk), so an interrupted import picks up where
+it stopped when run again; a chunk that was committed but not recorded is
+deleted and loaded again.
+
+Derived tables (skill_project, related_content, the search index) are not
+exported; rebuild them after an import with `flask skills rebuild-index`,
+`flask search reindex` and `flask related rebuild`.
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, func, inspect, select, text, tuple_
+
+import content_cache
+from extension import db
+from model import (BlogPost, Comment, Like, Project, Rating, Skill, SubSkill, UploadedImage, User,
+                   project_subskill)
+
+MANIFEST = 'manifest.json'
+CHECKPOINT = 'import.checkpoint.json'
+FORMAT_VERSION = 1
+BATCH_SIZE = 1000
+# A chunk is closed early once its images add up to this much.
+CHUNK_BLOB_BYTES = 32 * 1024 * 1024
+
+TABLES = [model.__table__ for model in (User, BlogPost, Project, Skill, SubSkill, Comment, Rating, Like,
+                                        UploadedImage)] + [project_subskill]
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _schema_revision(connection):
+    if not inspect(connection).has_table('alembic_version'):
+        return None
+    return connection.execute(text('SELECT version_num FROM alembic_version')).scalar()
+
+
+def _primary_key(table):
+    return list(table.primary_key.columns)
+
+
+def load_order(tables):
+    """Group `tables` into levels: each level only references tables of earlier levels."""
+    remaining, levels = list(tables), []
+    while remaining:
+        done = {table for level in levels for table in level}
+        level = [table for table in remaining
+                 if all(fk.column.table in done or fk.column.table is table or fk.column.table not in remaining
+                        for fk in table.foreign_keys)]
+        if not level:
+            raise click.ClickException('Foreign key cycle between: ' + ', '.join(t.name for t in remaining))
+        levels.append(level)
+        remaining = [table for table in remaining if table not in level]
+    return levels
+
+
+# --- Export ---
+
+def _encode(table, row, folder):
+    """JSON-ready dict of `row`, writing its BLOBs to `folder`/blobs.
+
+    Returns:
+        Tuple of (dict, bytes of BLOB data in the row)
+    """
+    record, blob_bytes = {}, 0
+    for column in table.columns:
+        value = row[column.name]
+        if value is not None and isinstance(column.type, db.LargeBinary):
+            digest = hashlib.sha256(value).hexdigest()
+            path = os.path.join(folder, 'blobs', digest)
+            if not os.path.exists(path):
+                _write(path, value)
+            blob_bytes += len(value)
+            value = {'$blob': digest}
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        record[column.name] = value
+    return record, blob_bytes
+
+
+def export_table(connection, table, folder, batch_size=BATCH_SIZE):
+    """Write `table` as chunked JSON Lines under `folder`/<table>.
+
+    Returns:
+        Dict with the table's chunk file names and row count
+    """
+    chunks, rows = [], 0
+    chunk, chunk_bytes = [], 0
+
+    def flush():
+        name = f'{table.name}/{len(chunks):05d}.jsonl'
+        _write(os.path.join(folder, name), b''.join(chunk))
+        chunks.append(name)
+
+    result = connection.execution_options(yield_per=batch_size).execute(
+        select(table).order_by(*_primary_key(table)))
+    for row in result.mappings():
+        record, blob_bytes = _encode(table, row, folder)
+        chunk.append(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n')
+        chunk_bytes += blob_bytes
+        rows += 1
+        if len(chunk) >= batch_size or chunk_bytes >= CHUNK_BLOB_BYTES:
+            flush()
+            chunk, chunk_bytes = [], 0
+    if chunk:
+        flush()
+    return {'chunks': chunks, 'rows': rows}
+
+
+def export(folder, batch_size=BATCH_SIZE):
+    """Export every table in TABLES into `folder` and write the manifest last."""
+    if os.path.exists(os.path.join(folder, MANIFEST)):
+        os.remove(os.path.join(folder, MANIFEST))
+    tables = {}
+    # One transaction: every table is read from the same snapshot.
+    with db.engine.connect() as connection, connection.begin():
+        revision = _schema_revision(connection)
+        for table in TABLES:
+            tables[table.name] = export_table(connection, table, folder, batch_size)
+    manifest = {'format': FORMAT_VERSION, 'revision': revision, 'dialect': db.engine.dialect.name,
+                'exported_at': datetime.utcnow().isoformat(timespec='seconds'), 'tables': tables}
+    _write(os.path.join(folder, MANIFEST), json.dumps(manifest, indent=1).encode('utf-8'))
+    return manifest
+
+
+# --- Import ---
+
+class Checkpoint:
+    """Chunks already loaded, persisted after each one.
+
+    The file is written before the first chunk, so its presence means an
+    import was started (`exists`), even if no chunk was recorded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.exists = os.path.exists(path)
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.done = set(json.load(f)['done'])
+        except (OSError, ValueError, KeyError):
+            self.done = set()
+
+    def save(self):
+        with self.lock:
+            _write(self.path, json.dumps({'done': sorted(self.done)}).encode('utf-8'))
+        self.exists = True
+
+    def add(self, name):
+        with self.lock:
+            self.done.add(name)
+        self.save()
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _decode(table, record, folder):
+    row = {}
+    for column in table.columns:
+        value = record.get(column.name)
+        if isinstance(value, dict) and '$blob' in value:
+            with open(os.path.join(folder, 'blobs', value['$blob']), 'rb') as f:
+                value = f.read()
+        elif value is not None and isinstance(column.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        row[column.name] = value
+    return row
+
+
+def _defer_constraints(connection):
+    # FK order already keeps references valid; this covers deferrable
+    # constraints and self references.
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('PRAGMA defer_foreign_keys = ON')
+    elif connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql('SET CONSTRAINTS ALL DEFERRED')
+
+
+def import_chunk(engine, table, folder, name):
+    """Load one chunk file in one transaction, replacing rows left by an unrecorded earlier attempt."""
+    with open(os.path.join(folder, name), encoding='utf-8') as f:
+        rows = [_decode(table, json.loads(line), folder) for line in f if line.strip()]
+    if not rows:
+        return 0
+    key = _primary_key(table)
+    first = [rows[0][column.name] for column in key]
+    last = [rows[-1][column.name] for column in key]
+    with engine.begin() as connection:
+        _defer_constraints(connection)
+        connection.execute(table.delete().where(and_(tuple_(*key) >= tuple_(*first), tuple_(*key) <= tuple_(*last))))
+        connection.execute(table.insert(), rows)
+    return len(rows)
+
+
+def import_table(engine, table, folder, chunks, checkpoint):
+    rows = 0
+    for name in chunks:
+        if name in checkpoint.done:
+            continue
+        rows += import_chunk(engine, table, folder, name)
+        checkpoint.add(name)
+    return rows
+
+
+def _reset_sequences(connection, tables):
+    # Rows were inserted with their ids; move Postgres sequences past them.
+    preparer = connection.dialect.identifier_preparer
+    for table in tables:
+        key = _primary_key(table)
+        if len(key) == 1 and isinstance(key[0].type, db.Integer):
+            sequence = func.pg_get_serial_sequence(preparer.format_table(table), key[0].name)
+            connection.execute(select(func.setval(sequence,
+                                                  func.coalesce(select(func.max(key[0])).scalar_subquery(), 0) + 1,
+                                                  False)))
+
+
+def import_export(folder, jobs=4):
+    """Load the export in `folder` into the current database.
+
+    Returns:
+        Dict of {table name: rows inserted by this run}
+    """
+    try:
+        with open(os.path.join(folder, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        raise click.ClickException(f'No complete export in {folder} (missing {MANIFEST}).')
+    if manifest.get('format') != FORMAT_VERSION:
+        raise click.ClickException(f"Unsupported export format {manifest.get('format')}.")
+    engine = db.engine
+    checkpoint = Checkpoint(os.path.join(folder, CHECKPOINT))
+    tables = [table for table in TABLES if table.name in manifest['tables']]
+    with engine.begin() as connection:
+        # uploaded_image has no migration; `python app.py` creates it the same way.
+        for table in tables:
+            table.create(connection, checkfirst=True)
+        revision = _schema_revision(connection)
+        if manifest['revision'] and revision != manifest['revision']:
+            raise click.ClickException(f"Export is at schema revision {manifest['revision']}, the database at "
+                                       f"{revision}; run `flask db upgrade` first.")
+        if not checkpoint.exists and any(connection.execute(select(func.count()).select_from(table)).scalar()
+                                       for table in tables):
+            raise click.ClickException('The database already has content; import into an empty database.')
+    checkpoint.save()
+    if engine.dialect.name == 'sqlite':
+        jobs = 1
+    counts = {}
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        for level in load_order(tables):
+            futures = {table.name: pool.submit(import_table, engine, table, folder,
+                                               manifest['tables'][table.name]['chunks'], checkpoint)
+                       for table in level}
+            counts.update({name: future.result() for name, future in futures.items()})
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            _reset_sequences(connection, tables)
+    checkpoint.remove()
+    # Running workers drop their cached pages and lists.
+    content_cache.touch(current_app)
+    return counts
+
+
+content_cli = AppGroup('content', help='Content export/import commands.')
+
+
+@content_cli.command('export')
+@click.argument('folder', type=click.Path(file_okay=False))
+@click.option('--batch-size', type=int, default=BATCH_SIZE, show_default=True, help='Rows per chunk file.')
+def export_command(folder, batch_size):
+    """Export all content to FOLDER as JSON Lines chunks and image files."""
+    manifest = export(folder, batch_size)
+    for name, table in manifest['tables'].items():
+        click.echo(f"{name}: {table['rows']} rows in {len(table['chunks'])} chunks")
+    click.echo(f'Exported to {folder}.')
+
+
+@content_cli.command('import')
+@click.argument('folder', type=click.Path(exists=True, file_okay=False))
+@click.option('--jobs', '-j', type=int, default=4, show_default=True,
+              help='Tables loaded in parallel (always 1 on SQLite).')
+def import_command(folder, jobs):
+    """Load an export from FOLDER into the (empty) configured database; resumes if interrupted."""
+    counts = import_export(folder, jobs)
+    for name, rows in counts.items():
+        click.echo(f'{name}: {rows} rows')
+    click.echo('Imported. Rebuild derived data with `flask skills rebuild-index`, '
+               '`flask search reindex` and `flask related rebuild`.')
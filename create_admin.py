@@ -1,9 +1,12 @@
 import os
-from app import app, db, User
+from app import create_app
+from extension import db
+from model import User
 from werkzeug.security import generate_password_hash
 # from dotenv import load_dotenv # Only needed if running this specific script directly locally outside of Flask's context
 
 def create_admin_user_for_production():
+    app = create_app()
     with app.app_context():
         # Get admin credentials from environment variables
         # These variables MUST be set on Render (and optionally in your local .env for testing)
@@ -0,0 +1,246 @@
+"""Engine tuning, read-replica routing and connection-pool metrics.
+
+`configure_engines(app)` is called by the application factory right after
+`db.init_app(app)`. It applies `SQLITE_PRAGMAS` to every new SQLite
+connection, attaches pool event listeners that feed `pool_metrics()` and,
+when `SQLALCHEMY_REPLICA_URIS` is set, creates the replica engines used by
+`RoutingSession`.
+"""
+import itertools
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+_lock = threading.Lock()
+# Per-engine event counters, keyed by the engine URL (password hidden).
+_counters = {}
+
+
+def _count(url, name):
+    with _lock:
+        counters = _counters.setdefault(url, {'connects': 0, 'checkouts': 0, 'checkins': 0, 'invalidations': 0})
+        counters[name] += 1
+
+
+def _sqlite_pragma_listener(pragmas):
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return set_sqlite_pragmas
+
+
+def configure_engine(engine, pragmas=None):
+    """Attach pragma and metrics listeners to a single engine."""
+    url = engine.url.render_as_string(hide_password=True)
+
+    if engine.dialect.name == 'sqlite' and pragmas:
+        event.listen(engine, 'connect', _sqlite_pragma_listener(pragmas))
+
+    event.listen(engine, 'connect', lambda *args: _count(url, 'connects'))
+    event.listen(engine, 'checkout', lambda *args: _count(url, 'checkouts'))
+    event.listen(engine, 'checkin', lambda *args: _count(url, 'checkins'))
+    event.listen(engine, 'invalidate', lambda *args: _count(url, 'invalidations'))
+
+
+def configure_engines(app):
+    """Configure every engine Flask-SQLAlchemy created for `app`."""
+    from config import engine_options
+    from extension import db
+
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine, pragmas)
+
+    replica_uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if replica_uris:
+        engines = []
+        for uri in replica_uris:
+            engine = sa.create_engine(uri, **engine_options(uri))
+            configure_engine(engine, pragmas)
+            engines.append(engine)
+        app.extensions['db_replicas'] = ReplicaSet(
+            engines, app.config.get('DATABASE_REPLICA_HEALTH_INTERVAL', 30))
+        init_replica_routing(app)
+
+
+def dispose_engines(app):
+    """Forget pooled connections inherited across a fork (see gunicorn.conf.py)."""
+    from extension import db
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    replicas = app.extensions.get('db_replicas')
+    if replicas:
+        engines.extend(replicas.engines)
+    for engine in engines:
+        engine.dispose(close=False)
+
+
+# --- Read replicas ---
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping unhealthy ones.
+
+    A replica is pinged with `SELECT 1` at most once per `health_interval`
+    seconds, and is marked down immediately when a query on it fails with
+    a disconnect error.
+    """
+
+    def __init__(self, engines, health_interval=30):
+        self.engines = engines
+        self.health_interval = health_interval
+        self._health = {id(engine): (True, 0.0) for engine in engines}
+        self._cycle = itertools.cycle(engines)
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect and context.engine is not None:
+            self.mark(context.engine, False)
+
+    def mark(self, engine, healthy):
+        self._health[id(engine)] = (healthy, time.monotonic())
+
+    def is_healthy(self, engine):
+        healthy, checked_at = self._health[id(engine)]
+        if time.monotonic() - checked_at < self.health_interval:
+            return healthy
+        try:
+            with engine.connect() as connection:
+                connection.execute(sa.text('SELECT 1'))
+            healthy = True
+        except Exception:
+            current_app.logger.warning('Replica %s failed health check',
+                                       engine.url.render_as_string(hide_password=True))
+            healthy = False
+        self.mark(engine, healthy)
+        return healthy
+
+    def choose(self):
+        """Return the next healthy replica engine, or None if all are down."""
+        for _ in range(len(self.engines)):
+            with self._lock:
+                engine = next(self._cycle)
+            if self.is_healthy(engine):
+                return engine
+        return None
+
+    def metrics(self):
+        return [
+            {'url': engine.url.render_as_string(hide_password=True),
+             'healthy': self._health[id(engine)][0]}
+            for engine in self.engines
+        ]
+
+
+class RoutingSession(Session):
+    """Session that sends reads to a replica when the request allows it.
+
+    The request decides (see `init_replica_routing`); within the session,
+    anything that writes (a flush, or an INSERT/UPDATE/DELETE statement)
+    goes to the primary, and once the session has written, all later
+    reads do too.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            if 'replica' not in self.info:
+                self.info['replica'] = current_app.extensions['db_replicas'].choose()
+            if self.info['replica'] is not None:
+                return self.info['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if self._flushing or self.info.get('wrote'):
+            return False
+        if clause is not None and getattr(clause, 'is_dml', False):
+            return False
+        return has_app_context() and g.get('db_read_replica', False)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _record_write(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+
+STICKY_SESSION_KEY = '_db_primary_until'
+
+
+def mark_written():
+    """Pin the visitor to the primary after this request, for writes made outside `db.session`.
+
+    `db.session` flushes are noticed on their own; writes that are deferred
+    or go through another connection (e.g. `engagement.record`) call this.
+    """
+    if has_app_context():
+        g.db_wrote = True
+
+
+def init_replica_routing(app):
+    """Route safe requests to replicas, with read-your-writes stickiness.
+
+    GET/HEAD requests outside the admin blueprint read from a replica.
+    After a request that wrote, the visitor's session is pinned to the
+    primary for DATABASE_REPLICA_STICKY_SECONDS so they see their own
+    like/comment even if replication lags.
+    """
+    sticky_seconds = app.config.get('DATABASE_REPLICA_STICKY_SECONDS', 10)
+
+    @app.before_request
+    def choose_database_route():
+        g.db_read_replica = (
+            request.method in ('GET', 'HEAD')
+            and request.blueprint != 'admin'
+            and session.get(STICKY_SESSION_KEY, 0) < time.time()
+        )
+
+    @app.after_request
+    def pin_writers_to_primary(response):
+        from extension import db
+
+        if db.session.info.get('wrote') or g.get('db_wrote'):
+            session[STICKY_SESSION_KEY] = time.time() + sticky_seconds
+        return response
+
+
+def engine_metrics(engine):
+    """Return pool occupancy and event counters for `engine`."""
+    pool = engine.pool
+    url = engine.url.render_as_string(hide_password=True)
+    metrics = {
+        'url': url,
+        'dialect': engine.dialect.name,
+        'pool_class': type(pool).__name__,
+        'status': pool.status(),
+    }
+    # QueuePool (the default for file databases and Postgres) exposes live
+    # occupancy; other pool classes only have `status()`.
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        if callable(method):
+            metrics[name] = method()
+    with _lock:
+        metrics.update(_counters.get(url, {}))
+    return metrics
+
+
+def pool_metrics():
+    """Return `engine_metrics` for every bind (and replica) of the current app."""
+    from extension import db
+
+    metrics = {key or 'default': engine_metrics(engine) for key, engine in db.engines.items()}
+    replicas = current_app.extensions.get('db_replicas')
+    if replicas:
+        for index, (engine, health) in enumerate(zip(replicas.engines, replicas.metrics())):
+            metrics[f'replica_{index}'] = dict(engine_metrics(engine), healthy=health['healthy'])
+    return metrics
@@ -0,0 +1,437 @@
+"""Buffered, write-coalescing ingest for likes and ratings.
+
+Every like or rating used to be its own transaction, which on SQLite
+serializes all workers on the write lock during a traffic spike.
+`record()` instead appends the events to a per-worker buffer. A
+background thread writes the buffer ENGAGEMENT_FLUSH_MS after the first
+event arrives, or as soon as ENGAGEMENT_BATCH_SIZE events are waiting,
+in one transaction: multi-row INSERTs into `like` and `rating`, plus one
+UPDATE per post/project for the `like_count`, `rating_count` and
+`rating_total` counters.
+
+- Crash safety: `record()` appends each event to a spool file
+  (ENGAGEMENT_SPOOL_DIR/<pid>.spool) before it returns. A flush rotates
+  the spool to `<pid>.<n>.flushing` and deletes it after the commit.
+  Spools left by a dead process are replayed by the next worker that
+  starts, or by `flask engagement flush`. Delivery is at-least-once: a
+  crash between the commit and the delete replays that batch.
+- Backpressure: at most ENGAGEMENT_MAX_PENDING events are held. While
+  the database is slow or locked, failed flushes are retried with
+  exponential backoff. `record()` waits up to ENGAGEMENT_ENQUEUE_TIMEOUT
+  seconds for room, then returns False and the view answers with
+  `busy_response()`: a 503 with Retry-After.
+
+Likes are idempotent: each carries a `liker_key` (an HMAC of the user
+id, the guest's email or a per-browser session id), a unique index allows
+one like per liker per post/project, and they are written with
+`INSERT ... ON CONFLICT DO NOTHING` (a savepoint per row on backends
+without it), so repeats are dropped by the database and never counted.
+
+Comments are not buffered; the views still commit them synchronously.
+"""
+import atexit
+import glob
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import click
+import sqlalchemy as sa
+from flask import current_app, make_response, render_template, session
+from flask.cli import AppGroup
+from flask_login import current_user
+
+from database import mark_written
+from extension import db
+from model import BlogPost, Like, Project, Rating
+
+# kind -> (foreign key column on like/rating, model)
+TARGETS = {'blog': ('post_id', BlogPost), 'project': ('project_id', Project)}
+MAX_BACKOFF = 30
+RETRY_AFTER = 5  # seconds, sent with the 503 when the buffer is full
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_spool(path):
+    events = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                # A line cut short by a crash mid-write; the event was never acknowledged.
+                continue
+    return events
+
+
+def insert_likes(connection, rows):
+    """Insert like rows, skipping any whose liker already likes that post/project.
+
+    Returns:
+        List of (post_id, project_id) of the rows actually inserted
+    """
+    table = Like.__table__
+    if connection.dialect.name in ('postgresql', 'sqlite'):
+        if connection.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return list(connection.execute(insert(table).values(rows).on_conflict_do_nothing()
+                                       .returning(table.c.post_id, table.c.project_id)))
+    # Other backends: a savepoint per row, dropping the ones the unique
+    # indexes reject (MySQL's INSERT IGNORE would hide other errors too).
+    inserted = []
+    for row in rows:
+        try:
+            with connection.begin_nested():
+                connection.execute(sa.insert(table).values(row))
+        except sa.exc.IntegrityError:
+            continue
+        inserted.append((row['post_id'], row['project_id']))
+    return inserted
+
+
+def write_events(connection, events, chunk_size=100):
+    """Insert `events` and bump the per-target counters in `connection`'s transaction.
+
+    Events for posts/projects deleted in the meantime are dropped, and so
+    are repeated likes; counters only count rows actually inserted.
+
+    Returns:
+        Set of surrogate keys (`post-<id>`, `project-<id>`) of the targets written
+    """
+    existing = {}
+    for kind, (_, model) in TARGETS.items():
+        ids = {event['id'] for event in events if event['kind'] == kind}
+        existing[kind] = set(connection.scalars(sa.select(model.id).where(model.id.in_(ids)))) if ids else set()
+
+    likes, ratings, counters = [], [], {}
+    for event in events:
+        if event['id'] not in existing.get(event['kind'], ()):
+            continue
+        column, _ = TARGETS[event['kind']]
+        row = {'date_posted': datetime.fromisoformat(event['at']), 'guest_name': event.get('guest_name'),
+               'guest_email': event.get('guest_email'), 'post_id': None, 'project_id': None, column: event['id']}
+        counter = counters.setdefault((event['kind'], event['id']), {'likes': 0, 'ratings': 0, 'total': 0})
+        if event['type'] == 'like':
+            # Spools written before likes had keys: keep them, undeduplicated.
+            likes.append(dict(row, liker_key=event.get('liker') or f'spool-{uuid.uuid4().hex}'))
+        else:
+            ratings.append(dict(row, score=event['score']))
+            counter['ratings'] += 1
+            counter['total'] += event['score']
+
+    for start in range(0, len(likes), chunk_size):
+        for post_id, project_id in insert_likes(connection, likes[start:start + chunk_size]):
+            counters[('blog', post_id) if post_id is not None else ('project', project_id)]['likes'] += 1
+    for start in range(0, len(ratings), chunk_size):
+        connection.execute(sa.insert(Rating.__table__).values(ratings[start:start + chunk_size]))
+
+    counters = {target: counter for target, counter in counters.items() if counter['likes'] or counter['ratings']}
+    for kind, (_, model) in TARGETS.items():
+        table = model.__table__
+        updates = [dict(counter, target_id=target_id) for (k, target_id), counter in counters.items() if k == kind]
+        if updates:
+            connection.execute(
+                sa.update(table).where(table.c.id == sa.bindparam('target_id')).values(
+                    like_count=table.c.like_count + sa.bindparam('likes'),
+                    rating_count=table.c.rating_count + sa.bindparam('ratings'),
+                    rating_total=table.c.rating_total + sa.bindparam('total'),
+                ),
+                updates,
+            )
+    return {f"{'post' if kind == 'blog' else 'project'}-{target_id}" for kind, target_id in counters}
+
+
+class EngagementIngest:
+    """Per-process event buffer, spool and flusher thread for one app."""
+
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.flush_interval = config.get('ENGAGEMENT_FLUSH_MS', 250) / 1000
+        self.batch_size = config.get('ENGAGEMENT_BATCH_SIZE', 100)
+        self.max_pending = config.get('ENGAGEMENT_MAX_PENDING', 5000)
+        self.enqueue_timeout = config.get('ENGAGEMENT_ENQUEUE_TIMEOUT', 0.5)
+        self.fsync = config.get('ENGAGEMENT_FSYNC', False)
+        self.spool_dir = config.get('ENGAGEMENT_SPOOL_DIR') or os.path.join(app.instance_path, 'engagement')
+        self._reset()
+
+    def _reset(self):
+        # Also run in a forked worker: it must not share the parent's
+        # buffer, spool file or (possibly held) lock.
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.pending = []
+        self.inflight = []  # rotated spool files holding the events in `pending`
+        self.flushing = 0
+        self.spool = None
+        self.sequence = 0
+        self.thread = None
+        self.closing = False
+
+    # --- Spool files ---
+
+    def _spool_path(self):
+        return os.path.join(self.spool_dir, f'{self.pid}.spool')
+
+    def _next_flushing_path(self):
+        while True:
+            self.sequence += 1
+            path = os.path.join(self.spool_dir, f'{self.pid}.{self.sequence}.flushing')
+            if not os.path.exists(path):
+                return path
+
+    def _claim_orphans(self):
+        """Adopt spools of dead processes (or of an earlier process with our pid)."""
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, '*'))):
+            name = os.path.basename(path)
+            owner = name.split('.', 1)[0]
+            if not name.endswith(('.spool', '.flushing')) or not owner.isdigit():
+                continue
+            if int(owner) != self.pid and _pid_alive(int(owner)):
+                continue
+            claimed = self._next_flushing_path()
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            events = _read_spool(claimed)
+            self.app.logger.info('Replaying %d engagement events from %s', len(events), name)
+            self.pending.extend(events)
+            self.inflight.append(claimed)
+
+    def _prepare(self):
+        # Caller holds the condition.
+        if self.pid != os.getpid():
+            self._reset()
+        if self.spool is None:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._claim_orphans()
+            self.spool = open(self._spool_path(), 'a', encoding='utf-8')
+
+    def _close_spool(self):
+        # Caller holds the condition. An empty spool is not worth replaying.
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+            if not self.pending and os.path.getsize(self._spool_path()) == 0:
+                os.remove(self._spool_path())
+
+    def _take(self):
+        """Detach every pending event with the spool files holding them."""
+        if self.spool is not None:
+            self.spool.close()
+            rotated = self._next_flushing_path()
+            os.rename(self._spool_path(), rotated)
+            self.inflight.append(rotated)
+            self.spool = open(self._spool_path(), 'a', encoding='utf-8')
+        events, files = self.pending, self.inflight
+        self.pending, self.inflight = [], []
+        self.flushing = len(events)
+        return events, files
+
+    # --- Recording ---
+
+    def record(self, events):
+        """Queue `events` (all or none); False when the buffer stays full."""
+        lines = ''.join(json.dumps(event) + '\n' for event in events)
+        with self.condition:
+            self._prepare()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='engagement-flush', daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+            deadline = time.monotonic() + self.enqueue_timeout
+            while len(self.pending) + self.flushing + len(events) > self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            self.spool.write(lines)
+            self.spool.flush()
+            if self.fsync:
+                os.fsync(self.spool.fileno())
+            self.pending.extend(events)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+        return True
+
+    # --- Flushing ---
+
+    def _write(self, events):
+        with self.app.app_context():
+            if events:
+                with db.engine.begin() as connection:
+                    keys = write_events(connection, events, self.batch_size)
+                if keys and 'cdn_purger' in current_app.extensions:
+                    from cache_policy import purge
+                    purge(keys)
+
+    def _finish(self, events, files, error=None):
+        """Settle a flush; returns True if it has to be retried."""
+        retry = isinstance(error, (sa.exc.OperationalError, sa.exc.InterfaceError))
+        with self.condition:
+            self.flushing = 0
+            if retry:
+                self.pending[:0] = events
+                self.inflight[:0] = files
+            self.condition.notify_all()
+        if retry:
+            return True
+        for path in files:
+            if error is None:
+                os.remove(path)
+            else:
+                # Not a transient failure: keep the events for inspection
+                # rather than retrying them forever.
+                os.rename(path, path[:-len('.flushing')] + '.failed')
+        return False
+
+    def _flush_once(self, events, files):
+        try:
+            self._write(events)
+        except Exception as e:
+            retry = self._finish(events, files, e)
+            self.app.logger.error('Engagement flush of %d events failed%s', len(events),
+                                  ', will retry' if retry else '; moved to .failed', exc_info=True)
+            return retry
+        self._finish(events, files)
+        return False
+
+    def _run(self):
+        backoff = 0
+        while True:
+            with self.condition:
+                while not self.pending and not self.closing:
+                    self.condition.wait()
+                if self.closing and not self.pending:
+                    return
+                deadline = time.monotonic() + max(self.flush_interval, backoff)
+                while not self.closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or (not backoff and len(self.pending) >= self.batch_size):
+                        break
+                    self.condition.wait(remaining)
+                events, files = self._take()
+            if self._flush_once(events, files):
+                if self.closing:
+                    return  # the spool files are replayed on the next start
+                backoff = min(max(backoff * 2, 0.5), MAX_BACKOFF)
+            else:
+                backoff = 0
+
+    def flush(self):
+        """Write pending events (and orphaned spools) now, in the calling thread."""
+        with self.condition:
+            self._prepare()
+            events, files = self._take()
+        retry = self._flush_once(events, files)
+        with self.condition:
+            self._close_spool()
+        return len(events), retry
+
+    def close(self, timeout=5):
+        """Flush what is pending and stop the flusher (registered with atexit)."""
+        if self.pid != os.getpid() or self.thread is None:
+            return
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        with self.condition:
+            self._close_spool()
+
+
+def liker_key(guest_email=None):
+    """Who is liking, for deduplication: the user, else the guest's email, else the browser session.
+
+    Returned as an HMAC under SECRET_KEY, so guest emails are not stored
+    a second time in the clear.
+    """
+    if current_user.is_authenticated:
+        identity = f'user:{current_user.id}'
+    elif guest_email:
+        identity = f'email:{guest_email.strip().lower()}'
+    else:
+        if 'liker_id' not in session:
+            session['liker_id'] = secrets.token_hex(16)
+        identity = f"session:{session['liker_id']}"
+    secret = current_app.config['SECRET_KEY']
+    return hmac.new(secret if isinstance(secret, bytes) else secret.encode(), identity.encode(),
+                    hashlib.sha256).hexdigest()
+
+
+def totals():
+    """Site-wide like/rating totals from the per-post/project counters (no COUNT(*) over the rows)."""
+    result = {'likes': 0, 'ratings': 0}
+    for _, model in TARGETS.values():
+        likes, ratings = db.session.execute(
+            sa.select(sa.func.coalesce(sa.func.sum(model.like_count), 0),
+                      sa.func.coalesce(sa.func.sum(model.rating_count), 0))).one()
+        result['likes'] += likes
+        result['ratings'] += ratings
+    return result
+
+
+def record(kind, target_id, like=False, rating=None, guest_name=None, guest_email=None):
+    """Queue a like and/or rating for a post (`kind='blog'`) or project.
+
+    Returns:
+        False if the buffer is full (the database is falling behind); the
+        events were not recorded and the visitor should retry.
+    """
+    base = {'kind': kind, 'id': target_id, 'guest_name': guest_name, 'guest_email': guest_email,
+            'at': datetime.utcnow().isoformat()}
+    events = []
+    if like:
+        events.append(dict(base, type='like', liker=liker_key(guest_email)))
+    if rating:
+        events.append(dict(base, type='rating', score=int(rating)))
+    if not events:
+        return True
+    if not current_app.extensions['engagement'].record(events):
+        return False
+    # Written by the flusher, not db.session: keep this visitor's next
+    # reads on the primary so they see their own like/rating.
+    mark_written()
+    return True
+
+
+def busy_response():
+    """The 503 a view returns when `record()` refused its events."""
+    response = make_response(render_template(
+        'errors/503.html', error='Your like or rating could not be recorded right now.'), 503)
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+
+def init_engagement(app):
+    app.extensions['engagement'] = EngagementIngest(app)
+
+
+engagement_cli = AppGroup('engagement', help='Like/rating ingest commands.')
+
+
+@engagement_cli.command('flush')
+def flush_command():
+    """Write spooled likes/ratings left behind by stopped workers."""
+    count, retry = current_app.extensions['engagement'].flush()
+    if retry:
+        raise click.ClickException(f'Could not write {count} events; they stay spooled.')
+    click.echo(f'Wrote {count} events')
@@ -1,12 +1,18 @@
-from flask import render_template, request
+from collections import namedtuple
+from flask import make_response, render_template, request, session
+from flask_login import current_user
+from markupsafe import escape
 from werkzeug.exceptions import HTTPException, BadRequest, Unauthorized, Forbidden, NotFound, MethodNotAllowed, RequestTimeout
+from werkzeug.http import HTTP_STATUS_CODES
 import logging
 import os
+import re
+import threading
 from logging.handlers import RotatingFileHandler, SMTPHandler
 from flask.logging import default_handler
 from time import strftime
 import traceback
-from extension import db
+from extension import db, login_manager
 
 class RequestFormatter(logging.Formatter):
     def format(self, record):
@@ -111,6 +117,92 @@ def log_error(app, error, level=logging.ERROR):
     app.logger.log(level, f"Error occurred: {error_details}")
     return error_details
 
+# --- 404/405/429 fast path ---
+
+# Probes for software this site doesn't run (WordPress, PHP apps, leaked
+# dotfiles); they get a plain-text answer without rendering a page.
+SCANNER_PATTERN = re.compile(
+    r'\.(?:php\d?|aspx?|jsp|cgi|env|ini|bak|sql)(?:$|/)|/(?:wp-|wordpress|xmlrpc|phpmyadmin|cgi-bin|\.git/|\.env)',
+    re.IGNORECASE)
+# Logged through MissCounter samples instead of one line per response.
+SAMPLED_STATUSES = {404, 405, 429}
+
+# Stands in for `request` while an error page is rendered for the cache.
+_PageRequest = namedtuple('_PageRequest', 'url base_url')
+_URL, _BASE_URL, _HOST_URL = '__error_page_url__', '__error_page_base_url__', '__error_page_host_url__'
+
+
+class MissCounter:
+    """Per-path counts of SAMPLED_STATUSES responses in this worker.
+
+    At most `max_paths` paths are counted; the oldest is dropped to make
+    room (its count starts over if it comes back).
+    """
+
+    def __init__(self, max_paths=1000):
+        self.max_paths = max_paths
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add(self, status, path):
+        """Count a response and return how many times `status` was answered for `path`."""
+        key = (status, path)
+        with self.lock:
+            count = self.counts.pop(key, 0) + 1
+            if len(self.counts) >= self.max_paths:
+                del self.counts[next(iter(self.counts))]
+            self.counts[key] = count
+        return count
+
+    def top(self, limit=20):
+        with self.lock:
+            counts = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [{'status': status, 'path': path, 'count': count} for (status, path), count in counts]
+
+
+def plain_error(code):
+    """A short text/plain error response."""
+    response = make_response(f'{code} {HTTP_STATUS_CODES[code]}\n', code)
+    response.mimetype = 'text/plain'
+    return response
+
+
+def _cached_page(app, code, template, description):
+    # Rendered once per status, for an anonymous visitor and with
+    # placeholder URLs, which are swapped for the request's (escaped) URLs on
+    # every use.
+    pages = app.extensions.setdefault('error_pages', {})
+    page = pages.get(code)
+    if page is None:
+        body = render_template(template, error=description, request=_PageRequest(_URL, _BASE_URL),
+                               current_user=login_manager.anonymous_user())
+        page = pages[code] = body.replace(str(escape(request.host_url)), _HOST_URL)
+    return (page.replace(_URL, str(escape(request.url))).replace(_BASE_URL, str(escape(request.base_url)))
+            .replace(_HOST_URL, str(escape(request.host_url))))
+
+
+def error_page(app, error, template):
+    """Response for a 404, 405 or 429.
+
+    Scanner probes and clients that don't accept HTML get `plain_error`.
+    Everyone else gets the error template, rendered once per status and
+    then served from memory to anonymous visitors; logged-in users (whose
+    header has admin links) and pages with a custom description or pending
+    flash messages are rendered each time.
+    """
+    code = error.code
+    if SCANNER_PATTERN.search(request.path) or not request.accept_mimetypes.accept_html:
+        response = plain_error(code)
+    elif (not current_user.is_anonymous or error.description != type(error).description
+          or '_flashes' in session):
+        response = make_response(render_template(template, error=error.description), code)
+    else:
+        response = make_response(_cached_page(app, code, template, error.description), code)
+    if getattr(error, 'valid_methods', None):
+        response.headers['Allow'] = ', '.join(error.valid_methods)
+    return response
+
+
 def register_error_handlers(app):
     """Register error handlers for the application."""
     
@@ -129,15 +221,14 @@ def register_error_handlers(app):
         log_error(app, error, logging.WARNING)
         return render_template('errors/403.html', error=error.description), 403
 
+    # 404s, 405s and 429s are logged by after_request_logging, sampled
     @app.errorhandler(404)
     def not_found_error(error):
-        log_error(app, error, logging.WARNING)
-        return render_template('errors/404.html', error=error.description), 404
+        return error_page(app, error, 'errors/404.html')
 
     @app.errorhandler(405)
     def method_not_allowed_error(error):
-        log_error(app, error, logging.WARNING)
-        return render_template('errors/405.html', error=error.description), 405
+        return error_page(app, error, 'errors/405.html')
 
     @app.errorhandler(408)
     def request_timeout_error(error):
@@ -146,8 +237,10 @@ def register_error_handlers(app):
 
     @app.errorhandler(429)
     def too_many_requests_error(error):
-        log_error(app, error, logging.WARNING)
-        return render_template('errors/429.html', error=error.description), 429
+        response = error_page(app, error, 'errors/429.html')
+        if getattr(error, 'retry_after', None):
+            response.headers['Retry-After'] = str(error.retry_after)
+        return response
 
     @app.errorhandler(500)
     def internal_error(error):
@@ -183,10 +276,23 @@ def register_error_handlers(app):
             
         return render_template('errors/500.html', error=description), code
 
+    misses = app.extensions['error_counts'] = MissCounter()
+    sample_every = app.config.get('ERROR_LOG_SAMPLE', 100)
+
     # After request logging
     @app.after_request
     def after_request_logging(response):
-        if response.status_code >= 400:
+        if response.status_code in SAMPLED_STATUSES:
+            # Logged the first time a path misses (unless it is a scanner
+            # probe), then once every `sample_every` times, with the count.
+            count = misses.add(response.status_code, request.path)
+            if (count == 1 and not SCANNER_PATTERN.search(request.path)) or count % sample_every == 0:
+                app.logger.warning(
+                    f"{request.remote_addr} - - [{strftime('%Y-%b-%d %H:%M:%S')}] "
+                    f"\"{request.method} {request.path} {request.scheme}\" "
+                    f"{response.status_code} - (seen {count} times) {request.user_agent}"
+                )
+        elif response.status_code >= 400:
             app.logger.warning(
                 f"{request.remote_addr} - - [{strftime('%Y-%b-%d %H:%M:%S')}] "
                 f"\"{request.method} {request.path} {request.scheme}\" "
@@ -0,0 +1,219 @@
+"""Sitemap and RSS/Atom feed generation.
+
+URLs are built from `slug` and `date_posted` only (never the full rows,
+which carry image BLOBs). Output is written as a stream of chunks while
+the query is read, and the finished document is kept in a
+`content_cache.ContentCache` until the next content commit, so crawlers
+are served from memory. Cached documents are stored already gzip/Brotli
+compressed (`compression.CompressedBody`).
+
+Up to URLS_PER_SITEMAP URLs `/sitemap.xml` is a plain <urlset>. Above that
+it becomes a <sitemapindex> pointing at `/sitemap-<n>.xml` shards, as the
+sitemaps.org protocol caps a single file at 50,000 URLs.
+"""
+import math
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from flask import current_app, url_for
+from sqlalchemy import func, select
+
+from compression import CompressedBody
+from content_cache import ContentCache
+from extension import db
+from model import BlogPost, Project
+from search_index import strip_html
+
+URLS_PER_SITEMAP = 50000
+FEED_SIZE = 20
+SUMMARY_LENGTH = 300
+# Rows fetched per round trip while streaming a shard.
+BATCH_SIZE = 1000
+# Chunks are joined into writes of about this many bytes.
+WRITE_SIZE = 64 * 1024
+# Cached documents per worker (feeds, sitemap and its shards).
+CACHE_SIZE = 64
+
+# (endpoint, priority, changefreq) for the pages that aren't rows.
+STATIC_PAGES = [
+    ('home', '1.0', 'daily'),
+    ('about', '1.0', 'daily'),
+    ('portfolio', '0.9', 'weekly'),
+    ('blog', '0.9', 'daily'),
+]
+# (model, endpoint, priority, changefreq) in sitemap order.
+DYNAMIC_PAGES = [
+    (BlogPost, 'blog_post', '0.8', 'weekly'),
+    (Project, 'project_detail', '0.7', 'monthly'),
+]
+
+cache = ContentCache(max_entries=CACHE_SIZE, name='feeds')
+
+
+def _url(endpoint, base_url, **values):
+    return escape(base_url + url_for(endpoint, **values))
+
+
+def _url_entry(loc, priority, changefreq, lastmod=None):
+    lastmod = f'<lastmod>{lastmod.strftime("%Y-%m-%d")}</lastmod>' if lastmod else ''
+    return f'<url><loc>{loc}</loc>{lastmod}<changefreq>{changefreq}</changefreq><priority>{priority}</priority></url>\n'
+
+
+def url_count(connection):
+    counts = [connection.execute(select(func.count()).select_from(model)).scalar() for model, *_ in DYNAMIC_PAGES]
+    return len(STATIC_PAGES) + sum(counts), counts
+
+
+def _urlset(connection, base_url, shard, counts):
+    """Yield the <urlset> for URLs [shard * limit, (shard + 1) * limit)."""
+    start, stop = shard * URLS_PER_SITEMAP, (shard + 1) * URLS_PER_SITEMAP
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+
+    position = 0
+    for endpoint, priority, changefreq in STATIC_PAGES:
+        if start <= position < stop:
+            yield _url_entry(_url(endpoint, base_url), priority, changefreq)
+        position += 1
+
+    for (model, endpoint, priority, changefreq), count in zip(DYNAMIC_PAGES, counts):
+        # The part of this model's rows that falls into the shard.
+        offset = max(start - position, 0)
+        limit = min(stop - position, count) - offset
+        position += count
+        if limit <= 0:
+            continue
+        stmt = (select(model.slug, model.date_posted).order_by(model.id)
+                .offset(offset).limit(limit).execution_options(yield_per=BATCH_SIZE))
+        for slug, date_posted in connection.execute(stmt):
+            yield _url_entry(_url(endpoint, base_url, slug=slug), priority, changefreq, date_posted)
+
+    yield '</urlset>\n'
+
+
+def _sitemap_index(base_url, shards):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    for shard in range(shards):
+        yield f'<sitemap><loc>{_url("feeds.sitemap_shard", base_url, shard=shard)}</loc></sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def shard_count(connection):
+    """Number of `/sitemap-<n>.xml` shards (0 when one sitemap suffices)."""
+    total, _ = url_count(connection)
+    shards = math.ceil(total / URLS_PER_SITEMAP)
+    return shards if shards > 1 else 0
+
+
+def sitemap(connection, base_url, shard=None):
+    """Chunks of `/sitemap.xml` (shard None) or of one existing shard."""
+    total, counts = url_count(connection)
+    shards = math.ceil(total / URLS_PER_SITEMAP)
+    if shard is None and shards > 1:
+        yield from _sitemap_index(base_url, shards)
+    else:
+        yield from _urlset(connection, base_url, shard or 0, counts)
+
+
+# --- Feeds ---
+
+def _recent_posts(connection):
+    stmt = (select(BlogPost.title, BlogPost.slug, BlogPost.date_posted, BlogPost.content)
+            .order_by(BlogPost.date_posted.desc(), BlogPost.id.desc()).limit(FEED_SIZE))
+    for title, slug, date_posted, content in connection.execute(stmt):
+        summary = strip_html(content)
+        if len(summary) > SUMMARY_LENGTH:
+            summary = summary[:SUMMARY_LENGTH].rsplit(' ', 1)[0] + '…'
+        yield title, slug, date_posted, summary
+
+
+def rss(connection, base_url, title, description):
+    """Chunks of an RSS 2.0 feed of the newest posts."""
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>\n'
+    yield (f'<title>{escape(title)}</title><link>{_url("blog", base_url)}</link>'
+           f'<description>{escape(description)}</description>'
+           f'<atom:link href="{_url("feeds.rss", base_url)}" rel="self" type="application/rss+xml"/>\n')
+    for post_title, slug, date_posted, summary in _recent_posts(connection):
+        link = _url('blog_post', base_url, slug=slug)
+        yield (f'<item><title>{escape(post_title)}</title><link>{link}</link><guid>{link}</guid>'
+               f'<pubDate>{date_posted.strftime("%a, %d %b %Y %H:%M:%S +0000")}</pubDate>'
+               f'<description>{escape(summary)}</description></item>\n')
+    yield '</channel></rss>\n'
+
+
+def atom(connection, base_url, title):
+    """Chunks of an Atom feed of the newest posts."""
+    posts = list(_recent_posts(connection))
+    updated = posts[0][2] if posts else datetime.utcnow()
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+    yield (f'<title>{escape(title)}</title><id>{_url("blog", base_url)}</id>'
+           f'<link href="{_url("blog", base_url)}"/><link href="{_url("feeds.atom", base_url)}" rel="self"/>'
+           f'<updated>{updated.strftime("%Y-%m-%dT%H:%M:%SZ")}</updated>\n')
+    for post_title, slug, date_posted, summary in posts:
+        link = _url('blog_post', base_url, slug=slug)
+        yield (f'<entry><title>{escape(post_title)}</title><link href="{link}"/><id>{link}</id>'
+               f'<updated>{date_posted.strftime("%Y-%m-%dT%H:%M:%SZ")}</updated>'
+               f'<summary>{escape(summary)}</summary></entry>\n')
+    yield '</feed>\n'
+
+
+# --- Cache ---
+
+def cached(key, build, check=None, store=True):
+    """Return the cached document for `key`, or a stream of chunks that fills it.
+
+    The stream runs after the view has returned, so it reads on its own
+    connection rather than the request's session.
+
+    Args:
+        key: Cache key (include everything the output depends on)
+        build: Callable taking a connection and returning an iterator of
+            str chunks
+        check: Called on a miss only, before building; may abort (e.g. 404)
+        store: False to build without caching the result
+
+    Returns:
+        A `CompressedBody` on a hit, or an iterator of bytes on a miss
+        (the complete output is compressed and cached once the stream has
+        been fully sent)
+    """
+    flight = None
+    if store:
+        # Concurrent misses for the same key wait for one stream to fill
+        # the cache, or get the previous document while it is rebuilt.
+        body, flight = cache.begin(key)
+        if flight is None:
+            return body
+    try:
+        if check is not None:
+            check()
+    except BaseException:
+        if flight is not None:
+            flight.abandon()
+        raise
+
+    def stream():
+        parts, buffer, size = [], [], 0
+        try:
+            with db.engine.connect() as connection:
+                for chunk in build(connection):
+                    buffer.append(chunk)
+                    size += len(chunk)
+                    if size >= WRITE_SIZE:
+                        data = ''.join(buffer).encode('utf-8')
+                        parts.append(data)
+                        yield data
+                        buffer, size = [], 0
+            data = ''.join(buffer).encode('utf-8')
+            parts.append(data)
+            yield data
+            if flight is not None:
+                flight.finish(CompressedBody(b''.join(parts), current_app.config.get('COMPRESS_MIN_SIZE', 1024)))
+        finally:
+            if flight is not None and not flight.done.is_set():
+                flight.abandon()
+
+    return stream()
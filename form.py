@@ -1,16 +1,52 @@
 # forms.py
+from flask import current_app, request
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SubmitField, PasswordField, BooleanField, HiddenField, IntegerField, SelectMultipleField, SelectField
 from wtforms.validators import DataRequired, Length, URL, Optional, Email, EqualTo, NumberRange, ValidationError
 from flask_wtf.file import FileField, FileAllowed # Import these for file uploads
 from wtforms_sqlalchemy.fields import QuerySelectMultipleField
+from sqlalchemy import select
+from extension import db
 from model import SubSkill, Skill
+import skill_taxonomy
 
 def subskill_query():
-    return SubSkill.query.all()
+    return skill_taxonomy.taxonomy().subskills
 
 def skill_choices():
-    return Skill.query.all()
+    return skill_taxonomy.taxonomy().skills
+
+
+class ReferenceSelectMultipleField(QuerySelectMultipleField):
+    """QuerySelectMultipleField whose options come from the cached skill taxonomy.
+
+    Building and rendering the form runs no query; `data` still holds
+    `model` rows, loaded by id for the submitted selection only.
+    """
+
+    def __init__(self, label=None, validators=None, model=None, **kwargs):
+        super().__init__(label, validators, get_pk=lambda ref: ref.id, **kwargs)
+        self.model = model
+
+    def _get_data(self):
+        if self._formdata is not None:
+            known = {pk for pk, _ in self._get_object_list()}
+            self._invalid_formdata = not self._formdata <= known
+            ids = [int(pk) for pk in self._formdata & known]
+            self._set_data(db.session.scalars(select(self.model).where(self.model.id.in_(ids))).all() if ids else [])
+        return self._data
+
+    data = property(_get_data, QuerySelectMultipleField._set_data)
+
+    def iter_choices(self):
+        selected = {obj.id for obj in self.data}
+        for pk, ref in self._get_object_list():
+            yield (pk, self.get_label(ref), ref.id in selected, self.get_render_kw(ref))
+
+    def pre_validate(self, form):
+        self._get_data()
+        if self._invalid_formdata:
+            raise ValidationError(self.gettext('Not a valid choice'))
 
 
 class BlogPostForm(FlaskForm):
@@ -24,13 +60,15 @@ class ProjectForm(FlaskForm):
     description = TextAreaField('Short Description', validators=[DataRequired(), Length(max=200)])
     content = TextAreaField('Project Details', validators=[DataRequired()])
     skills_used = StringField('Skills Used (comma-separated)', validators=[Optional(), Length(max=200)])
-    skills = QuerySelectMultipleField(
+    skills = ReferenceSelectMultipleField(
         'Skills',
+        model=Skill,
         query_factory=skill_choices,
         get_label='name'
     )
-    subskills = QuerySelectMultipleField(
+    subskills = ReferenceSelectMultipleField(
         'SubSkills',
+        model=SubSkill,
         query_factory=subskill_query,
         get_label='name'
     )
@@ -48,6 +86,14 @@ class LoginForm(FlaskForm):
     submit = SubmitField('Login')
 
 class CommentForm(FlaskForm):
+    class Meta:
+        # Post/project pages are cached by the CDN, so the token is not put
+        # into them: site.js fetches it from /csrf-token before submitting,
+        # and it is only generated and checked for the POST.
+        @property
+        def csrf(self):
+            return current_app.config.get('WTF_CSRF_ENABLED', True) and request.method not in ('GET', 'HEAD')
+
     guest_name = StringField("Name ", validators=[Optional()])
     guest_email = StringField("Email ", validators=[Optional(), Email()])
     content = TextAreaField("Comment", validators=[DataRequired()])
@@ -0,0 +1,368 @@
+"""Static pre-render ("freeze") of the public site.
+
+`flask freeze` renders every public URL (home, about, the blog pages and
+posts, the portfolio and its skill filters, images, sitemap and feeds)
+through the normal request pipeline into FREEZE_DIR (instance/frozen by
+default), in parallel worker processes, and records each page in
+`manifest.json` with the surrogate keys it rendered (see cache_policy).
+
+Commits that change content mark their keys stale (`stale.keys`, fed by
+`cache_policy.purge`), and the next `flask freeze` re-renders only the
+pages carrying one of those keys, plus new URLs; pages whose URL
+disappeared are deleted. Template or asset changes re-render everything.
+
+With STATIC_FIRST set, anonymous GET/HEAD requests for a frozen page are
+answered from disk, without touching the database, as long as none of the
+page's keys went stale since the freeze and the request is for the host
+the site was frozen for (`--base-url` or SITEMAP_BASE_URL, required, as
+pages hold absolute URLs). Pages with a form are frozen with a
+placeholder CSRF token that is replaced per request.
+"""
+import hashlib
+import json
+import math
+import mimetypes
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import click
+from flask import Response, current_app, g, request, session, url_for
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+import feeds
+from cache_policy import SITE_KEY, on_purge, page_keys, tag
+from compression import compress_static, send_precompressed
+from extension import db
+from model import BlogPost, Project, Skill, SubSkill, UploadedImage
+from utils import file_lock
+
+MANIFEST = 'manifest.json'
+STALE = 'stale.keys'
+# Stands in for the per-visitor CSRF token in frozen pages.
+CSRF_PLACEHOLDER = '__frozen_csrf_token__'
+
+
+def freeze_dir(app):
+    return app.config.get('FREEZE_DIR') or os.path.join(app.instance_path, 'frozen')
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# --- What to render ---
+
+def public_urls():
+    """Every public GET URL whose response depends only on the database."""
+    # The home page answers on both `/` and `/home`.
+    urls = [rule.rule for rule in current_app.url_map.iter_rules('home')]
+    urls += [url_for('about'), url_for('portfolio'), url_for('feeds.sitemap'), url_for('feeds.rss'), url_for('feeds.atom')]
+    connection = db.session.connection()
+    urls += [url_for('feeds.sitemap_shard', shard=shard) for shard in range(feeds.shard_count(connection))]
+
+    posts = connection.execute(select(BlogPost.id, BlogPost.slug, BlogPost.image_data.isnot(None))
+                               .order_by(BlogPost.id)).all()
+    pages = max(math.ceil(len(posts) / current_app.config['BLOG_PER_PAGE']), 1)
+    urls += [url_for('blog')] + [url_for('blog', page=page) for page in range(2, pages + 1)]
+    for post_id, slug, has_image in posts:
+        urls.append(url_for('blog_post', slug=slug))
+        if has_image:
+            urls.append(url_for('get_image', model_name='blog', image_id=post_id))
+
+    for project_id, slug, has_image in connection.execute(
+            select(Project.id, Project.slug, Project.image_data.isnot(None)).order_by(Project.id)):
+        urls.append(url_for('project_detail', slug=slug))
+        if has_image:
+            urls.append(url_for('get_image', model_name='project', image_id=project_id))
+
+    urls += [url_for('portfolio_by_skill', skill_id=skill_id)
+             for skill_id in connection.execute(select(Skill.id).order_by(Skill.id)).scalars()]
+    urls += [url_for('portfolio_by_subskill', subskill_id=subskill_id)
+             for subskill_id in connection.execute(select(SubSkill.id).order_by(SubSkill.id)).scalars()]
+    urls += [url_for('get_image', model_name='uploaded_image', image_id=image_id)
+             for image_id in connection.execute(select(UploadedImage.id).where(UploadedImage.data.isnot(None))
+                                                .order_by(UploadedImage.id)).scalars()]
+    return urls
+
+
+def build_fingerprint(app):
+    """Changes whenever a template or the asset manifest does."""
+    digest = hashlib.sha256()
+    for dirpath, _, files in sorted(os.walk(os.path.join(app.root_path, 'templates'))):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(dirpath, name))
+            digest.update(f'{dirpath}/{name}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+    try:
+        with open(os.path.join(app.static_folder, 'dist', 'manifest.json'), 'rb') as f:
+            digest.update(f.read())
+    except OSError:
+        pass
+    return digest.hexdigest()
+
+
+def file_name(url, mimetype):
+    """Path under the freeze directory for `url` (`/blog?page=2` -> blog/page=2/index.html)."""
+    path, _, query = url.partition('?')
+    path = path.strip('/')
+    if query:
+        path = f"{path}/{re.sub(r'[^A-Za-z0-9=_-]', '_', query)}"
+    if mimetype == 'text/html':
+        return f'{path}/index.html' if path else 'index.html'
+    if os.path.splitext(path)[1]:
+        return path
+    return path + (mimetypes.guess_extension(mimetype or '') or '')
+
+
+# --- Rendering ---
+
+def render(app, url, base_url):
+    """Render `url` like a request from an anonymous visitor.
+
+    Returns:
+        Dict with url, status, mimetype, body, keys and csrf (whether the
+        body contains CSRF_PLACEHOLDER), or an `error` on failure
+    """
+    # A fresh app context: `g` would otherwise be the caller's (the CLI's),
+    # shared by every page rendered in this process.
+    with app.app_context(), app.test_request_context(url, base_url=base_url):
+        g.freezing = True
+        g.csrf_token = CSRF_PLACEHOLDER
+        try:
+            response = app.full_dispatch_request()
+            response.direct_passthrough = False
+            body = response.get_data()
+        except Exception as e:
+            app.logger.error(f'Failed to freeze {url}', exc_info=True)
+            return {'url': url, 'error': str(e)}
+        keys = page_keys(app.config['CDN_CACHE_RULES'].get(request.endpoint)) - {SITE_KEY}
+        response.close()
+    return {'url': url, 'status': response.status_code, 'mimetype': response.mimetype, 'body': body,
+            'keys': sorted(keys), 'csrf': CSRF_PLACEHOLDER.encode() in body}
+
+
+_worker_app = None
+
+
+def _init_worker():
+    global _worker_app
+    from app import create_app
+
+    _worker_app = create_app(migrations=False)
+
+
+def _render_in_worker(url, base_url):
+    return render(_worker_app, url, base_url)
+
+
+def _render_all(app, urls, base_url, jobs):
+    if jobs <= 1 or len(urls) < 2:
+        return [render(app, url, base_url) for url in urls]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(urls)), initializer=_init_worker) as pool:
+        return list(pool.map(_render_in_worker, urls, [base_url] * len(urls), chunksize=4))
+
+
+# --- Stale keys ---
+
+def _stale_path(folder):
+    return os.path.join(folder, STALE)
+
+
+def read_stale(folder):
+    """Return (keys marked stale, size of the file they were read from)."""
+    try:
+        with open(_stale_path(folder), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return set(), 0
+    return set(data.decode().split()), len(data)
+
+
+def _consume_stale(folder, offset):
+    # Drop the keys this freeze has handled, keeping any marked meanwhile.
+    path = _stale_path(folder)
+    with file_lock(path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        _write(path, data[offset:])
+
+
+def mark_stale(keys):
+    """Record `keys` as changed since the last freeze (a cache_policy purge listener)."""
+    folder = freeze_dir(current_app)
+    if not os.path.exists(os.path.join(folder, MANIFEST)):
+        return
+    path = _stale_path(folder)
+    with file_lock(path):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(' '.join(sorted(keys)) + '\n')
+    site = current_app.extensions.get('frozen_site')
+    if site:
+        site.mark(keys)
+
+
+# --- Freeze ---
+
+def freeze(app, jobs=1, full=False, base_url=None):
+    """Render the public site into freeze_dir(app), incrementally by default.
+
+    Returns:
+        Dict with rendered (URLs), kept (count), removed (URLs) and errors
+        ({url: reason})
+    """
+    base_url = (base_url or app.config.get('SITEMAP_BASE_URL') or '').rstrip('/')
+    if not base_url:
+        # Pages hold absolute URLs and are only served on this host.
+        raise click.ClickException('Set SITEMAP_BASE_URL or pass --base-url, e.g. https://example.com.')
+    folder = freeze_dir(app)
+    previous = read_manifest(folder) or {}
+    stale, stale_offset = read_stale(folder)
+    build = build_fingerprint(app)
+    with app.test_request_context(base_url=base_url):
+        urls = public_urls()
+
+    old_pages = previous.get('pages', {})
+    if full or previous.get('build') != build or previous.get('base_url') != base_url or SITE_KEY in stale:
+        old_pages = {}
+    todo = [url for url in urls if url not in old_pages or stale.intersection(old_pages[url]['keys'])]
+    pages = {url: old_pages[url] for url in urls if url in old_pages and url not in todo}
+
+    errors = {}
+    for result in _render_all(app, todo, base_url, jobs):
+        url = result['url']
+        if 'error' in result or result['status'] != 200:
+            errors[url] = result.get('error') or f"HTTP {result['status']}"
+            continue
+        name = file_name(url, result['mimetype'])
+        _write(os.path.join(folder, name), result['body'])
+        pages[url] = {'file': name, 'mimetype': result['mimetype'], 'keys': result['keys'], 'csrf': result['csrf']}
+
+    removed = [url for url in previous.get('pages', {}) if url not in pages]
+    live_files = {entry['file'] for entry in pages.values()}
+    for url in removed:
+        name = previous['pages'][url]['file']
+        if name not in live_files:
+            for suffix in ('', '.gz', '.br'):
+                if os.path.exists(os.path.join(folder, name + suffix)):
+                    os.remove(os.path.join(folder, name + suffix))
+
+    compress_static(folder, app.config.get('COMPRESS_MIN_SIZE', 1024))
+    manifest = {'generated_at': datetime.utcnow().isoformat(timespec='seconds'), 'build': build,
+                'base_url': base_url, 'pages': pages}
+    _write(os.path.join(folder, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    _consume_stale(folder, stale_offset)
+    return {'rendered': [url for url in todo if url not in errors], 'kept': len(urls) - len(todo),
+            'removed': removed, 'errors': errors}
+
+
+# --- Serving ---
+
+class FrozenSite:
+    """Per-process view of the freeze manifest and stale keys, reloaded when either file changes."""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._pages = {}
+        self._host = None
+        self._stale = set()
+        self._state = None
+        self._lock = threading.Lock()
+
+    def _file_state(self, name):
+        try:
+            stat = os.stat(os.path.join(self.folder, name))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload(self):
+        state = (self._file_state(MANIFEST), self._file_state(STALE))
+        if state == self._state:
+            return
+        with self._lock:
+            manifest = read_manifest(self.folder) or {}
+            self._pages = manifest.get('pages', {})
+            self._host = urlsplit(manifest.get('base_url', '')).netloc.lower()
+            self._stale = read_stale(self.folder)[0]
+            self._state = state
+
+    def mark(self, keys):
+        with self._lock:
+            self._stale = self._stale | set(keys)
+
+    def lookup(self, url, host):
+        """The manifest entry for `url` on `host`, or None if it isn't frozen (for that host) or is stale."""
+        self._reload()
+        entry = self._pages.get(url)
+        if entry is None or host.lower() != self._host or SITE_KEY in self._stale or \
+                self._stale.intersection(entry['keys']):
+            return None
+        return entry
+
+
+def serve_frozen():
+    """before_request hook answering anonymous GETs for fresh frozen pages from disk."""
+    if request.method not in ('GET', 'HEAD') or g.get('freezing'):
+        return None
+    # Logged-in visitors and pending flash messages need a live render.
+    if '_user_id' in session or '_flashes' in session or \
+            current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') in request.cookies:
+        return None
+    url = request.path + (f'?{request.query_string.decode()}' if request.query_string else '')
+    site = current_app.extensions['frozen_site']
+    # Frozen pages carry the freeze's absolute URLs; other hosts render live.
+    entry = site.lookup(url, request.host)
+    if entry is None:
+        return None
+    tag(*entry['keys'])
+    if entry['csrf']:
+        from flask_wtf.csrf import generate_csrf
+
+        with open(os.path.join(site.folder, entry['file']), encoding='utf-8') as f:
+            body = f.read().replace(CSRF_PLACEHOLDER, generate_csrf())
+        return Response(body, mimetype=entry['mimetype'])
+    return send_precompressed(site.folder, entry['file'])
+
+
+def init_freeze(app):
+    on_purge(app, mark_stale)
+    if app.config.get('STATIC_FIRST'):
+        app.extensions['frozen_site'] = FrozenSite(freeze_dir(app))
+        app.before_request(serve_frozen)
+
+
+@click.command('freeze')
+@click.option('--jobs', '-j', type=int, default=os.cpu_count() or 1, show_default=True,
+              help='Worker processes rendering pages.')
+@click.option('--all', 'full', is_flag=True, help='Re-render every page, not only stale or new ones.')
+@click.option('--base-url', help='Scheme and host the site is served on (default: SITEMAP_BASE_URL; one is required).')
+@with_appcontext
+def freeze_command(jobs, full, base_url):
+    """Pre-render the public site into FREEZE_DIR."""
+    start = time.perf_counter()
+    result = freeze(current_app._get_current_object(), jobs=jobs, full=full, base_url=base_url)
+    for url, reason in result['errors'].items():
+        click.echo(f'Skipped {url}: {reason}', err=True)
+    click.echo(f"Rendered {len(result['rendered'])} pages, kept {result['kept']}, "
+               f"removed {len(result['removed'])} in {time.perf_counter() - start:.1f} s "
+               f"-> {freeze_dir(current_app)}")
@@ -0,0 +1,118 @@
+"""Gunicorn production configuration.
+
+Gunicorn loads ``./gunicorn.conf.py`` automatically, so the start command
+is simply ``gunicorn`` (or ``gunicorn -c gunicorn.conf.py``). Settings can
+be overridden through environment variables:
+
+    GUNICORN_PROFILE   gthread (default), gevent or sync
+    WEB_CONCURRENCY    number of worker processes (default 2 * CPUs + 1)
+    GUNICORN_THREADS   threads per worker for the gthread profile (default 4)
+    PORT               port to bind on (default 5000)
+
+The app is preloaded in the master and the heap is frozen with
+``gc.freeze()`` before forking, so workers share the imported code and
+config pages copy-on-write instead of each holding a private copy.
+Database connections are never shared across the fork: every worker
+disposes the inherited engine pool in ``post_fork``.
+
+The gevent profile does not preload: the gevent worker monkey-patches
+the standard library only after the fork, so an app imported in the
+master would keep unpatched sockets, locks and threads (the engagement
+flusher, the DB pool). Each gevent worker imports the app itself, after
+patching.
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:application'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# --- Worker profiles ---
+# Page views and `get_image` spend most of their time waiting on the
+# database and the socket, so threads (or greenlets) keep a worker busy
+# while a slow client drains an image. `sync` is kept for comparison.
+PROFILES = {
+    'gthread': {
+        'worker_class': 'gthread',
+        'threads': int(os.environ.get('GUNICORN_THREADS', '4')),
+    },
+    'gevent': {
+        # Requires `pip install gevent`.
+        'worker_class': 'gevent',
+        'worker_connections': 200,
+    },
+    'sync': {
+        'worker_class': 'sync',
+    },
+}
+
+profile = os.environ.get('GUNICORN_PROFILE', 'gthread')
+if profile not in PROFILES:
+    raise ValueError(f"Unknown GUNICORN_PROFILE '{profile}', expected one of: {', '.join(PROFILES)}")
+globals().update(PROFILES[profile])
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# --- Memory ---
+preload_app = profile != 'gevent'
+# Recycle workers so slow leaks (and pages un-shared by refcount writes)
+# are bounded; the jitter keeps workers from restarting all at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+# --- Timeouts ---
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Heartbeat files on tmpfs avoid worker stalls on slow container disks.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# --- Logging ---
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def _application(server):
+    """Return the preloaded Flask app held by the arbiter."""
+    return server.app.wsgi()
+
+
+def when_ready(server):
+    """Freeze the preloaded heap before any worker is forked.
+
+    Objects created during import are moved to a permanent generation the
+    collector never scans, so workers don't touch (and copy) those pages
+    when a collection runs.
+    """
+    gc.collect()
+    gc.freeze()
+    server.log.info('Froze %d objects after preload', gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    """Drop pooled DB connections inherited from the master.
+
+    `close=False` leaves the parent's sockets alone and just forgets them,
+    so each worker opens its own connections on first use. Without
+    preloading there is nothing inherited, and loading the app here would
+    import it before the gevent worker patches the standard library.
+    """
+    if not server.cfg.preload_app:
+        return
+    from database import dispose_engines
+
+    dispose_engines(_application(server))
+    server.log.debug('Worker %s disposed inherited engine pools', worker.pid)
+
+
+def post_worker_init(worker):
+    """Warm the worker's caches in the background once it has loaded the app.
+
+    Runs after the gevent worker patched the standard library, so the
+    warming thread is a greenlet there (see warm.py).
+    """
+    warmer = getattr(worker.wsgi, 'extensions', {}).get('cache_warmer')
+    if warmer is not None:
+        warmer.schedule()
@@ -0,0 +1,333 @@
+"""Database maintenance: online snapshots, compaction and bloat reports.
+
+Images live in BLOB columns, so the database grows with every upload and,
+on SQLite, keeps the pages of deleted posts, projects and images as free
+pages inside the file. `flask maintenance`:
+
+- `snapshot [DEST]` (SQLite) copies the live database with SQLite's online
+  backup API, `--pages` pages per step with a pause in between, so writers
+  are only held up for one step at a time. Snapshots go to BACKUP_DIR
+  (instance/backups by default); `run` keeps the newest BACKUP_KEEP.
+- `compact` (SQLite) returns free pages to the file system with
+  `PRAGMA incremental_vacuum`, in steps as well. That needs
+  `auto_vacuum = INCREMENTAL`; `compact --full` switches an existing
+  database over with one full `VACUUM` (which blocks writers while it
+  runs). On Postgres it runs a plain `VACUUM (ANALYZE)` on tables with
+  many dead rows.
+- `report` shows free pages (SQLite) or estimated bloat per table
+  (Postgres) and the last runs.
+- `run` snapshots, compacts and records what it did, including the space
+  reclaimed, in MAINTENANCE_STATE_PATH (instance/maintenance.json).
+
+Commits that delete posts, projects or uploaded images schedule `run`
+themselves: when the last run is older than MAINTENANCE_INTERVAL seconds
+they start `flask maintenance run` as a separate process (see
+refresh_jobs; nothing is started with BACKGROUND_REFRESH off). Cron can
+call `flask maintenance run` as well; concurrent runs skip.
+"""
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import refresh_jobs
+from content_cache import file_version
+from extension import db
+from model import BlogPost, Project, UploadedImage
+from utils import file_lock
+
+# Rows whose deletion leaves BLOB pages behind.
+BLOB_MODELS = (BlogPost, Project, UploadedImage)
+_DELETED_KEY = 'maintenance_deleted'
+# Postgres tables with more dead rows than this share of live ones are vacuumed.
+DEAD_ROW_RATIO = 0.2
+HISTORY = 20
+
+
+def state_path(app):
+    return app.config.get('MAINTENANCE_STATE_PATH') or os.path.join(app.instance_path, 'maintenance.json')
+
+
+def backup_dir(app):
+    return app.config.get('BACKUP_DIR') or os.path.join(app.instance_path, 'backups')
+
+
+def read_state(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'runs': []}
+
+
+def _write_state(path, state):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def sqlite_path(engine):
+    """Path of the SQLite database file behind `engine`, or None for other databases."""
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return None
+    return engine.url.database
+
+
+def _connect(path):
+    # A connection of our own, in autocommit mode: VACUUM and the
+    # auto_vacuum switch can't run inside the pool's transactions.
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute('PRAGMA busy_timeout = 30000')
+    return connection
+
+
+# --- SQLite ---
+
+def sqlite_stats(path):
+    """Page size, page count, free pages (and their bytes) and auto_vacuum mode."""
+    connection = _connect(path)
+    try:
+        page_size, page_count, free_pages, auto_vacuum = (
+            connection.execute(f'PRAGMA {name}').fetchone()[0]
+            for name in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum'))
+    finally:
+        connection.close()
+    return {'page_size': page_size, 'pages': page_count, 'free_pages': free_pages,
+            'size': page_size * page_count, 'free_bytes': page_size * free_pages,
+            'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(auto_vacuum, auto_vacuum)}
+
+
+def snapshot_sqlite(path, dest, pages=256, sleep=0.05):
+    """Copy the database at `path` to `dest` with the online backup API.
+
+    Each step copies `pages` pages and holds the source only for that long;
+    a write by another connection restarts the copy from the first page.
+    """
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    tmp_path = f'{dest}.tmp'
+    source, target = _connect(path), sqlite3.connect(tmp_path)
+    try:
+        source.backup(target, pages=pages, sleep=sleep)
+    finally:
+        target.close()
+        source.close()
+    os.replace(tmp_path, dest)
+    return dest
+
+
+def prune_snapshots(folder, keep):
+    """Delete all but the newest `keep` snapshots in `folder`."""
+    names = sorted(name for name in os.listdir(folder) if name.endswith('.db'))
+    for name in names[:max(len(names) - keep, 0)]:
+        os.remove(os.path.join(folder, name))
+
+
+def compact_sqlite(path, pages=512, sleep=0.05, full=False):
+    """Give free pages back to the file system.
+
+    Returns:
+        Dict with the stats before and after and the bytes reclaimed
+    """
+    before = sqlite_stats(path)
+    connection = _connect(path)
+    try:
+        if before['auto_vacuum'] != 'incremental':
+            if not full:
+                raise click.ClickException('auto_vacuum is off; run `flask maintenance compact --full` once '
+                                           '(a full VACUUM, which blocks writers while it runs).')
+            connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            connection.execute('VACUUM')
+        else:
+            # Each step is a short write transaction; the pause lets
+            # waiting writers in. executescript() steps the pragma until
+            # done (execute() would free a single page).
+            while connection.execute('PRAGMA freelist_count').fetchone()[0]:
+                connection.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+                time.sleep(sleep)
+        # Shrink the WAL too, unless readers are still using it.
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    finally:
+        connection.close()
+    after = sqlite_stats(path)
+    # Switching to incremental mode adds pointer-map pages: nothing reclaimed.
+    return {'before': before, 'after': after, 'reclaimed': max(before['size'] - after['size'], 0)}
+
+
+# --- Postgres ---
+
+def postgres_bloat(connection):
+    """Dead rows and the estimated bytes they take, per table, most bloated first."""
+    rows = connection.execute(text(
+        'SELECT relname, n_live_tup, n_dead_tup, pg_total_relation_size(relid) AS size, '
+        'last_vacuum, last_autovacuum FROM pg_stat_user_tables ORDER BY n_dead_tup DESC')).mappings()
+    report = []
+    for row in rows:
+        total = row['n_live_tup'] + row['n_dead_tup']
+        report.append({'table': row['relname'], 'live_rows': row['n_live_tup'], 'dead_rows': row['n_dead_tup'],
+                       'size': row['size'], 'bloat': int(row['size'] * row['n_dead_tup'] / total) if total else 0,
+                       'last_vacuum': str(max(filter(None, (row['last_vacuum'], row['last_autovacuum'])),
+                                              default=None))})
+    return report
+
+
+def vacuum_postgres(engine):
+    """VACUUM (ANALYZE) the tables with many dead rows.
+
+    Returns:
+        Dict with the bloat report from before and the bytes reclaimed
+    """
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        before = postgres_bloat(connection)
+        preparer = connection.dialect.identifier_preparer
+        for table in before:
+            if table['dead_rows'] > DEAD_ROW_RATIO * max(table['live_rows'], 1):
+                connection.exec_driver_sql(f"VACUUM (ANALYZE) {preparer.quote(table['table'])}")
+        after = {table['table']: table['size'] for table in postgres_bloat(connection)}
+    return {'before': before, 'reclaimed': sum(table['size'] - after.get(table['table'], table['size'])
+                                               for table in before)}
+
+
+# --- Runs ---
+
+def run(app, pages=256, sleep=0.05):
+    """Snapshot and compact the database and record the run.
+
+    Returns:
+        The run record, or None if another run holds the lock
+    """
+    path = state_path(app)
+    with file_lock(path, blocking=False) as locked:
+        if not locked:
+            return None
+        started = time.perf_counter()
+        record = {'started_at': datetime.utcnow().isoformat(timespec='seconds')}
+        database = sqlite_path(db.engine)
+        if database:
+            name = datetime.utcnow().strftime('site-%Y%m%d-%H%M%S.db')
+            record['snapshot'] = snapshot_sqlite(database, os.path.join(backup_dir(app), name), pages, sleep)
+            prune_snapshots(backup_dir(app), app.config.get('BACKUP_KEEP', 7))
+            stats = sqlite_stats(database)
+            if stats['auto_vacuum'] == 'incremental':
+                result = compact_sqlite(database, pages, sleep)
+                record.update(reclaimed=result['reclaimed'], free_pages=result['after']['free_pages'])
+            else:
+                record.update(reclaimed=0, free_pages=stats['free_pages'],
+                              note='auto_vacuum is off; run `flask maintenance compact --full` once')
+        elif db.engine.dialect.name == 'postgresql':
+            record['reclaimed'] = vacuum_postgres(db.engine)['reclaimed']
+        record['seconds'] = round(time.perf_counter() - started, 2)
+        state = read_state(path)
+        state['runs'] = ([record] + state.get('runs', []))[:HISTORY]
+        _write_state(path, state)
+    return record
+
+
+def is_due(app):
+    """Whether the last run is older than MAINTENANCE_INTERVAL seconds."""
+    last = file_version(state_path(app))
+    return last is None or time.time_ns() - last > app.config.get('MAINTENANCE_INTERVAL', 86400) * 10**9
+
+
+# --- Schedule a run after deletions ---
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    if any(isinstance(obj, BLOB_MODELS) for obj in session.deleted):
+        session.info[_DELETED_KEY] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _schedule_run(session):
+    if not session.info.pop(_DELETED_KEY, False) or not has_app_context():
+        return
+    try:
+        if is_due(current_app):
+            refresh_jobs.queue(state_path(current_app), {'deleted': True}, ('maintenance', 'run'))
+    except Exception:
+        current_app.logger.error('Failed to schedule database maintenance', exc_info=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_DELETED_KEY, None)
+
+
+# --- CLI ---
+
+maintenance_cli = AppGroup('maintenance', help='Database snapshot and compaction commands.')
+
+
+def _mb(size):
+    return f'{size / 1024 / 1024:.1f} MB'
+
+
+def _require_sqlite(command):
+    path = sqlite_path(db.engine)
+    if path is None:
+        raise click.ClickException(f'`{command}` needs a SQLite database; back up Postgres with pg_dump '
+                                   'or `flask content export`.')
+    return path
+
+
+@maintenance_cli.command('snapshot')
+@click.argument('dest', required=False)
+@click.option('--pages', type=int, default=256, show_default=True, help='Pages copied per step.')
+def snapshot_command(dest, pages):
+    """Copy the live SQLite database to DEST (default: a new file in BACKUP_DIR)."""
+    path = _require_sqlite('snapshot')
+    dest = dest or os.path.join(backup_dir(current_app), datetime.utcnow().strftime('site-%Y%m%d-%H%M%S.db'))
+    snapshot_sqlite(path, dest, pages)
+    click.echo(f'Wrote {dest} ({_mb(os.path.getsize(dest))}).')
+
+
+@maintenance_cli.command('compact')
+@click.option('--pages', type=int, default=512, show_default=True, help='Pages freed per step.')
+@click.option('--full', is_flag=True, help='Switch to incremental auto_vacuum with a full VACUUM if needed.')
+def compact_command(pages, full):
+    """Return free pages to the file system (SQLite) or vacuum bloated tables (Postgres)."""
+    if db.engine.dialect.name == 'postgresql':
+        click.echo(f"Reclaimed {_mb(vacuum_postgres(db.engine)['reclaimed'])}.")
+        return
+    result = compact_sqlite(_require_sqlite('compact'), pages, full=full)
+    click.echo(f"Reclaimed {_mb(result['reclaimed'])}: {_mb(result['before']['size'])} -> "
+               f"{_mb(result['after']['size'])}, {result['after']['free_pages']} free pages left.")
+
+
+@maintenance_cli.command('report')
+def report_command():
+    """Show free space (SQLite) or table bloat (Postgres) and the last runs."""
+    path = sqlite_path(db.engine)
+    if path:
+        stats = sqlite_stats(path)
+        click.echo(f"{path}: {_mb(stats['size'])}, {stats['free_pages']} free pages ({_mb(stats['free_bytes'])}), "
+                   f"auto_vacuum {stats['auto_vacuum']}")
+    elif db.engine.dialect.name == 'postgresql':
+        with db.engine.connect() as connection:
+            for table in postgres_bloat(connection):
+                click.echo(f"{table['table']}: {_mb(table['size'])}, {table['dead_rows']} dead rows "
+                           f"(~{_mb(table['bloat'])}), last vacuum {table['last_vacuum']}")
+    for record in read_state(state_path(current_app))['runs'][:5]:
+        click.echo(f"Run {record['started_at']}: reclaimed {_mb(record.get('reclaimed', 0))}"
+                   + (f", snapshot {record['snapshot']}" if record.get('snapshot') else ''))
+
+
+@maintenance_cli.command('run')
+def run_command():
+    """Snapshot and compact the database, recording the space reclaimed."""
+    # Clear what the commits that scheduled this run recorded.
+    refresh_jobs.apply_pending(state_path(current_app), lambda pending: None)
+    record = run(current_app._get_current_object())
+    if record is None:
+        click.echo('Another maintenance run is in progress.')
+        return
+    click.echo(f"Reclaimed {_mb(record.get('reclaimed', 0))} in {record['seconds']} s"
+               + (f"; snapshot {record['snapshot']}" if record.get('snapshot') else '') + '.')
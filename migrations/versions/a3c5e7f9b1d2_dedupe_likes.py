@@ -0,0 +1,35 @@
+"""Add like.liker_key with one like per liker per post/project
+
+Revision ID: a3c5e7f9b1d2
+Revises: f2b4d6e8a0c1
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f9b1d2'
+down_revision = 'f2b4d6e8a0c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('like') as batch_op:
+        batch_op.add_column(sa.Column('liker_key', sa.String(length=64), nullable=True))
+    # Existing likes carry no reliable identity; give each its own key so
+    # they are kept (and stay counted) rather than guessing at duplicates.
+    op.execute("UPDATE \"like\" SET liker_key = 'legacy-' || id")
+    with op.batch_alter_table('like') as batch_op:
+        batch_op.alter_column('liker_key', existing_type=sa.String(length=64), nullable=False)
+    op.create_index('uq_like_post_id_liker_key', 'like', ['post_id', 'liker_key'], unique=True)
+    op.create_index('uq_like_project_id_liker_key', 'like', ['project_id', 'liker_key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_like_project_id_liker_key', table_name='like')
+    op.drop_index('uq_like_post_id_liker_key', table_name='like')
+    with op.batch_alter_table('like') as batch_op:
+        batch_op.drop_column('liker_key')
@@ -0,0 +1,69 @@
+"""Add full-text search index for blog posts and projects
+
+Revision ID: b7e2c91f4a3d
+Revises: 691144dedacc
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+import re
+from html import unescape
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c91f4a3d'
+down_revision = '691144dedacc'
+branch_labels = None
+depends_on = None
+
+
+def _strip_html(html):
+    return re.sub(r'\s+', ' ', unescape(re.sub(r'<[^>]+>', ' ', html or ''))).strip()
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE search_document USING fts5("
+            "kind UNINDEXED, ref_id UNINDEXED, slug UNINDEXED, title, body, "
+            "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        id_column = 'rowid'
+    else:
+        op.execute(
+            "CREATE TABLE search_document ("
+            "id BIGINT PRIMARY KEY, "
+            "kind VARCHAR(16) NOT NULL, "
+            "ref_id INTEGER NOT NULL, "
+            "slug VARCHAR(120) NOT NULL, "
+            "title TEXT NOT NULL, "
+            "body TEXT NOT NULL, "
+            "tsv tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED)"
+        )
+        op.execute("CREATE INDEX ix_search_document_tsv ON search_document USING GIN (tsv)")
+        id_column = 'id'
+
+    # Backfill existing content. Row ids match search_index.doc_id().
+    insert = sa.text(
+        f'INSERT INTO search_document ({id_column}, kind, ref_id, slug, title, body) '
+        'VALUES (:id, :kind, :ref_id, :slug, :title, :body)'
+    )
+    for row in bind.execute(sa.text('SELECT id, slug, title, content FROM blog_post')):
+        bind.execute(insert, {'id': row.id * 2, 'kind': 'blog', 'ref_id': row.id, 'slug': row.slug,
+                              'title': row.title, 'body': _strip_html(row.content)})
+    for row in bind.execute(sa.text('SELECT id, slug, title, description, content, skills_used FROM project')):
+        body = ' '.join(part for part in (row.description, _strip_html(row.content), row.skills_used) if part)
+        bind.execute(insert, {'id': row.id * 2 + 1, 'kind': 'project', 'ref_id': row.id, 'slug': row.slug,
+                              'title': row.title, 'body': body})
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        op.execute("DROP INDEX IF EXISTS ix_search_document_tsv")
+    op.execute("DROP TABLE search_document")
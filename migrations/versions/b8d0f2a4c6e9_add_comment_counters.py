@@ -0,0 +1,32 @@
+"""Add comment_count to blog_post and project
+
+Revision ID: b8d0f2a4c6e9
+Revises: a3c5e7f9b1d2
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d0f2a4c6e9'
+down_revision = 'a3c5e7f9b1d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, column in (('blog_post', 'post_id'), ('project', 'project_id')):
+        op.add_column(table, sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'))
+        # Backfill; comment_pages keeps them up to date from here on.
+        op.execute(
+            f'UPDATE {table} SET '
+            f'comment_count = (SELECT count(*) FROM comment WHERE comment.{column} = {table}.id)'
+        )
+
+
+def downgrade():
+    for table in ('project', 'blog_post'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('comment_count')
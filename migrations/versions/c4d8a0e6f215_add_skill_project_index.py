@@ -0,0 +1,48 @@
+"""Add materialized skill_project index and Skill.project_count
+
+Revision ID: c4d8a0e6f215
+Revises: b7e2c91f4a3d
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8a0e6f215'
+down_revision = 'b7e2c91f4a3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('skill_project',
+    sa.Column('skill_id', sa.Integer(), nullable=False),
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['skill_id'], ['skill.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['project_id'], ['project.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('skill_id', 'project_id')
+    )
+    op.create_index('ix_skill_project_project_id', 'skill_project', ['project_id'])
+    op.create_index('ix_project_subskill_subskill_id', 'project_subskill', ['subskill_id'])
+    op.add_column('skill', sa.Column('project_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the existing project ↔ subskill links.
+    op.execute(
+        'INSERT INTO skill_project (skill_id, project_id) '
+        'SELECT DISTINCT sub_skill.skill_id, project_subskill.project_id '
+        'FROM project_subskill JOIN sub_skill ON sub_skill.id = project_subskill.subskill_id'
+    )
+    op.execute(
+        'UPDATE skill SET project_count = '
+        '(SELECT count(*) FROM skill_project WHERE skill_project.skill_id = skill.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('skill') as batch_op:
+        batch_op.drop_column('project_count')
+    op.drop_index('ix_project_subskill_subskill_id', table_name='project_subskill')
+    op.drop_index('ix_skill_project_project_id', table_name='skill_project')
+    op.drop_table('skill_project')
@@ -0,0 +1,36 @@
+"""Add related_content table for related posts/projects
+
+Revision ID: d1f5b3a7c902
+Revises: c4d8a0e6f215
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f5b3a7c902'
+down_revision = 'c4d8a0e6f215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('related_content',
+    sa.Column('source_kind', sa.String(length=16), nullable=False),
+    sa.Column('source_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('target_kind', sa.String(length=16), nullable=False),
+    sa.Column('target_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('source_kind', 'source_id', 'rank')
+    )
+    op.create_index('ix_related_content_target', 'related_content', ['target_kind', 'target_id'])
+    # The table is filled by `flask related rebuild` (needs scikit-learn),
+    # not by the migration.
+
+
+def downgrade():
+    op.drop_index('ix_related_content_target', table_name='related_content')
+    op.drop_table('related_content')
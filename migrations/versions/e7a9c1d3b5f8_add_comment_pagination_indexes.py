@@ -0,0 +1,29 @@
+"""Add (post_id/project_id, date_posted, id) indexes on comment
+
+Revision ID: e7a9c1d3b5f8
+Revises: d1f5b3a7c902
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a9c1d3b5f8'
+down_revision = 'd1f5b3a7c902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset pagination compares (date_posted, id), which never matches a
+    # NULL date; older rows get one so they still appear.
+    op.execute('UPDATE comment SET date_posted = CURRENT_TIMESTAMP WHERE date_posted IS NULL')
+    op.create_index('ix_comment_post_id_date_posted', 'comment', ['post_id', 'date_posted', 'id'])
+    op.create_index('ix_comment_project_id_date_posted', 'comment', ['project_id', 'date_posted', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_comment_project_id_date_posted', table_name='comment')
+    op.drop_index('ix_comment_post_id_date_posted', table_name='comment')
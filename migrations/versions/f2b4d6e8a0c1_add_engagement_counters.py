@@ -0,0 +1,39 @@
+"""Add like/rating counters to blog_post and project
+
+Revision ID: f2b4d6e8a0c1
+Revises: e7a9c1d3b5f8
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b4d6e8a0c1'
+down_revision = 'e7a9c1d3b5f8'
+branch_labels = None
+depends_on = None
+
+COUNTERS = ('like_count', 'rating_count', 'rating_total')
+
+
+def upgrade():
+    for table, column in (('blog_post', 'post_id'), ('project', 'project_id')):
+        for counter in COUNTERS:
+            op.add_column(table, sa.Column(counter, sa.Integer(), nullable=False, server_default='0'))
+        # Backfill from the existing rows; the engagement ingest keeps
+        # them up to date from here on.
+        op.execute(
+            f'UPDATE {table} SET '
+            f'like_count = (SELECT count(*) FROM "like" WHERE "like".{column} = {table}.id), '
+            f'rating_count = (SELECT count(*) FROM rating WHERE rating.{column} = {table}.id), '
+            f'rating_total = (SELECT coalesce(sum(score), 0) FROM rating WHERE rating.{column} = {table}.id)'
+        )
+
+
+def downgrade():
+    for table in ('project', 'blog_post'):
+        with op.batch_alter_table(table) as batch_op:
+            for counter in reversed(COUNTERS):
+                batch_op.drop_column(counter)
@@ -2,9 +2,15 @@
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import hashlib
 from extension import db
 
 
+def password_version(password_hash):
+    """Short fingerprint of a password hash, carried in session ids (see User.get_id)."""
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:16]
+
+
 # --- SQLAlchemy Models (DEFINED AT THE TOP LEVEL) ---
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -17,6 +23,11 @@ class User(db.Model, UserMixin):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def get_id(self):
+        # Changing the password changes the id stored in sessions and
+        # remember-me cookies, which logs out every other session.
+        return f'{self.id}:{password_version(self.password_hash)}'
+
     def __repr__(self):
         return f"User('{self.username}')"
 
@@ -29,8 +40,15 @@ class BlogPost(db.Model):
     image_filename = db.Column(db.String(100), nullable=False, default='default.jpg')
     image_data = db.Column(db.LargeBinary, nullable=True)
     image_mimetype = db.Column(db.String(50), nullable=True)
-
-    comments = db.relationship('Comment', backref='blog_post', lazy=True)
+    # Maintained by the engagement ingest alongside the like/rating rows.
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Maintained by comment_pages on every flush that adds/removes comments.
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Dynamic: pages read comments a page at a time (see comment_pages).
+    comments = db.relationship('Comment', backref='blog_post', lazy='dynamic')
     ratings = db.relationship('Rating', backref='blog_post', lazy=True)
     likes = db.relationship('Like', backref='blog_post', lazy=True)
 
@@ -41,7 +59,34 @@ class BlogPost(db.Model):
 project_subskill = db.Table(
     'project_subskill',
     db.Column('project_id', db.Integer, db.ForeignKey('project.id'), primary_key=True),
-    db.Column('subskill_id', db.Integer, db.ForeignKey('sub_skill.id'), primary_key=True)
+    db.Column('subskill_id', db.Integer, db.ForeignKey('sub_skill.id'), primary_key=True),
+    # The primary key covers lookups by project; this one covers by subskill.
+    db.Index('ix_project_subskill_subskill_id', 'subskill_id')
+)
+
+# Materialized Skill → Project mapping derived from project_subskill and
+# SubSkill.skill_id. Maintained by skill_index; never edit it directly.
+skill_project = db.Table(
+    'skill_project',
+    db.Column('skill_id', db.Integer, db.ForeignKey('skill.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('project_id', db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_skill_project_project_id', 'project_id')
+)
+
+# Precomputed "related content" for blog posts and projects: the top-k most
+# similar documents (TF-IDF cosine) per source. Kinds are 'blog'/'project'.
+# Maintained by related_index; never edit it directly.
+related_content = db.Table(
+    'related_content',
+    db.Column('source_kind', db.String(16), primary_key=True),
+    db.Column('source_id', db.Integer, primary_key=True),
+    db.Column('rank', db.Integer, primary_key=True),
+    db.Column('target_kind', db.String(16), nullable=False),
+    db.Column('target_id', db.Integer, nullable=False),
+    db.Column('score', db.Float, nullable=False),
+    # The primary key serves the detail pages; this one finds the sources
+    # pointing at a document that changed or was deleted.
+    db.Index('ix_related_content_target', 'target_kind', 'target_id')
 )
 
 class Project(db.Model):
@@ -57,9 +102,14 @@ class Project(db.Model):
     image_data = db.Column(db.LargeBinary, nullable=True)
     image_mimetype = db.Column(db.String(50), nullable=True)
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
-
-
-    comments = db.relationship('Comment', backref='project', lazy=True)
+    # Maintained by the engagement ingest alongside the like/rating rows.
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Maintained by comment_pages on every flush that adds/removes comments.
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    comments = db.relationship('Comment', backref='project', lazy='dynamic')
     ratings = db.relationship('Rating', backref='project', lazy=True)
     likes = db.relationship('Like', backref='project', lazy=True)
     subskills = db.relationship('SubSkill', secondary=project_subskill, back_populates='projects')
@@ -78,6 +128,8 @@ class Skill(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
     description = db.Column(db.String(200), nullable=True)
+    # Maintained by skill_index: number of projects using any subskill of this skill
+    project_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     subskills = db.relationship('SubSkill', backref='skill', lazy=True)
 
     def __repr__(self):
@@ -109,6 +161,12 @@ class Comment(db.Model):
     post_id = db.Column(db.Integer, db.ForeignKey('blog_post.id'), nullable=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=True)
 
+    # Keyset pagination of a post's/project's comments in date order.
+    __table_args__ = (
+        db.Index('ix_comment_post_id_date_posted', 'post_id', 'date_posted', 'id'),
+        db.Index('ix_comment_project_id_date_posted', 'project_id', 'date_posted', 'id'),
+    )
+
     def __repr__(self):
         who = self.guest_name or 'Anonymous'
         return f"Comment(by {who}, '{self.content[:20]}...')"
@@ -141,6 +199,14 @@ class Like(db.Model):
 
     post_id = db.Column(db.Integer, db.ForeignKey('blog_post.id'), nullable=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=True)
+    # HMAC of who liked (see engagement.liker_key): one like per liker per
+    # post/project, enforced by the unique indexes below.
+    liker_key = db.Column(db.String(64), nullable=False)
+
+    __table_args__ = (
+        db.Index('uq_like_post_id_liker_key', 'post_id', 'liker_key', unique=True),
+        db.Index('uq_like_project_id_liker_key', 'project_id', 'liker_key', unique=True),
+    )
 
     def __repr__(self):
         who = self.guest_name or 'Anonymous'
@@ -0,0 +1,121 @@
+"""In-process cache of public pages for anonymous visitors (PAGE_CACHE).
+
+With PAGE_CACHE set, anonymous GET/HEAD responses that the CDN policy
+would cache (see `cache_policy.is_cacheable`) are kept per worker, up to
+PAGE_CACHE_SIZE pages, and answered without running the view. Images are
+kept like pages; streamed responses and anything larger than
+PAGE_CACHE_MAX_BYTES are not.
+
+Every purge (content commits, comments, likes and ratings) touches a stamp
+file (PAGE_STAMP_PATH, instance/pages.stamp by default) that invalidates
+the pages of every worker. Misses go through `ContentCache.begin`, so
+when a popular page has just been invalidated one request re-renders it
+while the concurrent ones get the previous copy (or wait for the new one
+if there is none) instead of all rendering it at once.
+"""
+import os
+from collections import namedtuple
+
+from flask import current_app, g, request, session
+
+from cache_policy import is_cacheable, on_purge, tag
+from compression import CompressedBody, is_compressible, precompressed_response
+from content_cache import ContentCache, file_version, touch_file
+
+CachedPage = namedtuple('CachedPage', 'body mimetype keys')
+
+# Served from disk or fingerprinted already; not worth a copy in memory.
+SKIP_ENDPOINTS = {'static', 'assets'}
+
+
+def stamp_path(app):
+    return app.config.get('PAGE_STAMP_PATH') or os.path.join(app.instance_path, 'pages.stamp')
+
+
+def page_version():
+    return file_version(stamp_path(current_app))
+
+
+def invalidate(keys=None):
+    """Drop every worker's cached pages (a cache_policy purge listener)."""
+    touch_file(stamp_path(current_app))
+
+
+def _page_key():
+    url = request.path + (f'?{request.query_string.decode()}' if request.query_string else '')
+    return request.host.lower(), url
+
+
+def _eligible():
+    if request.method not in ('GET', 'HEAD') or g.get('freezing') or request.endpoint in SKIP_ENDPOINTS:
+        return False
+    if request.endpoint not in current_app.config['CDN_CACHE_RULES']:
+        return False
+    # Logged-in visitors and pending flash messages need a live render.
+    return not ('_user_id' in session or '_flashes' in session or
+                current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') in request.cookies)
+
+
+def serve_cached_page():
+    """before_request hook answering anonymous requests from the page cache."""
+    if not _eligible():
+        return None
+    cache = current_app.extensions['page_cache']
+    page, flight = cache.begin(_page_key(), current_app.config.get('PAGE_CACHE_WAIT', 5))
+    if flight is not None:
+        g.page_flight = flight
+        return None
+    if page is None:
+        return None
+    tag(*page.keys)
+    return precompressed_response(page.body, page.mimetype)
+
+
+def store_page(response):
+    """after_request hook: hand the rendered page to the requests waiting for it."""
+    flight = g.pop('page_flight', None)
+    if flight is None:
+        return response
+    rule = current_app.config['CDN_CACHE_RULES'].get(request.endpoint)
+    max_bytes = current_app.config.get('PAGE_CACHE_MAX_BYTES', 512 * 1024)
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or not is_cacheable(response, rule)):
+        flight.abandon()
+        return response
+    if response.direct_passthrough:
+        # send_file (images): a file of known length, read into memory once.
+        if response.content_length is None or response.content_length > max_bytes:
+            flight.abandon()
+            return response
+        response.direct_passthrough = False
+    elif response.is_streamed:
+        flight.abandon()
+        return response
+    data = response.get_data()
+    if len(data) > max_bytes:
+        flight.abandon()
+        return response
+    min_size = current_app.config.get('COMPRESS_MIN_SIZE', 1024) if is_compressible(response.mimetype) else len(data) + 1
+    body = CompressedBody(data, min_size)
+    flight.finish(CachedPage(body, response.mimetype, frozenset(g.get('surrogate_keys', ()))))
+    return response
+
+
+def _abandon_unfinished(exc):
+    # The view raised before a response was built.
+    flight = g.pop('page_flight', None)
+    if flight is not None:
+        flight.abandon()
+
+
+def init_page_cache(app):
+    if not app.config.get('PAGE_CACHE'):
+        return
+    app.extensions['page_cache'] = ContentCache(max_entries=app.config.get('PAGE_CACHE_SIZE', 128),
+                                                version=page_version, name='pages')
+    on_purge(app, invalidate)
+    app.before_request(serve_cached_page)
+    # Registered after compression, so it runs before it and stores the
+    # uncompressed body.
+    app.after_request(store_page)
+    app.teardown_request(_abandon_unfinished)
@@ -0,0 +1,193 @@
+"""Token-bucket rate limiting for the expensive POST endpoints.
+
+Each policy gives a client (`client_address()`) a bucket of `burst`
+tokens that refills at `rate` tokens per `per` seconds; a request takes
+one token or is answered with 429 and a `Retry-After` header. Views opt in
+with `@rate_limit('<policy>')`, which runs before the view touches the
+form, the session user or the database, so a rejection costs a dict
+lookup.
+
+Buckets live in memory per worker by default, so the effective limit is
+per worker. With RATE_LIMIT_STORAGE set to a file path, buckets are kept
+in a small SQLite database shared by every worker on the host instead
+(one short write transaction per limited request). If that database
+can't be used the worker falls back to its own buckets rather than
+failing the request.
+
+Behind a reverse proxy or CDN every request comes from the proxy's
+address, so the client is taken from what the trusted proxies report:
+RATE_LIMIT_KEY_HEADER names a header set by the edge (e.g.
+CF-Connecting-IP), and RATE_LIMIT_PROXY_COUNT is how many proxies append
+to X-Forwarded-For (the client is the address the outermost one saw).
+Without either, the socket's remote address is used.
+
+Policies are in DEFAULT_POLICIES and can be overridden (or disabled with
+None) through RATE_LIMITS; RATE_LIMIT_ENABLED turns the whole thing off.
+"""
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, request
+from werkzeug.exceptions import TooManyRequests
+
+# policy -> {'rate': tokens, 'per': seconds, 'burst': bucket size}
+DEFAULT_POLICIES = {
+    # Comment/like/rating form on post and project pages.
+    'feedback': {'rate': 5, 'per': 60, 'burst': 5},
+    # Password hashing in User.check_password.
+    'login': {'rate': 10, 'per': 60, 'burst': 5},
+    # Pillow decoding/resizing in save_image_to_db.
+    'upload': {'rate': 30, 'per': 60, 'burst': 10},
+}
+
+
+def _take(tokens, stamp, now, rate, burst):
+    """Refill a bucket to `now` and try to take a token.
+
+    Returns:
+        Tuple of (allowed, tokens_left, retry_after_seconds).
+    """
+    tokens = min(burst, tokens + (now - stamp) * rate)
+    if tokens >= 1:
+        return True, tokens - 1, 0
+    return False, tokens, (1 - tokens) / rate
+
+
+class MemoryBackend:
+    """Buckets in a dict, per worker process.
+
+    At most `max_keys` buckets are kept; the oldest is dropped to make room
+    (a dropped bucket just starts full again).
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        if self.pid != os.getpid():
+            self._reset()
+        with self.lock:
+            tokens, stamp = self.buckets.pop(key, (burst, now))
+            allowed, tokens, retry_after = _take(tokens, stamp, now, rate, burst)
+            if len(self.buckets) >= self.max_keys:
+                del self.buckets[next(iter(self.buckets))]
+            self.buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+
+class SQLiteBackend:
+    """Buckets in a SQLite file shared by all workers on the host."""
+
+    def __init__(self, path, timeout=0.2):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS bucket '
+                               '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL)')
+            self.local.connection, self.local.pid = connection, os.getpid()
+        return connection
+
+    def take(self, key, rate, burst, now):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, stamp FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, stamp = row or (burst, now)
+            allowed, tokens, retry_after = _take(tokens, stamp, now, rate, burst)
+            connection.execute('INSERT INTO bucket (key, tokens, stamp) VALUES (?, ?, ?) '
+                               'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, stamp = excluded.stamp',
+                               (key, tokens, max(now, stamp)))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+
+class RateLimiter:
+    def __init__(self, policies, backend):
+        self.policies = policies
+        self.backend = backend
+        self.fallback = MemoryBackend()
+
+    def hit(self, policy, client):
+        """Take a token from `client`'s bucket for `policy`.
+
+        Returns:
+            Seconds until a token is available, or 0 if the request may proceed.
+        """
+        limits = self.policies.get(policy)
+        if not limits:
+            return 0
+        rate = limits['rate'] / limits['per']
+        burst = limits.get('burst', limits['rate'])
+        key = f'{policy}:{client}'
+        now = time.time()
+        try:
+            allowed, retry_after = self.backend.take(key, rate, burst, now)
+        except (sqlite3.Error, OSError):
+            current_app.logger.warning('Shared rate limit storage unavailable; using per-worker limits',
+                                       exc_info=True)
+            allowed, retry_after = self.fallback.take(key, rate, burst, now)
+        return 0 if allowed else retry_after
+
+
+def client_address():
+    """The current client's address, as reported by the configured trusted proxies."""
+    header = current_app.config.get('RATE_LIMIT_KEY_HEADER')
+    if header and request.headers.get(header, '').strip():
+        return request.headers[header].strip()
+    count = current_app.config.get('RATE_LIMIT_PROXY_COUNT', 0)
+    if count:
+        # Only the last `count` entries were added by our proxies; anything
+        # before them came from the client and can be forged.
+        forwarded = [value.strip() for value in request.headers.get('X-Forwarded-For', '').split(',')
+                     if value.strip()]
+        if len(forwarded) >= count:
+            return forwarded[-count]
+    return request.remote_addr
+
+
+def rate_limit(policy, methods=('POST',)):
+    """Limit the decorated view's `methods` requests with `policy`.
+
+    Place it below `@route` and above `@login_required`, so rejected
+    requests never load the user.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            if limiter is not None and request.method in methods:
+                retry_after = limiter.hit(policy, client_address())
+                if retry_after:
+                    raise TooManyRequests(retry_after=math.ceil(retry_after))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def init_rate_limit(app):
+    if not app.config.get('RATE_LIMIT_ENABLED', True):
+        return
+    policies = {**DEFAULT_POLICIES, **(app.config.get('RATE_LIMITS') or {})}
+    storage = app.config.get('RATE_LIMIT_STORAGE')
+    app.extensions['rate_limiter'] = RateLimiter(policies, SQLiteBackend(storage) if storage else MemoryBackend())
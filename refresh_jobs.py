@@ -0,0 +1,94 @@
+"""Deferred refreshes of the skill analytics snapshot and related-content index.
+
+Both are derived with NumPy, SciPy and scikit-learn, which web workers
+never import. A commit that changes projects or posts therefore only
+records what changed in a pending file next to the index
+(`<path>.pending`) and starts `flask <group> refresh` as a separate,
+short-lived process. That process applies everything pending under the
+index's file lock and exits. Commits made meanwhile start another one,
+which waits for the lock and picks up the rest.
+
+With BACKGROUND_REFRESH off (tests, or when cron runs the refresh
+commands instead) nothing is spawned, and the changes wait for the next
+`flask skills refresh-analytics` / `flask related refresh`.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from flask import current_app
+
+from utils import file_lock
+
+
+def pending_path(path):
+    return f'{path}.pending'
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _merge(path, changes):
+    # Caller holds the lock. Lists are merged as sets, flags are or-ed.
+    pending = _read(path)
+    for name, value in changes.items():
+        if isinstance(value, bool):
+            pending[name] = pending.get(name, False) or value
+        else:
+            items = {tuple(item) if isinstance(item, list) else item for item in pending.get(name, [])}
+            pending[name] = sorted(items | {tuple(item) if isinstance(item, list) else item for item in value})
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(pending, f)
+    os.replace(tmp_path, path)
+
+
+def queue(path, changes, command):
+    """Record `changes` to the index at `path` and start `flask <command>` to apply them.
+
+    Args:
+        path: The snapshot/index file the changes apply to
+        changes: Dict of lists (merged as sets) and flags (or-ed)
+        command: Flask CLI arguments, e.g. ('related', 'refresh')
+    """
+    with file_lock(pending_path(path)):
+        _merge(pending_path(path), changes)
+    if not current_app.config.get('BACKGROUND_REFRESH', True):
+        return
+    try:
+        subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', *command],
+                         cwd=current_app.root_path, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+    except OSError:
+        current_app.logger.error('Could not start `flask %s`; changes stay pending', ' '.join(command),
+                                 exc_info=True)
+
+
+def apply_pending(path, apply):
+    """Take the changes pending for `path` and pass them to `apply`.
+
+    If `apply` raises, the changes are put back for the next run.
+
+    Returns:
+        The changes applied, or None if nothing was pending
+    """
+    with file_lock(pending_path(path)):
+        pending = _read(pending_path(path))
+        if pending:
+            os.remove(pending_path(path))
+    if not pending:
+        return None
+    try:
+        apply(pending)
+    except Exception:
+        with file_lock(pending_path(path)):
+            _merge(pending_path(path), pending)
+        raise
+    return pending
@@ -0,0 +1,332 @@
+"""Related posts/projects from an offline TF-IDF index.
+
+`rebuild()` vectorizes every blog post and project (title plus visible
+text) with scikit-learn's
+TfidfVectorizer, finds each document's TOP_K nearest neighbours by cosine
+similarity and stores them in the `related_content` table. The fitted
+vectorizer and the document matrix are saved next to it
+(RELATED_INDEX_PATH, instance/related_index.joblib by default).
+
+When posts or projects are created, edited or deleted, `update_documents()`
+re-vectorizes only those documents with the saved vocabulary, and
+recomputes the neighbour lists of the documents they can affect: their
+own, those that pointed at them, and those they now outrank. The IDF
+weights are refreshed by the next full rebuild. Committed changes are
+applied by a separate `flask related refresh` process (see refresh_jobs),
+so scikit-learn never runs in a web worker or an admin request.
+
+Detail pages read the stored rows with `related_items()`, a single query
+on the table's primary key; scikit-learn is only imported by the indexer.
+"""
+import os
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, event, func, insert, inspect, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+import cache_policy
+import refresh_jobs
+from extension import db
+from model import BlogPost, Project, related_content
+from search_index import strip_html
+from utils import file_lock
+
+INDEX_VERSION = 1
+TOP_K = 4
+# Neighbours below this cosine similarity are not worth recommending.
+MIN_SCORE = 0.05
+# Rows of the similarity matrix computed at once while ranking.
+BATCH_SIZE = 256
+
+ENDPOINTS = {'blog': 'blog_post', 'project': 'project_detail'}
+_CONTENT_ATTRS = ('title', 'content', 'description', 'skills_used')
+_PENDING_KEY = 'related_index_pending'
+_DIRTY_KEY = 'related_index_dirty'
+
+
+def index_path(app):
+    return app.config.get('RELATED_INDEX_PATH') or os.path.join(app.instance_path, 'related_index.joblib')
+
+
+def _text(kind, row):
+    if kind == 'blog':
+        return f'{row.title} {strip_html(row.content)}'
+    return ' '.join(part for part in (row.title, row.description, strip_html(row.content), row.skills_used) if part)
+
+
+def load_documents(connection, keys=None):
+    """Return {(kind, id): text} for `keys`, or for every post and project."""
+    documents = {}
+    for kind, columns in (
+        ('blog', (BlogPost.id, BlogPost.title, BlogPost.content)),
+        ('project', (Project.id, Project.title, Project.description, Project.content, Project.skills_used)),
+    ):
+        id_column = columns[0]
+        # Only text columns: the image BLOBs never leave the database.
+        stmt = select(*columns).order_by(id_column)
+        if keys is not None:
+            ids = [ref_id for key_kind, ref_id in keys if key_kind == kind]
+            if not ids:
+                continue
+            stmt = stmt.where(id_column.in_(ids))
+        for row in connection.execute(stmt):
+            documents[(kind, row.id)] = _text(kind, row)
+    return documents
+
+
+def _vectorizer():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer(stop_words='english', sublinear_tf=True, max_df=0.8, strip_accents='unicode')
+
+
+def _rank(matrix, rows):
+    """Yield (row, [(column, score), ...]) with the TOP_K neighbours of each row."""
+    import numpy as np
+
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        # Rows are L2-normalized, so the dot product is the cosine similarity.
+        scores = (matrix[batch] @ matrix.T).toarray()
+        scores[np.arange(len(batch)), batch] = 0
+        k = min(TOP_K, scores.shape[1] - 1)
+        if k <= 0:
+            for row in batch:
+                yield row, []
+            continue
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for i, row in enumerate(batch):
+            columns = sorted(top[i], key=lambda column: (-scores[i, column], column))
+            yield row, [(int(column), float(scores[i, column])) for column in columns if scores[i, column] >= MIN_SCORE]
+
+
+def _store(connection, keys, neighbours):
+    """Replace the related_content rows for the sources in `neighbours`."""
+    sources = [keys[row] for row in neighbours]
+    for start in range(0, len(sources), 500):
+        connection.execute(delete(related_content).where(
+            tuple_(related_content.c.source_kind, related_content.c.source_id).in_(sources[start:start + 500])))
+    values = [
+        {'source_kind': keys[row][0], 'source_id': keys[row][1], 'rank': rank,
+         'target_kind': keys[column][0], 'target_id': keys[column][1], 'score': round(score, 4)}
+        for row, ranked in neighbours.items()
+        for rank, (column, score) in enumerate(ranked)
+    ]
+    if values:
+        connection.execute(insert(related_content), values)
+
+
+def _save(path, vectorizer, keys, matrix):
+    import joblib
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    joblib.dump({'version': INDEX_VERSION, 'vectorizer': vectorizer, 'keys': keys, 'matrix': matrix}, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _load(path):
+    import joblib
+
+    try:
+        state = joblib.load(path)
+    except (OSError, ValueError, EOFError):
+        return None
+    return state if state.get('version') == INDEX_VERSION else None
+
+
+def rebuild(connection, path):
+    """Fit the vectorizer on every document and recompute all neighbours.
+
+    Returns:
+        Number of documents indexed
+    """
+    with file_lock(path):
+        documents = load_documents(connection)
+        keys = list(documents)
+        connection.execute(delete(related_content))
+        if not keys:
+            return 0
+        vectorizer = _vectorizer()
+        try:
+            matrix = vectorizer.fit_transform(documents.values()).tocsr()
+        except ValueError:
+            # Nothing but stop words: nothing can be related yet.
+            return 0
+        _store(connection, keys, dict(_rank(matrix, list(range(len(keys))))))
+        _save(path, vectorizer, keys, matrix)
+    return len(keys)
+
+
+def update_documents(connection, path, keys):
+    """Re-index the documents in `keys` (created, edited or deleted).
+
+    Returns:
+        Number of neighbour lists recomputed, or None when there is no
+        saved index yet (the caller should `rebuild()` instead)
+    """
+    from scipy import sparse
+
+    with file_lock(path):
+        state = _load(path)
+        if state is None:
+            return None
+        keys = set(keys)
+        documents = load_documents(connection, keys)
+        deleted = keys - set(documents)
+
+        kept = [row for row, key in enumerate(state['keys']) if key not in keys]
+        changed = list(documents)
+        all_keys = [state['keys'][row] for row in kept] + changed
+        parts = [state['matrix'][kept]]
+        if changed:
+            parts.append(state['vectorizer'].transform(documents.values()).tocsr())
+        matrix = sparse.vstack(parts).tocsr()
+        position = {key: row for row, key in enumerate(all_keys)}
+
+        # Documents that linked to a changed/deleted one may lose or reorder it.
+        affected = set(changed)
+        targets = list(keys)
+        for start in range(0, len(targets), 500):
+            affected.update(tuple(source) for source in connection.execute(
+                select(related_content.c.source_kind, related_content.c.source_id).where(
+                    tuple_(related_content.c.target_kind, related_content.c.target_id).in_(targets[start:start + 500]))))
+
+        # Documents whose weakest neighbour now scores below a changed one.
+        if changed:
+            weakest = {
+                (kind, ref_id): (count, low)
+                for kind, ref_id, count, low in connection.execute(
+                    select(related_content.c.source_kind, related_content.c.source_id,
+                           func.count(), func.min(related_content.c.score))
+                    .group_by(related_content.c.source_kind, related_content.c.source_id))
+            }
+            new_rows = [position[key] for key in changed]
+            best = (matrix @ matrix[new_rows].T).toarray()
+            best[new_rows, range(len(new_rows))] = 0
+            best = best.max(axis=1)
+            for row, score in enumerate(best):
+                if score < MIN_SCORE:
+                    continue
+                count, low = weakest.get(all_keys[row], (0, 0.0))
+                if count < TOP_K or score > low:
+                    affected.add(all_keys[row])
+
+        if deleted:
+            connection.execute(delete(related_content).where(
+                tuple_(related_content.c.source_kind, related_content.c.source_id).in_(list(deleted))))
+        rows = sorted(position[key] for key in affected if key in position)
+        _store(connection, all_keys, dict(_rank(matrix, rows)))
+        _save(path, state['vectorizer'], all_keys, matrix)
+    return len(rows)
+
+
+def related_items(kind, ref_id, limit=TOP_K):
+    """Related posts/projects for one document, best match first.
+
+    Returns:
+        list of dicts with kind, id, slug, title, score and the `endpoint`
+        to link to
+    """
+    stmt = (
+        select(related_content.c.target_kind, related_content.c.target_id, related_content.c.score,
+               func.coalesce(BlogPost.title, Project.title).label('title'),
+               func.coalesce(BlogPost.slug, Project.slug).label('slug'))
+        .outerjoin(BlogPost, and_(related_content.c.target_kind == 'blog',
+                                  BlogPost.id == related_content.c.target_id))
+        .outerjoin(Project, and_(related_content.c.target_kind == 'project',
+                                 Project.id == related_content.c.target_id))
+        .where(related_content.c.source_kind == kind, related_content.c.source_id == ref_id,
+               # Skip targets deleted since the index was last updated.
+               or_(BlogPost.id.isnot(None), Project.id.isnot(None)))
+        .order_by(related_content.c.rank)
+        .limit(limit)
+    )
+    items = [
+        {'kind': row.target_kind, 'id': row.target_id, 'slug': row.slug, 'title': row.title,
+         'score': row.score, 'endpoint': ENDPOINTS[row.target_kind]}
+        for row in db.session.execute(stmt)
+    ]
+    # The page shows these titles, so editing one must purge it too.
+    cache_policy.tag(*(f"{'post' if item['kind'] == 'blog' else 'project'}-{item['id']}" for item in items))
+    return items
+
+
+# --- Keep the index in sync with committed changes ---
+
+def _key(obj):
+    return ('blog' if isinstance(obj, BlogPost) else 'project', obj.id)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    pending = session.info.setdefault(_PENDING_KEY, {'objects': set(), 'keys': set()})
+    for obj in session.new:
+        if isinstance(obj, (BlogPost, Project)):
+            pending['objects'].add(obj)
+    for obj in session.dirty:
+        if isinstance(obj, (BlogPost, Project)):
+            state = inspect(obj)
+            if any(name in state.attrs and state.attrs[name].history.has_changes() for name in _CONTENT_ATTRS):
+                pending['keys'].add(_key(obj))
+    for obj in session.deleted:
+        if isinstance(obj, (BlogPost, Project)):
+            pending['keys'].add(_key(obj))
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    keys = pending['keys'] | {_key(obj) for obj in pending['objects'] if obj.id is not None}
+    if keys:
+        session.info.setdefault(_DIRTY_KEY, set()).update(keys)
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_index(session):
+    keys = session.info.pop(_DIRTY_KEY, None)
+    if not keys or not has_app_context():
+        return
+    # Applied by a separate process after the admin's commit; a failure
+    # only leaves the recommendations stale until the next update or rebuild.
+    try:
+        refresh_jobs.queue(index_path(current_app), {'keys': sorted(keys)}, ('related', 'refresh'))
+    except Exception:
+        current_app.logger.error('Failed to queue related content update', exc_info=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_DIRTY_KEY, None)
+
+
+related_cli = AppGroup('related', help='Related content index commands.')
+
+
+@related_cli.command('rebuild')
+def rebuild_command():
+    """Refit the TF-IDF index and recompute related content for every document."""
+    path = index_path(current_app)
+    with db.engine.begin() as connection:
+        count = rebuild(connection, path)
+    click.echo(f'Indexed {count} documents into {path}.')
+
+
+@related_cli.command('refresh')
+def refresh_command():
+    """Re-index the posts/projects changed by commits since the last refresh."""
+    path = index_path(current_app)
+
+    def apply(pending):
+        keys = {tuple(key) for key in pending.get('keys', [])}
+        with db.engine.begin() as connection:
+            if update_documents(connection, path, keys) is None:
+                rebuild(connection, path)
+
+    pending = refresh_jobs.apply_pending(path, apply)
+    click.echo('No pending changes.' if pending is None else f"Re-indexed {len(pending['keys'])} documents.")
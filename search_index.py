@@ -0,0 +1,262 @@
+"""Full-text search over blog posts and projects.
+
+Both backends use a `search_document` table with one row per post or
+project: kind ('blog' or 'project'), ref_id, slug, title and body (HTML
+stripped). On SQLite it is an FTS5 virtual table; on Postgres it is a plain
+table with a generated `tsvector` column and a GIN index. The row id is
+derived from (kind, ref_id), so keeping a document in sync is a primary-key
+delete plus insert.
+
+Mapper events on BlogPost and Project update the index inside the same
+transaction as the content change, so admin create/edit/delete (or any
+other write path) can never leave the index stale.
+"""
+import base64
+import json
+import re
+from html import unescape
+
+import click
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+from sqlalchemy import event, text
+from sqlalchemy.orm import load_only
+
+from extension import db
+from model import BlogPost, Project
+
+KINDS = ('blog', 'project')
+
+# Highlight markers returned by snippet()/ts_headline(); replaced by <mark>
+# after the surrounding text has been HTML-escaped.
+_START, _STOP = '\x02', '\x03'
+
+SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_document USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, slug UNINDEXED, title, body, "
+    "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')",
+]
+
+POSTGRES_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS search_document ("
+    "id BIGINT PRIMARY KEY, "
+    "kind VARCHAR(16) NOT NULL, "
+    "ref_id INTEGER NOT NULL, "
+    "slug VARCHAR(120) NOT NULL, "
+    "title TEXT NOT NULL, "
+    "body TEXT NOT NULL, "
+    "tsv tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED)",
+    "CREATE INDEX IF NOT EXISTS ix_search_document_tsv ON search_document USING GIN (tsv)",
+]
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def strip_html(html):
+    """Return the visible text of an HTML fragment."""
+    return _SPACE_RE.sub(' ', unescape(_TAG_RE.sub(' ', html or ''))).strip()
+
+
+def doc_id(kind, ref_id):
+    """Stable row id for a document: posts are even, projects odd."""
+    return ref_id * len(KINDS) + KINDS.index(kind)
+
+
+def document_for(obj):
+    """Return the (kind, ref_id, slug, title, body) tuple to index for `obj`."""
+    if isinstance(obj, BlogPost):
+        return 'blog', obj.id, obj.slug, obj.title, strip_html(obj.content)
+    body = ' '.join(part for part in (obj.description, strip_html(obj.content), obj.skills_used) if part)
+    return 'project', obj.id, obj.slug, obj.title, body
+
+
+def create_schema(connection):
+    statements = SQLITE_SCHEMA if connection.dialect.name == 'sqlite' else POSTGRES_SCHEMA
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+# search_document is not a model, so `db.create_all()`/`drop_all()` (the
+# `python app.py` bootstrap, tests) would otherwise leave it out and every
+# post/project save would fail in `_on_save`.
+@event.listens_for(db.metadata, 'after_create')
+def _create_with_metadata(target, connection, **kw):
+    create_schema(connection)
+
+
+@event.listens_for(db.metadata, 'after_drop')
+def _drop_with_metadata(target, connection, **kw):
+    connection.execute(text('DROP TABLE IF EXISTS search_document'))
+
+
+def _id_column(connection):
+    return 'rowid' if connection.dialect.name == 'sqlite' else 'id'
+
+
+def remove_document(connection, kind, ref_id):
+    connection.execute(
+        text(f'DELETE FROM search_document WHERE {_id_column(connection)} = :id'),
+        {'id': doc_id(kind, ref_id)}
+    )
+
+
+def index_document(connection, kind, ref_id, slug, title, body):
+    """Insert or replace the index row for one post/project."""
+    remove_document(connection, kind, ref_id)
+    connection.execute(
+        text(f'INSERT INTO search_document ({_id_column(connection)}, kind, ref_id, slug, title, body) '
+             'VALUES (:id, :kind, :ref_id, :slug, :title, :body)'),
+        {'id': doc_id(kind, ref_id), 'kind': kind, 'ref_id': ref_id, 'slug': slug, 'title': title, 'body': body}
+    )
+
+
+# --- Sync with content changes ---
+
+def _on_save(mapper, connection, target):
+    index_document(connection, *document_for(target))
+
+
+def _on_delete(mapper, connection, target):
+    remove_document(connection, 'blog' if isinstance(target, BlogPost) else 'project', target.id)
+
+
+for _model in (BlogPost, Project):
+    event.listen(_model, 'after_insert', _on_save)
+    event.listen(_model, 'after_update', _on_save)
+    event.listen(_model, 'after_delete', _on_delete)
+
+
+# --- Querying ---
+
+def _terms(query):
+    return _TOKEN_RE.findall(query.lower())[:16]
+
+
+def encode_cursor(score, row_id):
+    raw = json.dumps([score, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (score, row_id) from a cursor string, or None if it is invalid."""
+    if not cursor:
+        return None
+    try:
+        score, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return float(score), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _highlight(value):
+    return Markup(str(escape(value)).replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def _sqlite_search(connection, terms, limit, after):
+    # Every term must match; the trailing * makes each one a prefix query.
+    match = ' '.join(f'"{term}"*' for term in terms)
+    score = 'bm25(search_document, 0.0, 0.0, 0.0, 10.0, 1.0)'
+    keyset = f'AND ({score} > :score OR ({score} = :score AND rowid > :row_id))' if after else ''
+    sql = (
+        f'SELECT rowid AS row_id, kind, ref_id, slug, '
+        f"highlight(search_document, 3, :start, :stop) AS title, "
+        f"snippet(search_document, 4, :start, :stop, '…', 24) AS snippet, "
+        f'{score} AS score '
+        f'FROM search_document WHERE search_document MATCH :match {keyset} '
+        f'ORDER BY score, rowid LIMIT :limit'
+    )
+    params = {'match': match, 'start': _START, 'stop': _STOP, 'limit': limit}
+    if after:
+        params.update(score=after[0], row_id=after[1])
+    return connection.execute(text(sql), params).mappings().all()
+
+
+def _postgres_search(connection, terms, limit, after):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    score = '-ts_rank_cd(tsv, q)'
+    keyset = f'AND ({score} > :score OR ({score} = :score AND id > :row_id))' if after else ''
+    options = f'StartSel={_START}, StopSel={_STOP}, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" … "'
+    sql = (
+        f'SELECT id AS row_id, kind, ref_id, slug, '
+        f"ts_headline('english', title, q, 'HighlightAll=true, StartSel={_START}, StopSel={_STOP}') AS title, "
+        f"ts_headline('english', body, q, :options) AS snippet, "
+        f'{score} AS score '
+        f"FROM search_document, to_tsquery('english', :tsquery) AS q "
+        f'WHERE tsv @@ q {keyset} ORDER BY score, id LIMIT :limit'
+    )
+    params = {'tsquery': tsquery, 'options': options, 'limit': limit}
+    if after:
+        params.update(score=after[0], row_id=after[1])
+    return connection.execute(text(sql), params).mappings().all()
+
+
+def search(connection, query, limit=10, after=None):
+    """Run a ranked, prefix-matching search.
+
+    Args:
+        connection: SQLAlchemy connection to search with
+        query: Free-text query from the visitor
+        limit: Maximum number of results to return
+        after: Cursor from a previous page (keyset pagination)
+
+    Returns:
+        Tuple of (results, next_cursor). Each result is a dict with kind,
+        ref_id, slug, the `endpoint` to link to and Markup-safe
+        `title`/`snippet` containing <mark> highlights. next_cursor is None
+        on the last page.
+    """
+    terms = _terms(query)
+    if not terms:
+        return [], None
+
+    run = _sqlite_search if connection.dialect.name == 'sqlite' else _postgres_search
+    # Fetch one extra row to know whether there is a next page.
+    rows = run(connection, terms, limit + 1, decode_cursor(after))
+
+    results = []
+    for row in rows[:limit]:
+        results.append({
+            'kind': row['kind'],
+            'ref_id': row['ref_id'],
+            'slug': row['slug'],
+            'endpoint': 'blog_post' if row['kind'] == 'blog' else 'project_detail',
+            'title': _highlight(row['title']),
+            'snippet': _highlight(row['snippet']),
+        })
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last['score'], last['row_id'])
+    return results, next_cursor
+
+
+def reindex(connection, batch_size=500):
+    """Rebuild the whole index from BlogPost and Project rows."""
+    connection.execute(text('DELETE FROM search_document'))
+    count = 0
+    for model, columns in ((BlogPost, (BlogPost.id, BlogPost.slug, BlogPost.title, BlogPost.content)),
+                           (Project, (Project.id, Project.slug, Project.title, Project.description,
+                                      Project.content, Project.skills_used))):
+        # load_only keeps the image BLOBs out of memory.
+        query = db.session.query(model).options(load_only(*columns)).order_by(model.id)
+        for obj in query.yield_per(batch_size):
+            index_document(connection, *document_for(obj))
+            count += 1
+    return count
+
+
+search_cli = AppGroup('search', help='Full-text search index commands.')
+
+
+@search_cli.command('reindex')
+def reindex_command():
+    """Rebuild the search index from all posts and projects."""
+    connection = db.session.connection()
+    create_schema(connection)
+    count = reindex(connection)
+    db.session.commit()
+    click.echo(f'Indexed {count} documents.')
@@ -0,0 +1,449 @@
+"""Skill co-occurrence analytics.
+
+A batch job reads `project_subskill` into a sparse project × subskill
+incidence matrix A (one row per project, a 1 for every subskill it uses)
+and derives, in one vectorized pass:
+
+- co-occurrence C = AᵀA: C[i, j] is the number of projects using both
+  subskills, and the diagonal is the number of projects per subskill;
+- similarity: cosine C[i, j] / sqrt(C[i, i] * C[j, j]), kept as the top
+  RELATED_LIMIT neighbours of each subskill;
+- recency: the newest `Project.date_posted` per subskill.
+
+The result is written atomically to a JSON snapshot (SKILL_ANALYTICS_PATH,
+instance/skill_analytics.json by default). Web workers load it once and
+keep it in memory, re-reading it only when the file changes, so pages
+never query or import NumPy/SciPy for it; only the job does.
+
+When projects change, `update_projects()` applies
+C += a_newᵀa_new - a_oldᵀa_old for just those projects and re-derives the
+lists from C, instead of re-reading every project. Adding, removing,
+renaming or moving a subskill rebuilds the snapshot from scratch. Both
+run in a separate `flask skills refresh-analytics` process started after
+the commit (see refresh_jobs), never in the web worker.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+import refresh_jobs
+from extension import db
+from model import Project, Skill, SubSkill, project_subskill
+from skill_index import skills_cli
+from utils import file_lock
+
+SNAPSHOT_VERSION = 1
+RELATED_LIMIT = 8
+PAIR_LIMIT = 20
+# How often a worker checks whether the snapshot file was replaced.
+RELOAD_INTERVAL = 5  # seconds
+
+_EPOCH = datetime(1970, 1, 1)
+_PENDING_KEY = 'skill_analytics_pending'
+_DIRTY_KEY = 'skill_analytics_dirty'
+
+
+def snapshot_path(app):
+    return app.config.get('SKILL_ANALYTICS_PATH') or os.path.join(app.instance_path, 'skill_analytics.json')
+
+
+# --- Loading source rows ---
+
+def load_subskills(connection):
+    """Return {subskill_id: {'name': ..., 'skill_id': ...}} for every subskill."""
+    rows = connection.execute(select(SubSkill.id, SubSkill.name, SubSkill.skill_id).order_by(SubSkill.id))
+    return {sid: {'name': name, 'skill_id': skill_id} for sid, name, skill_id in rows}
+
+
+def load_projects(connection, project_ids=None):
+    """Return {project_id: {'subskills': [...], 'date': iso}} for `project_ids` (or all)."""
+    stmt = select(Project.id, Project.date_posted)
+    links = select(project_subskill.c.project_id, project_subskill.c.subskill_id)
+    if project_ids is not None:
+        stmt = stmt.where(Project.id.in_(project_ids))
+        links = links.where(project_subskill.c.project_id.in_(project_ids))
+    projects = {pid: {'subskills': [], 'date': date.isoformat()} for pid, date in connection.execute(stmt)}
+    for pid, sid in connection.execute(links.order_by(project_subskill.c.project_id, project_subskill.c.subskill_id)):
+        if pid in projects:
+            projects[pid]['subskills'].append(sid)
+    return projects
+
+
+# --- Matrix computations (NumPy/SciPy are imported here only) ---
+
+def _incidence(projects, column):
+    """Sparse project × subskill matrix for `projects`, plus their timestamps."""
+    import numpy as np
+    from scipy import sparse
+
+    rows, cols = [], []
+    stamps = np.zeros(len(projects))
+    for row, project in enumerate(projects):
+        stamps[row] = (datetime.fromisoformat(project['date']) - _EPOCH).total_seconds()
+        for sid in project['subskills']:
+            rows.append(row)
+            cols.append(column[sid])
+    data = np.ones(len(rows), dtype=np.int64)
+    matrix = sparse.csr_matrix((data, (rows, cols)), shape=(len(projects), len(column)))
+    return matrix, stamps
+
+
+def _derive(cooccurrence, ids):
+    """Usage counts, top pairs and top-k similar subskills from C."""
+    import numpy as np
+    from scipy import sparse
+
+    usage = cooccurrence.diagonal()
+    norms = np.sqrt(usage.astype(float))
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    scale = sparse.diags(inverse, dtype=float)
+    similarity = (scale @ cooccurrence @ scale).tocsr()
+    similarity = (similarity - sparse.diags(similarity.diagonal(), dtype=float)).tocsr()
+    similarity.eliminate_zeros()
+
+    related = {}
+    for i in range(len(ids)):
+        start, end = similarity.indptr[i], similarity.indptr[i + 1]
+        if start == end:
+            continue
+        scores = similarity.data[start:end]
+        # Highest score first; ties broken by subskill id for a stable order.
+        order = np.lexsort((similarity.indices[start:end], -scores))[:RELATED_LIMIT]
+        related[str(ids[i])] = [[ids[similarity.indices[start + k]], round(float(scores[k]), 4)] for k in order]
+
+    upper = sparse.triu(cooccurrence, k=1).tocoo()
+    pairs = sorted(
+        ([ids[i], ids[j], int(n)] for i, j, n in zip(upper.row, upper.col, upper.data) if n),
+        key=lambda pair: (-pair[2], pair[0], pair[1])
+    )
+    return {
+        'usage': {str(ids[i]): int(n) for i, n in enumerate(usage) if n},
+        'cooccurrence': pairs,
+        'pairs': pairs[:PAIR_LIMIT],
+        'related': related,
+    }
+
+
+def _cooccurrence_matrix(snapshot, column):
+    """Rebuild the symmetric C matrix stored in `snapshot`."""
+    import numpy as np
+    from scipy import sparse
+
+    n = len(column)
+    pairs = snapshot['cooccurrence']
+    rows = [column[a] for a, _, _ in pairs]
+    cols = [column[b] for _, b, _ in pairs]
+    data = np.array([count for _, _, count in pairs], dtype=np.int64)
+    upper = sparse.csr_matrix((data, (rows, cols)), shape=(n, n))
+    usage = np.zeros(n, dtype=np.int64)
+    for sid, count in snapshot['usage'].items():
+        usage[column[int(sid)]] = count
+    return (upper + upper.T + sparse.diags(usage, dtype=np.int64)).tocsr()
+
+
+def _recency(stamps):
+    return {sid: (_EPOCH + timedelta(seconds=float(stamp))).isoformat() for sid, stamp in stamps.items()}
+
+
+def build(connection):
+    """Compute a full snapshot from the database."""
+    import numpy as np
+
+    subskills = load_subskills(connection)
+    projects = load_projects(connection)
+    ids = list(subskills)
+    column = {sid: i for i, sid in enumerate(ids)}
+
+    matrix, stamps = _incidence(list(projects.values()), column)
+    cooccurrence = (matrix.T @ matrix).tocsr()
+    # Newest project per subskill: scale each row by its timestamp and take
+    # the column-wise max (columns without projects stay 0).
+    latest = np.zeros(len(ids))
+    if matrix.shape[0]:
+        latest = matrix.multiply(stamps[:, np.newaxis]).tocsc().max(axis=0).toarray().ravel()
+
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'generated_at': datetime.utcnow().isoformat(),
+        'subskills': {str(sid): meta for sid, meta in subskills.items()},
+        'projects': {str(pid): project for pid, project in projects.items()},
+        'recency': _recency({str(ids[i]): stamp for i, stamp in enumerate(latest) if stamp}),
+    }
+    snapshot.update(_derive(cooccurrence, ids))
+    return snapshot
+
+
+def apply_changes(snapshot, changed):
+    """Fold changed project rows into `snapshot` in place.
+
+    Args:
+        snapshot: Snapshot dict as returned by `build`
+        changed: {project_id: row} from `load_projects`; a project missing
+            from the dict (or mapped to None) has been deleted
+
+    Returns:
+        The updated snapshot
+    """
+    ids = [int(sid) for sid in snapshot['subskills']]
+    column = {sid: i for i, sid in enumerate(ids)}
+    old = [snapshot['projects'].get(str(pid)) for pid in changed]
+    old = [project for project in old if project]
+    new = [project for project in changed.values() if project]
+
+    cooccurrence = _cooccurrence_matrix(snapshot, column)
+    if old:
+        before, _ = _incidence(old, column)
+        cooccurrence = cooccurrence - before.T @ before
+    if new:
+        after, _ = _incidence(new, column)
+        cooccurrence = cooccurrence + after.T @ after
+    cooccurrence.eliminate_zeros()
+
+    affected = {sid for project in old + new for sid in project['subskills']}
+    for pid, project in changed.items():
+        if project:
+            snapshot['projects'][str(pid)] = project
+        else:
+            snapshot['projects'].pop(str(pid), None)
+
+    # Only the subskills the changed projects used (before or after) can
+    # have a different newest project.
+    latest = {}
+    for project in snapshot['projects'].values():
+        for sid in project['subskills']:
+            if sid in affected and project['date'] > latest.get(sid, ''):
+                latest[sid] = project['date']
+    for sid in affected:
+        if sid in latest:
+            snapshot['recency'][str(sid)] = latest[sid]
+        else:
+            snapshot['recency'].pop(str(sid), None)
+
+    snapshot.update(_derive(cooccurrence, ids))
+    snapshot['generated_at'] = datetime.utcnow().isoformat()
+    return snapshot
+
+
+# --- Snapshot file ---
+
+def read_snapshot(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return snapshot if snapshot.get('version') == SNAPSHOT_VERSION else None
+
+
+def write_snapshot(path, snapshot):
+    """Write `snapshot` atomically, so readers see the old or the new file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def rebuild(connection, path):
+    with file_lock(path):
+        snapshot = build(connection)
+        write_snapshot(path, snapshot)
+    return snapshot
+
+
+def update_projects(connection, path, project_ids):
+    """Incrementally refresh the snapshot for `project_ids`.
+
+    Falls back to a full rebuild when there is no usable snapshot yet or
+    the set of subskills no longer matches it.
+    """
+    with file_lock(path):
+        snapshot = read_snapshot(path)
+        subskills = load_subskills(connection)
+        if snapshot is None or snapshot['subskills'] != {str(sid): meta for sid, meta in subskills.items()}:
+            snapshot = build(connection)
+        else:
+            rows = load_projects(connection, project_ids)
+            apply_changes(snapshot, {pid: rows.get(pid) for pid in project_ids})
+        write_snapshot(path, snapshot)
+    return snapshot
+
+
+# --- Serving from memory ---
+
+class SnapshotCache:
+    """Per-process copy of the snapshot, reloaded when the file is replaced."""
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_INTERVAL:
+            return self._data
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                self._data, self._mtime = None, None
+                return None
+            if mtime != self._mtime:
+                self._data, self._mtime = read_snapshot(self.path), mtime
+            return self._data
+
+
+def get_snapshot():
+    """Return the current app's snapshot, or None if it has not been built."""
+    cache = current_app.extensions.get('skill_analytics')
+    if cache is None:
+        cache = current_app.extensions.setdefault('skill_analytics', SnapshotCache(snapshot_path(current_app)))
+    return cache.get()
+
+
+def _subskill(snapshot, sid):
+    meta = snapshot['subskills'].get(str(sid))
+    return {'id': sid, 'name': meta['name'], 'skill_id': meta['skill_id']} if meta else None
+
+
+def top_pairs(limit=6):
+    """Subskill pairs used together in the most projects.
+
+    Returns:
+        list of (subskill, subskill, project_count) where each subskill is
+        a dict with id, name and skill_id
+    """
+    snapshot = get_snapshot()
+    if not snapshot:
+        return []
+    return [(_subskill(snapshot, a), _subskill(snapshot, b), count) for a, b, count in snapshot['pairs'][:limit]]
+
+
+def related_subskills(subskill_ids, limit=6):
+    """Subskills most often used alongside any of `subskill_ids`.
+
+    Returns:
+        list of subskill dicts (id, name, skill_id, score), best match first
+    """
+    snapshot = get_snapshot()
+    if not snapshot:
+        return []
+    subskill_ids = set(subskill_ids)
+    scores = {}
+    for sid in subskill_ids:
+        for other, score in snapshot['related'].get(str(sid), []):
+            if other not in subskill_ids and score > scores.get(other, 0):
+                scores[other] = score
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+    return [dict(_subskill(snapshot, sid), score=score) for sid, score in ranked]
+
+
+def last_used(subskill_id):
+    """Date of the newest project using `subskill_id`, or None."""
+    snapshot = get_snapshot()
+    if not snapshot or str(subskill_id) not in snapshot['recency']:
+        return None
+    return datetime.fromisoformat(snapshot['recency'][str(subskill_id)])
+
+
+# --- Keep the snapshot in sync with committed changes ---
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    pending = session.info.setdefault(_PENDING_KEY, {'projects': set(), 'project_ids': set(), 'rebuild': False})
+    for obj in session.new:
+        if isinstance(obj, Project):
+            pending['projects'].add(obj)
+        elif isinstance(obj, (Skill, SubSkill)):
+            pending['rebuild'] = True
+    for obj in session.dirty:
+        if isinstance(obj, Project):
+            state = inspect(obj)
+            if state.attrs.subskills.history.has_changes() or state.attrs.date_posted.history.has_changes():
+                pending['project_ids'].add(obj.id)
+        elif isinstance(obj, SubSkill):
+            state = inspect(obj)
+            if state.attrs.name.history.has_changes() or state.attrs.skill_id.history.has_changes():
+                pending['rebuild'] = True
+            elif state.attrs.projects.history.has_changes():
+                pending['project_ids'].update(p.id for p in obj.projects if p.id is not None)
+                pending['project_ids'].update(p.id for p in state.attrs.projects.history.deleted)
+                pending['projects'].update(p for p in obj.projects if p.id is None)
+    for obj in session.deleted:
+        if isinstance(obj, Project):
+            pending['project_ids'].add(obj.id)
+        elif isinstance(obj, (Skill, SubSkill)):
+            pending['rebuild'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    project_ids = pending['project_ids'] | {p.id for p in pending['projects'] if p.id is not None}
+    if not project_ids and not pending['rebuild']:
+        return
+    dirty = session.info.setdefault(_DIRTY_KEY, {'project_ids': set(), 'rebuild': False})
+    dirty['project_ids'] |= project_ids
+    dirty['rebuild'] = dirty['rebuild'] or pending['rebuild']
+
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_snapshot(session):
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    if not dirty or not has_app_context():
+        return
+    # Applied by a separate process, so NumPy/SciPy stay out of the web
+    # worker. A failure only leaves the snapshot stale.
+    try:
+        refresh_jobs.queue(snapshot_path(current_app),
+                           {'project_ids': sorted(dirty['project_ids']), 'rebuild': dirty['rebuild']},
+                           ('skills', 'refresh-analytics'))
+    except Exception:
+        current_app.logger.error('Failed to queue skill analytics refresh', exc_info=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_DIRTY_KEY, None)
+
+
+@skills_cli.command('build-analytics')
+def build_analytics_command():
+    """Rebuild the skill co-occurrence snapshot from scratch."""
+    path = snapshot_path(current_app)
+    with db.engine.connect() as connection:
+        snapshot = rebuild(connection, path)
+    click.echo(f"Wrote {path}: {len(snapshot['projects'])} projects, "
+               f"{len(snapshot['subskills'])} subskills, {len(snapshot['cooccurrence'])} pairs.")
+
+
+@skills_cli.command('refresh-analytics')
+def refresh_analytics_command():
+    """Apply the project/subskill changes queued by commits to the snapshot."""
+    path = snapshot_path(current_app)
+
+    def apply(pending):
+        with db.engine.connect() as connection:
+            if pending.get('rebuild'):
+                rebuild(connection, path)
+            else:
+                update_projects(connection, path, set(pending.get('project_ids', [])))
+
+    if refresh_jobs.apply_pending(path, apply) is None:
+        click.echo('No pending changes.')
+    else:
+        click.echo(f'Refreshed {path}.')
@@ -0,0 +1,163 @@
+"""Materialized Skill → Project index.
+
+`skill_project` holds one row per (skill, project) pair where the project
+uses at least one subskill of the skill, and `Skill.project_count` holds
+the number of such projects. Both are derived from `project_subskill` and
+`SubSkill.skill_id`, so skill filters and the home page skill counts are
+primary-key lookups instead of a four-table join per request.
+
+A session flush hook refreshes the rows for every project whose subskills
+changed, every subskill moved to another skill and every deleted
+project/subskill/skill, inside the same transaction as the change.
+"""
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from extension import db
+from model import Project, Skill, SubSkill, project_subskill, skill_project
+
+_PENDING_KEY = 'skill_index_pending'
+
+
+def derived_pairs(project_ids=None):
+    """SELECT of the (skill_id, project_id) pairs implied by project_subskill."""
+    stmt = (
+        select(SubSkill.skill_id, project_subskill.c.project_id)
+        .join(SubSkill, SubSkill.id == project_subskill.c.subskill_id)
+        .distinct()
+    )
+    if project_ids is not None:
+        stmt = stmt.where(project_subskill.c.project_id.in_(project_ids))
+    return stmt
+
+
+def refresh_counts(connection, skill_ids=None):
+    """Recompute Skill.project_count, for `skill_ids` or for every skill."""
+    skills = Skill.__table__
+    count = (
+        select(func.count())
+        .select_from(skill_project)
+        .where(skill_project.c.skill_id == skills.c.id)
+        .scalar_subquery()
+    )
+    stmt = update(skills).values(project_count=count)
+    if skill_ids is not None:
+        if not skill_ids:
+            return
+        stmt = stmt.where(skills.c.id.in_(skill_ids))
+    connection.execute(stmt)
+
+
+def refresh_projects(connection, project_ids):
+    """Re-derive the skill_project rows (and counts) for `project_ids`."""
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+    before = set(connection.execute(
+        select(skill_project.c.skill_id).where(skill_project.c.project_id.in_(project_ids))
+    ).scalars())
+    connection.execute(delete(skill_project).where(skill_project.c.project_id.in_(project_ids)))
+    rows = connection.execute(derived_pairs(project_ids)).all()
+    if rows:
+        connection.execute(insert(skill_project), [{'skill_id': s, 'project_id': p} for s, p in rows])
+    refresh_counts(connection, before | {skill_id for skill_id, _ in rows})
+
+
+def rebuild(connection):
+    """Rebuild the whole index from project_subskill."""
+    connection.execute(delete(skill_project))
+    connection.execute(insert(skill_project).from_select(['skill_id', 'project_id'], derived_pairs()))
+    refresh_counts(connection)
+
+
+def check(connection):
+    """Compare the index with the source tables.
+
+    Returns:
+        list of human-readable differences (empty when consistent)
+    """
+    problems = []
+    expected = set(connection.execute(derived_pairs()).all())
+    actual = set(connection.execute(select(skill_project.c.skill_id, skill_project.c.project_id)).all())
+    for skill_id, project_id in sorted(expected - actual):
+        problems.append(f'missing pair: skill {skill_id} -> project {project_id}')
+    for skill_id, project_id in sorted(actual - expected):
+        problems.append(f'stale pair: skill {skill_id} -> project {project_id}')
+
+    expected_counts = {}
+    for skill_id, _ in expected:
+        expected_counts[skill_id] = expected_counts.get(skill_id, 0) + 1
+    for skill_id, count in connection.execute(select(Skill.id, Skill.project_count)).all():
+        if count != expected_counts.get(skill_id, 0):
+            problems.append(f'skill {skill_id}: project_count is {count}, expected {expected_counts.get(skill_id, 0)}')
+    return problems
+
+
+# --- Keep the index in sync with ORM writes ---
+
+@event.listens_for(Session, 'before_flush')
+def _collect_changes(session, flush_context, instances):
+    pending = session.info.setdefault(_PENDING_KEY, {'projects': set(), 'project_ids': set(), 'skill_ids': set()})
+    for obj in session.new:
+        if isinstance(obj, Project):
+            pending['projects'].add(obj)
+        elif isinstance(obj, SubSkill) and obj.projects:
+            pending['projects'].update(obj.projects)
+    for obj in session.dirty:
+        if isinstance(obj, Project) and inspect(obj).attrs.subskills.history.has_changes():
+            pending['projects'].add(obj)
+        elif isinstance(obj, SubSkill) and (inspect(obj).attrs.skill_id.history.has_changes()
+                                            or inspect(obj).attrs.projects.history.has_changes()):
+            pending['project_ids'].update(p.id for p in obj.projects if p.id is not None)
+            pending['project_ids'].update(p.id for p in inspect(obj).attrs.projects.history.deleted)
+            pending['projects'].update(p for p in obj.projects if p.id is None)
+    for obj in session.deleted:
+        if isinstance(obj, Project):
+            pending['project_ids'].add(obj.id)
+        elif isinstance(obj, SubSkill):
+            pending['project_ids'].update(p.id for p in obj.projects)
+        elif isinstance(obj, Skill):
+            pending['skill_ids'].add(obj.id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_changes(session, flush_context):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    project_ids = pending['project_ids'] | {p.id for p in pending['projects'] if p.id is not None}
+    if not project_ids and not pending['skill_ids']:
+        return
+    connection = session.connection()
+    if pending['skill_ids']:
+        connection.execute(delete(skill_project).where(skill_project.c.skill_id.in_(pending['skill_ids'])))
+    refresh_projects(connection, project_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+skills_cli = AppGroup('skills', help='Skill → project index commands.')
+
+
+@skills_cli.command('rebuild-index')
+def rebuild_index_command():
+    """Rebuild skill_project and Skill.project_count from scratch."""
+    rebuild(db.session.connection())
+    db.session.commit()
+    click.echo('Skill index rebuilt.')
+
+
+@skills_cli.command('check-index')
+def check_index_command():
+    """Report differences between the skill index and project_subskill."""
+    problems = check(db.session.connection())
+    for problem in problems:
+        click.echo(problem)
+    if problems:
+        raise SystemExit(1)
+    click.echo('Skill index is consistent.')
@@ -0,0 +1,85 @@
+"""Cached skill taxonomy: every Skill with its SubSkills, per worker.
+
+The home page, the portfolio skill filters and the project/subskill forms
+all need the full list of skills and subskills, which changes only when
+an admin edits it. `taxonomy()` loads it in one joined query into plain,
+read-only `SkillRef`/`SubSkillRef` tuples and keeps it in a
+`ContentCache`, so it is rebuilt after any skill, subskill or project
+commit (project commits change `project_count`) in any worker.
+
+The refs are not ORM rows: they can't be lazy-loaded or assigned to
+relationships. Forms that save a selection load the chosen rows by id
+(see `form.ReferenceSelectMultipleField`).
+"""
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from cache_policy import tag
+from content_cache import ContentCache
+from extension import db
+from model import Skill, SubSkill
+
+SkillRef = namedtuple('SkillRef', 'id name description project_count subskills')
+SubSkillRef = namedtuple('SubSkillRef', 'id name skill_id skill_name')
+
+
+class Taxonomy:
+    def __init__(self, skills):
+        self.skills = skills
+        self.skills_by_id = {skill.id: skill for skill in skills}
+        self.subskills = [subskill for skill in skills for subskill in skill.subskills]
+        self.subskills_by_id = {subskill.id: subskill for subskill in self.subskills}
+
+
+cache = ContentCache(name='skill_taxonomy')
+
+
+def _load():
+    rows = db.session.execute(
+        select(Skill.id, Skill.name, Skill.description, Skill.project_count,
+               SubSkill.id, SubSkill.name)
+        .outerjoin(SubSkill, SubSkill.skill_id == Skill.id)
+        .order_by(Skill.id, SubSkill.id)
+    ).all()
+    skills, subskills = {}, {}
+    for skill_id, name, description, project_count, subskill_id, subskill_name in rows:
+        if skill_id not in skills:
+            skills[skill_id] = (name, description, project_count)
+            subskills[skill_id] = []
+        if subskill_id is not None:
+            subskills[skill_id].append(SubSkillRef(subskill_id, subskill_name, skill_id, name))
+    return Taxonomy([SkillRef(skill_id, *values, tuple(subskills[skill_id])) for skill_id, values in skills.items()])
+
+
+def taxonomy():
+    """The current `Taxonomy`, from the cache or loaded in one query."""
+    return cache.get_or_build('taxonomy', _load)
+
+
+def skills():
+    """All skills (ordered by id), tagged for CDN purges of the page rendering them."""
+    current = taxonomy()
+    tag(*(f'skill-{skill.id}' for skill in current.skills))
+    return current.skills
+
+
+def skill_choices():
+    """(id, name) choices for a parent-skill select."""
+    return [(skill.id, skill.name) for skill in taxonomy().skills]
+
+
+def get_skill(skill_id):
+    """The SkillRef for `skill_id`, or None."""
+    skill = taxonomy().skills_by_id.get(skill_id)
+    if skill is not None:
+        tag(f'skill-{skill.id}')
+    return skill
+
+
+def get_subskill(subskill_id):
+    """The SubSkillRef for `subskill_id`, or None."""
+    subskill = taxonomy().subskills_by_id.get(subskill_id)
+    if subskill is not None:
+        tag(f'subskill-{subskill.id}')
+    return subskill
@@ -0,0 +1,206 @@
+// Register ScrollTrigger Plugin
+gsap.registerPlugin(ScrollTrigger);
+
+// Initialize AOS
+AOS.init({
+    duration: 1000,
+    easing: 'ease-out',
+    once: true
+});
+
+// Preloader
+window.addEventListener('load', () => {
+    const preloader = document.getElementById('preloader');
+    preloader.style.opacity = '0';
+    setTimeout(() => {
+        preloader.style.display = 'none';
+    }, 500);
+});
+
+// Initialize VANTA.GLOBE
+// three.js and Vanta are only needed where the globe is shown, so they are
+// fetched on demand from the URLs in this script's data-globe attribute.
+const siteScript = document.currentScript;
+const globe = document.getElementById('vanta-globe');
+
+function loadScripts(urls, done) {
+    if (!urls.length) {
+        done();
+        return;
+    }
+    const script = document.createElement('script');
+    script.src = urls[0];
+    script.onload = () => loadScripts(urls.slice(1), done);
+    document.head.appendChild(script);
+}
+
+if (globe && siteScript && siteScript.dataset.globe) {
+    loadScripts(siteScript.dataset.globe.split(' '), () => {
+        VANTA.GLOBE({
+            el: globe,
+            mouseControls: true,
+            touchControls: true,
+            gyroControls: false,
+            minHeight: 200.00,
+            minWidth: 200.00,
+            scale: 0.5,
+            scaleMobile: 0.35,
+            color: 0x5D3BEE,
+            backgroundColor: 0xFFFFFF,
+            size: 0.5,
+            speed: 0.3,
+            spacing: 20.00,
+            showDots: false
+        });
+    });
+}
+
+// Initialize Locomotive Scroll
+const scroll = new LocomotiveScroll({
+    el: document.querySelector('[data-scroll-container]'),
+    smooth: true,
+    multiplier: 1
+});
+
+// Back to Top Button
+const backToTop = document.getElementById('backToTop');
+if (backToTop) {
+    window.addEventListener('scroll', () => {
+        if (window.pageYOffset > 300) {
+            backToTop.style.opacity = '1';
+            backToTop.style.pointerEvents = 'auto';
+        } else {
+            backToTop.style.opacity = '0';
+            backToTop.style.pointerEvents = 'none';
+        }
+    });
+
+    backToTop.addEventListener('click', () => {
+        window.scrollTo({
+            top: 0,
+            behavior: 'smooth'
+        });
+    });
+}
+
+// Mobile Menu
+const menuToggle = document.getElementById('menu-toggle');
+const mobileMenu = document.getElementById('mobile-menu');
+// Header may be a <header> or a <nav> depending on templates
+const header = document.querySelector('header') || document.querySelector('nav');
+
+if (menuToggle && mobileMenu) {
+    menuToggle.addEventListener('click', () => {
+        mobileMenu.classList.toggle('hidden');
+        document.body.classList.toggle('overflow-hidden');
+    });
+}
+
+// Header Scroll Effect
+let lastScroll = 0;
+window.addEventListener('scroll', () => {
+    const currentScroll = window.pageYOffset;
+    if (header) {
+        if (currentScroll > lastScroll && currentScroll > 100) {
+            header.style.transform = 'translateY(-100%)';
+        } else {
+            header.style.transform = 'translateY(0)';
+        }
+    }
+    lastScroll = currentScroll;
+});
+
+// Hero Animations
+const heroTexts = document.querySelectorAll('.reveal-type');
+heroTexts.forEach((text, index) => {
+    gsap.fromTo(text, 
+        {
+            opacity: 0,
+            y: 50
+        },
+        {
+            opacity: 1,
+            y: 0,
+            duration: 1,
+            delay: index * 0.2,
+            ease: 'power2.out'
+        }
+    );
+});
+
+// Comments: pages after the first are fetched as JSON and rendered by
+// cloning a server-rendered comment, filling in its data-comment-* fields.
+const commentDateFormats = {
+    long: iso => new Date(iso + 'Z').toLocaleDateString('en-US', {
+        month: 'long', day: '2-digit', year: 'numeric', timeZone: 'UTC'
+    }),
+    datetime: iso => iso.slice(0, 16).replace('T', ' ')
+};
+
+function renderComment(sample, comment) {
+    const node = sample.cloneNode(true);
+    node.removeAttribute('data-aos');
+    node.classList.remove('aos-init', 'aos-animate');
+    const fields = {
+        author: comment.author,
+        initial: comment.author.charAt(0).toUpperCase(),
+        content: comment.content
+    };
+    Object.keys(fields).forEach(name => {
+        const el = node.querySelector(`[data-comment-${name}]`);
+        if (el) el.textContent = fields[name];
+    });
+    const date = node.querySelector('[data-comment-date]');
+    if (date) {
+        date.setAttribute('datetime', comment.date_posted.slice(0, 10));
+        date.textContent = (commentDateFormats[date.dataset.commentDate] || commentDateFormats.datetime)(comment.date_posted);
+    }
+    return node;
+}
+
+document.addEventListener('click', event => {
+    const button = event.target.closest('[data-comments-more]');
+    if (!button) return;
+    const list = button.closest('[data-comments]');
+    const sample = list && list.querySelector('[data-comment]');
+    if (!sample) return;
+    button.disabled = true;
+    fetch(button.dataset.commentsMore, {headers: {Accept: 'application/json'}})
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(data => {
+            data.comments.forEach(comment => list.insertBefore(renderComment(sample, comment), button));
+            if (data.next) {
+                button.dataset.commentsMore = data.next;
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+            if (typeof scroll !== 'undefined') scroll.update();
+        })
+        .catch(() => {
+            button.disabled = false;
+        });
+});
+
+// Forms on CDN-cached pages (post/project feedback) carry no CSRF token in
+// the HTML; it is fetched with the visitor's session cookie right before
+// the first submit.
+document.addEventListener('submit', event => {
+    const form = event.target;
+    const field = form.querySelector('input[data-csrf-token]');
+    if (!field || field.value) return;
+    event.preventDefault();
+    fetch(field.dataset.csrfToken, {credentials: 'same-origin', headers: {Accept: 'application/json'}})
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(data => {
+            field.value = data.csrf_token;
+            form.requestSubmit(event.submitter);
+        })
+        .catch(() => form.submit());
+});
@@ -0,0 +1,97 @@
+"""Opt-in streamed rendering for long detail pages (STREAM_TEMPLATES).
+
+`render_page` is a drop-in for `render_template` in the post and project
+views. With STREAM_TEMPLATES set it renders the template with
+`stream_template` instead:
+
+- Everything up to the `{{ stream_flush() }}` marker (the head, header,
+  flashed messages and the page hero) is rendered inside the view, so
+  errors there still go through `register_error_handlers`, and the
+  session (flashes, CSRF token) is final before the headers are sent.
+  That first chunk is sent as soon as the view returns.
+- The rest (post content, comments) is rendered while it is sent, in
+  STREAM_CHUNK_SIZE pieces.
+- An exception after the headers have gone out can no longer become an
+  error page: it is logged and rolled back as the 500 handler would, and
+  the document is closed with a short notice.
+
+Pages rendered by `flask freeze` are never streamed.
+"""
+import itertools
+
+from flask import Response, current_app, g, got_request_exception, render_template, request, stream_template
+from flask import stream_with_context
+from markupsafe import Markup
+
+FLUSH_MARKER = '<!--stream-flush-->'
+ERROR_TAIL = ('<p class="container mx-auto px-4 py-8 text-red-800" role="alert">'
+              'Sorry, the rest of this page could not be loaded. Please refresh to try again.</p>'
+              '</main></body></html>')
+
+
+def stream_flush():
+    """Template global marking the end of the first streamed chunk."""
+    return Markup(FLUSH_MARKER) if g.get('streaming') else ''
+
+
+def streaming_enabled():
+    return (current_app.config.get('STREAM_TEMPLATES') and not g.get('freezing')
+            and request.method in ('GET', 'HEAD'))
+
+
+def _chunks(pieces, size):
+    # Jinja yields many tiny strings; group them so each write is worth it.
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _body(first, pieces, size):
+    yield first
+    try:
+        yield from _chunks(pieces, size)
+    except Exception as e:
+        propagate = current_app.config.get('PROPAGATE_EXCEPTIONS')
+        if propagate or (propagate is None and (current_app.testing or current_app.debug)):
+            raise
+        from error_handlers import log_error
+        from extension import db
+        got_request_exception.send(current_app._get_current_object(), exception=e)
+        log_error(current_app, e)
+        db.session.rollback()
+        yield ERROR_TAIL
+
+
+def render_page(template_name, **context):
+    """`render_template`, or a streamed response when STREAM_TEMPLATES is on."""
+    if not streaming_enabled():
+        return render_template(template_name, **context)
+    g.streaming = True
+    form = context.get('form')
+    if form is not None and form.meta.csrf:
+        # The token lands in the session (and marks the page private in
+        # cache_policy), so it must exist before the headers are sent.
+        from flask_wtf.csrf import generate_csrf
+        generate_csrf()
+
+    pieces = stream_template(template_name, **context)
+    head = []
+    for piece in pieces:
+        if FLUSH_MARKER in piece:
+            before, _, after = piece.partition(FLUSH_MARKER)
+            head.append(before)
+            pieces = itertools.chain([after], pieces)
+            break
+        head.append(piece)
+    size = current_app.config.get('STREAM_CHUNK_SIZE', 8192)
+    return Response(stream_with_context(_body(''.join(head), pieces, size)), mimetype='text/html')
+
+
+def init_streaming(app):
+    app.add_template_global(stream_flush)
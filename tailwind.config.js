@@ -0,0 +1,8 @@
+/** Tailwind config for `flask assets build` (see assets.py). */
+module.exports = {
+  content: ['./templates/**/*.html', './static/src/**/*.js'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
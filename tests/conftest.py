@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import TestingConfig  # noqa: E402
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Build TestingConfig apps on a fresh SQLite database; nothing is written to instance/.
+
+    Keyword arguments override config settings (read when the app is built).
+    """
+    from app import create_app
+    from extension import db
+
+    apps = []
+
+    def make(**overrides):
+        settings = {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+            'SECRET_KEY': 'test-secret-key',
+            'CONTENT_STAMP_PATH': str(tmp_path / 'content.stamp'),
+            'USER_STAMP_PATH': str(tmp_path / 'users.stamp'),
+            'PAGE_STAMP_PATH': str(tmp_path / 'pages.stamp'),
+            'MAINTENANCE_STATE_PATH': str(tmp_path / 'maintenance.json'),
+            'BACKUP_DIR': str(tmp_path / 'backups'),
+            'SKILL_ANALYTICS_PATH': str(tmp_path / 'skill_analytics.json'),
+            'RELATED_INDEX_PATH': str(tmp_path / 'related.joblib'),
+            'ENGAGEMENT_SPOOL_DIR': str(tmp_path / 'engagement'),
+            'ENGAGEMENT_FLUSH_MS': 20,
+            **overrides,
+        }
+        for name, value in settings.items():
+            monkeypatch.setattr(TestingConfig, name, value, raising=False)
+        app = create_app('testing', migrations=False)
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        app.extensions['engagement'].close()
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        for engine in getattr(app.extensions.get('db_replicas'), 'engines', ()):
+            engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    """A TestingConfig app on a fresh SQLite database."""
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def post(app):
+    """Slug of a blog post with no likes or ratings."""
+    from extension import db
+    from model import BlogPost
+
+    with app.app_context():
+        db.session.add(BlogPost(title='Deluge tips', slug='deluge-tips', content='<p>Use maps.</p>'))
+        db.session.commit()
+    return 'deluge-tips'
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+import cache_policy
+from extension import db
+from model import BlogPost, Comment
+
+
+@pytest.fixture
+def csrf_app(make_app):
+    app = make_app(WTF_CSRF_ENABLED=True)
+    with app.app_context():
+        db.session.add(BlogPost(title='Deluge tips', slug='deluge-tips', content='<p>Use maps.</p>'))
+        db.session.commit()
+    return app
+
+
+def test_post_page_with_comment_form_is_cacheable(csrf_app):
+    response = csrf_app.test_client().get('/blog/deluge-tips')
+    body = response.get_data(as_text=True)
+    assert response.headers['Cache-Control'].startswith('public')
+    assert 'post-1' in response.headers['Surrogate-Key'].split()
+    assert 'Set-Cookie' not in response.headers
+    assert 'data-csrf-token="/csrf-token"' in body
+
+
+def test_comment_needs_fetched_token(csrf_app):
+    client = csrf_app.test_client()
+    assert client.post('/blog/deluge-tips', data={'content': 'No token'}).status_code != 302
+
+    response = client.get('/csrf-token')
+    assert response.headers['Cache-Control'] == cache_policy.PRIVATE
+    token = response.get_json()['csrf_token']
+    assert client.post('/blog/deluge-tips', data={'content': 'With token', 'csrf_token': token}).status_code == 302
+    with csrf_app.app_context():
+        assert [comment.content for comment in db.session.scalars(db.select(Comment))] == ['With token']
+
+
+def test_http_purge_does_not_block(app, monkeypatch):
+    release = threading.Event()
+    sent = []
+
+    def send(self, keys):
+        release.wait(5)
+        sent.append(sorted(keys))
+
+    monkeypatch.setattr(cache_policy.HTTPPurger, 'send', send)
+    purger = cache_policy.HTTPPurger('http://cdn.invalid/purge', logger=app.logger)
+    purger.purge({'post-1'})
+    purger.purge({'post-2', 'posts'})
+    assert not sent
+    release.set()
+    purger.flush(5)
+    # Keys queued while a request is in flight go out together in the next one.
+    assert sent in ([['post-1'], ['post-2', 'posts']], [['post-1', 'post-2', 'posts']])
+
+
+def test_failed_purge_is_logged(app, monkeypatch, caplog):
+    def send(self, keys):
+        raise OSError('connection refused')
+
+    monkeypatch.setattr(cache_policy.HTTPPurger, 'send', send)
+    purger = cache_policy.HTTPPurger('http://cdn.invalid/purge', logger=app.logger)
+    purger.purge({'site'})
+    purger.flush(5)
+    assert 'CDN purge failed for keys: site' in caplog.text
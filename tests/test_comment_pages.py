@@ -0,0 +1,33 @@
+from extension import db
+from model import BlogPost, Comment, Project
+
+
+def counts(app):
+    with app.app_context():
+        return (db.session.scalar(db.select(BlogPost.comment_count)),
+                db.session.scalar(db.select(Project.comment_count)))
+
+
+def test_comment_count_follows_comments(app, post):
+    with app.app_context():
+        db.session.add(Project(title='Sync', slug='sync', description='d', content='<p>c</p>'))
+        db.session.add_all([Comment(content=f'Comment {i}', post_id=1) for i in range(3)])
+        db.session.commit()
+    assert counts(app) == (3, 0)
+
+    with app.app_context():
+        first, second = db.session.scalars(db.select(Comment).order_by(Comment.id).limit(2))
+        first.post_id, first.project_id = None, 1
+        db.session.delete(second)
+        db.session.commit()
+    assert counts(app) == (1, 1)
+
+
+def test_detail_page_shows_counter(app, client, post):
+    client.post(f'/blog/{post}', data={'content': 'First!'})
+    assert '1 Comments' in client.get(f'/blog/{post}').get_data(as_text=True)
+    with app.app_context():
+        # The page reads the counter, not count(*) over the comments.
+        db.session.execute(db.update(BlogPost).values(comment_count=7))
+        db.session.commit()
+    assert '7 Comments' in client.get(f'/blog/{post}').get_data(as_text=True)
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+from click import ClickException
+
+import content_transfer
+from extension import db
+from model import BlogPost, Comment, Project, Skill, SubSkill, UploadedImage, User
+
+
+@pytest.fixture
+def source(app):
+    with app.app_context():
+        user = User(username='admin')
+        user.set_password('password')
+        skill = Skill(name='Automation')
+        subskill = SubSkill(name='Deluge', skill=skill)
+        project = Project(title='Invoice sync', slug='invoice-sync', description='d', content='<p>c</p>',
+                          image_data=b'png bytes', image_mimetype='image/png', subskills=[subskill])
+        posts = [BlogPost(title=f'Post {n}', slug=f'post-{n}', content='<p>Text</p>', image_data=b'jpeg bytes')
+                 for n in range(5)]
+        db.session.add_all([user, skill, subskill, project, *posts, UploadedImage(filename='a.png', data=b'png bytes')])
+        db.session.flush()
+        db.session.add(Comment(content='Nice', post_id=posts[0].id))
+        db.session.commit()
+    return app
+
+
+def snapshot(app):
+    with app.app_context():
+        return {table.name: [tuple(row) for row in db.session.execute(
+                    db.select(table).order_by(*table.primary_key.columns))]
+                for table in content_transfer.TABLES}
+
+
+def test_export_then_import_round_trips(source, make_app, tmp_path):
+    folder = str(tmp_path / 'export')
+    with source.app_context():
+        manifest = content_transfer.export(folder, batch_size=2)
+    assert manifest['tables']['blog_post'] == {'rows': 5, 'chunks': ['blog_post/00000.jsonl', 'blog_post/00001.jsonl',
+                                                                     'blog_post/00002.jsonl']}
+    assert manifest['tables']['project_subskill']['rows'] == 1
+    # Each distinct image is stored once, outside the chunks.
+    assert len(os.listdir(os.path.join(folder, 'blobs'))) == 2
+    with open(os.path.join(folder, 'blog_post/00000.jsonl')) as f:
+        digest = json.loads(f.readline())['image_data']['$blob']
+    with open(os.path.join(folder, 'blobs', digest), 'rb') as f:
+        assert f.read() == b'jpeg bytes'
+
+    target = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "target.db"}')
+    with target.app_context():
+        counts = content_transfer.import_export(folder)
+    assert counts['blog_post'] == 5 and counts['comment'] == 1
+    assert snapshot(target) == snapshot(source)
+    assert not os.path.exists(os.path.join(folder, content_transfer.CHECKPOINT))
+
+
+def test_import_resumes_from_checkpoint(source, make_app, tmp_path):
+    folder = str(tmp_path / 'export')
+    with source.app_context():
+        content_transfer.export(folder, batch_size=2)
+    target = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "target.db"}')
+    with target.app_context():
+        # An earlier run loaded the first two chunks but only recorded one.
+        for name in ('blog_post/00000.jsonl', 'blog_post/00001.jsonl'):
+            content_transfer.import_chunk(db.engine, BlogPost.__table__, folder, name)
+        content_transfer.Checkpoint(os.path.join(folder, content_transfer.CHECKPOINT)).add('blog_post/00000.jsonl')
+        counts = content_transfer.import_export(folder)
+    assert counts['blog_post'] == 3
+    assert snapshot(target) == snapshot(source)
+
+
+def test_import_resumes_before_the_first_chunk_is_recorded(source, make_app, tmp_path):
+    folder = str(tmp_path / 'export')
+    with source.app_context():
+        content_transfer.export(folder)
+    target = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "target.db"}')
+    with target.app_context():
+        # An earlier run started (and wrote its checkpoint), then stopped
+        # after committing its first chunk.
+        content_transfer.Checkpoint(os.path.join(folder, content_transfer.CHECKPOINT)).save()
+        content_transfer.import_chunk(db.engine, User.__table__, folder, 'user/00000.jsonl')
+        content_transfer.import_export(folder)
+    assert snapshot(target) == snapshot(source)
+
+
+def test_import_refuses_a_database_with_content(source, tmp_path):
+    folder = str(tmp_path / 'export')
+    with source.app_context():
+        content_transfer.export(folder)
+        with pytest.raises(ClickException):
+            content_transfer.import_export(folder)
+
+
+def test_load_order_follows_foreign_keys():
+    levels = [{table.name for table in level} for level in content_transfer.load_order(content_transfer.TABLES)]
+    assert levels == [{'user', 'blog_post', 'project', 'skill', 'uploaded_image'},
+                      {'sub_skill', 'comment', 'rating', 'like'}, {'project_subskill'}]
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+from flask import session
+
+import engagement
+from database import STICKY_SESSION_KEY
+from extension import db
+from model import BlogPost
+
+
+@pytest.fixture
+def replica_app(make_app, tmp_path):
+    """App with one read replica: a second SQLite database whose copy of the post has another title."""
+    app = make_app(SQLALCHEMY_REPLICA_URIS=[f'sqlite:///{tmp_path / "replica.db"}'])
+    replica = app.extensions['db_replicas'].engines[0]
+    db.metadata.create_all(replica)
+    with app.app_context():
+        db.session.add(BlogPost(title='Primary copy', slug='routing', content='<p>x</p>'))
+        db.session.commit()
+    with replica.begin() as connection:
+        connection.execute(BlogPost.__table__.insert().values(
+            id=1, title='Replica copy', slug='routing', content='<p>x</p>'))
+    return app
+
+
+def served_from(client):
+    body = client.get('/blog/routing').get_data(as_text=True)
+    assert ('Primary copy' in body) != ('Replica copy' in body)
+    return 'primary' if 'Primary copy' in body else 'replica'
+
+
+def test_get_reads_replica(replica_app):
+    assert served_from(replica_app.test_client()) == 'replica'
+
+
+def test_writer_sticks_to_primary(replica_app):
+    client = replica_app.test_client()
+    assert client.post('/blog/routing', data={'content': 'First!'}).status_code == 302
+    assert served_from(client) == 'primary'
+    # Other visitors still read the replica.
+    assert served_from(replica_app.test_client()) == 'replica'
+
+
+def test_stickiness_expires(replica_app):
+    client = replica_app.test_client()
+    client.post('/blog/routing', data={'content': 'First!'})
+    with client.session_transaction() as client_session:
+        client_session[STICKY_SESSION_KEY] = time.time() - 1
+    assert served_from(client) == 'replica'
+
+
+def test_buffered_engagement_sticks_to_primary(replica_app):
+    # Likes/ratings are written by the flusher, not db.session.
+    with replica_app.test_request_context('/blog/routing', method='POST'):
+        replica_app.preprocess_request()
+        assert engagement.record('blog', 1, rating=5)
+        assert not db.session.info.get('wrote')
+        replica_app.process_response(replica_app.response_class())
+        assert session[STICKY_SESSION_KEY] > time.time()
+
+
+def test_unhealthy_replica_falls_back_to_primary(replica_app):
+    replicas = replica_app.extensions['db_replicas']
+    replicas.mark(replicas.engines[0], False)
+    assert served_from(replica_app.test_client()) == 'primary'
@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import engagement
+from extension import db
+from model import BlogPost, Comment, Like, Rating
+
+
+def like(client, slug, **fields):
+    data = {'content': 'Nice post', 'like': 'true', **fields}
+    return client.post(f'/blog/{slug}', data=data)
+
+
+def likes_of(app, slug):
+    app.extensions['engagement'].flush()
+    with app.app_context():
+        post = BlogPost.query.filter_by(slug=slug).one()
+        return post.like_count, Like.query.filter_by(post_id=post.id).count()
+
+
+def test_same_email_likes_once(app, client, post):
+    like(client, post, guest_email='reader@example.com')
+    like(app.test_client(), post, guest_email='Reader@Example.com ')
+    assert likes_of(app, post) == (1, 1)
+
+
+def test_same_session_likes_once(app, client, post):
+    for _ in range(3):
+        like(client, post)
+    assert likes_of(app, post) == (1, 1)
+
+
+def test_distinct_sessions_each_like(app, post):
+    for _ in range(3):
+        like(app.test_client(), post)
+    assert likes_of(app, post) == (3, 3)
+
+
+def test_duplicates_within_one_batch(app, post):
+    with app.app_context():
+        post_id = BlogPost.query.filter_by(slug=post).one().id
+        event = {'kind': 'blog', 'id': post_id, 'type': 'like', 'liker': 'k', 'at': '2026-01-01T00:00:00'}
+        with db.engine.begin() as connection:
+            assert engagement.write_events(connection, [event, event]) == {f'post-{post_id}'}
+        with db.engine.begin() as connection:
+            assert engagement.write_events(connection, [event]) == set()
+        assert engagement.totals() == {'likes': 1, 'ratings': 0}
+
+
+def test_savepoint_fallback_on_other_backends(app, post, monkeypatch):
+    with app.app_context():
+        post_id = BlogPost.query.filter_by(slug=post).one().id
+        row = {'date_posted': None, 'guest_name': None, 'guest_email': None,
+               'post_id': post_id, 'project_id': None, 'liker_key': 'k'}
+        with db.engine.begin() as connection:
+            monkeypatch.setattr(connection.dialect, 'name', 'mysql')
+            assert engagement.insert_likes(connection, [row, dict(row, liker_key='j'), row]) == [
+                (post_id, None), (post_id, None)]
+        assert Like.query.filter_by(post_id=post_id).count() == 2
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def counters(app, slug):
+    with app.app_context():
+        post = BlogPost.query.filter_by(slug=slug).one()
+        return post.like_count, post.rating_count, post.rating_total
+
+
+def test_background_flush(app, client, post):
+    like(client, post, rating='4')
+    deadline = time.monotonic() + 5
+    while counters(app, post) != (1, 1, 4) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert counters(app, post) == (1, 1, 4)
+    with app.app_context():
+        assert Rating.query.count() == 1
+
+
+def test_replay_after_crash(app, post):
+    with app.app_context():
+        post_id = BlogPost.query.filter_by(slug=post).one().id
+    spool_dir = app.config['ENGAGEMENT_SPOOL_DIR']
+    os.makedirs(spool_dir)
+    events = [{'kind': 'blog', 'id': post_id, 'type': 'like', 'liker': 'k', 'at': '2026-01-01T00:00:00'},
+              {'kind': 'blog', 'id': post_id, 'type': 'rating', 'score': 5, 'at': '2026-01-01T00:00:00'}]
+    with open(os.path.join(spool_dir, f'{dead_pid()}.spool'), 'w') as f:
+        f.write(''.join(json.dumps(event) + '\n' for event in events))
+        f.write('{"kind": "blog", "id"')  # cut short by the crash
+
+    result = app.test_cli_runner().invoke(args=['engagement', 'flush'])
+    assert result.exit_code == 0, result.output
+    assert 'Wrote 2 events' in result.output
+    assert counters(app, post) == (1, 1, 5)
+    assert os.listdir(spool_dir) == []
+
+
+def test_replayed_batch_counts_ratings_again(app, post):
+    # Delivery is at-least-once: a crash after the commit but before the
+    # spool is deleted replays the batch. Likes are deduplicated, ratings
+    # are counted twice.
+    with app.app_context():
+        post_id = BlogPost.query.filter_by(slug=post).one().id
+    spool_dir = app.config['ENGAGEMENT_SPOOL_DIR']
+    os.makedirs(spool_dir)
+    events = [{'kind': 'blog', 'id': post_id, 'type': 'like', 'liker': 'k', 'at': '2026-01-01T00:00:00'},
+              {'kind': 'blog', 'id': post_id, 'type': 'rating', 'score': 3, 'at': '2026-01-01T00:00:00'}]
+    for _ in range(2):
+        with open(os.path.join(spool_dir, f'{dead_pid()}.1.flushing'), 'w') as f:
+            f.write(''.join(json.dumps(event) + '\n' for event in events))
+        app.extensions['engagement'].flush()
+    assert counters(app, post) == (1, 2, 6)
+
+
+def test_full_buffer_answers_503(app, client, post):
+    ingest = app.extensions['engagement']
+    ingest.max_pending = 0
+    ingest.enqueue_timeout = 0.05
+
+    response = like(client, post, rating='5')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(engagement.RETRY_AFTER)
+    with app.app_context():
+        # The comment is not buffered and was still saved.
+        assert Comment.query.count() == 1
+    assert client.post(f'/blog/{post}', data={'content': 'Just a comment'}).status_code == 302
@@ -0,0 +1,65 @@
+import logging
+
+HTML = {'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8'}
+
+
+def test_not_found_page_is_rendered_once(app, client, monkeypatch):
+    first = client.get('/no-such-page', headers=HTML)
+    assert first.status_code == 404
+    assert 'Page Not Found' in first.get_data(as_text=True)
+
+    monkeypatch.setattr('flask.templating._render', lambda *args: 'rendered again')
+    second = client.get('/other?x=1&y=2', headers=HTML)
+    body = second.get_data(as_text=True)
+    assert second.status_code == 404
+    assert 'Page Not Found' in body
+    assert 'href="http://localhost/other"' in body
+    assert 'content="http://localhost/other?x=1&amp;y=2"' in body
+    assert '/no-such-page' not in body
+
+
+def test_scanners_and_non_html_clients_get_plain_text(client):
+    for path, headers in (('/wp-login.php', HTML), ('/.env', HTML), ('/no-such-page', {'Accept': 'application/json'})):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 404
+        assert response.mimetype == 'text/plain'
+        assert response.get_data(as_text=True) == '404 Not Found\n'
+
+
+def test_method_not_allowed_keeps_allow_header(client):
+    response = client.delete('/blog', headers=HTML)
+    assert response.status_code == 405
+    assert 'GET' in response.headers['Allow']
+    assert 'Method Not Allowed' in response.get_data(as_text=True)
+
+
+def test_misses_are_counted_and_sampled(make_app, caplog):
+    app = make_app(ERROR_LOG_SAMPLE=3)
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        for _ in range(6):
+            client.get('/wp-login.php')
+        client.get('/missing')
+    logged = [record.getMessage() for record in caplog.records if ' 404 ' in record.getMessage()]
+    assert len(logged) == 3
+    assert '(seen 3 times)' in logged[0] and '(seen 6 times)' in logged[1] and '/missing' in logged[2]
+    assert app.extensions['error_counts'].top(1) == [{'status': 404, 'path': '/wp-login.php', 'count': 6}]
+
+
+def test_cached_page_never_shows_a_users_header(app):
+    from extension import db
+    from model import User
+
+    with app.app_context():
+        user = User(username='admin')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+    admin = app.test_client()
+    admin.post('/auth/login', data={'username': 'admin', 'password': 'password'})
+    assert 'Logout' in admin.get('/no-such-page', headers=HTML).get_data(as_text=True)
+
+    body = app.test_client().get('/no-such-page', headers=HTML).get_data(as_text=True)
+    assert 'Page Not Found' in body
+    assert 'Logout' not in body
+    assert 'Logout' not in app.extensions['error_pages'][404]
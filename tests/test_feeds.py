@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import event
+
+import feeds
+from content_cache import ContentCache
+from extension import db
+from model import BlogPost
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    feeds.cache.clear()
+    yield
+    feeds.cache.clear()
+
+
+def test_request_hosts_are_not_cached(make_app):
+    client = make_app(SITEMAP_BASE_URL=None).test_client()
+    for host in ('a.example', 'b.example'):
+        assert f'://{host}/blog' in client.get('/feed.xml', headers={'Host': host}).get_data(as_text=True)
+    assert feeds.cache._entries == {}
+
+
+def test_listed_hosts_are_cached(make_app):
+    app = make_app(SITEMAP_BASE_URL=None, SITEMAP_HOSTS=['portfolio.example'])
+    client = app.test_client()
+    for host in ('portfolio.example', 'evil.example'):
+        assert f'://{host}/blog' in client.get('/feed.xml', headers={'Host': host}).get_data(as_text=True)
+    assert [base_url.split('://')[1] for _, base_url in feeds.cache._entries] == ['portfolio.example']
+
+
+def test_cache_is_bounded(app):
+    cache = ContentCache(max_entries=2)
+    with app.app_context():
+        for key in 'abc':
+            cache.set(key, key.upper(), None)
+        assert cache.get('a') is None and cache.get('b') == 'B' and cache.get('c') == 'C'
+
+
+def test_cached_shard_runs_no_queries(make_app, monkeypatch):
+    monkeypatch.setattr(feeds, 'URLS_PER_SITEMAP', 4)
+    app = make_app(SITEMAP_BASE_URL='https://portfolio.example')
+    with app.app_context():
+        db.session.add_all(BlogPost(title=f'Post {i}', slug=f'post-{i}', content='<p>x</p>') for i in range(6))
+        db.session.commit()
+        engine = db.engine
+    client = app.test_client()
+    assert 'post-3' in client.get('/sitemap-1.xml').get_data(as_text=True)
+    assert client.get('/sitemap-9.xml').status_code == 404
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    body = client.get('/sitemap-1.xml').get_data(as_text=True)
+    assert 'https://portfolio.example/blog/post-3' in body
+    assert statements == []
@@ -0,0 +1,81 @@
+import json
+import os
+
+import click
+import pytest
+
+import freeze
+from extension import db
+from model import BlogPost
+
+
+@pytest.fixture
+def frozen_app(make_app, tmp_path):
+    app = make_app(FREEZE_DIR=str(tmp_path / 'frozen'), STATIC_FIRST=True, SITEMAP_BASE_URL='http://localhost')
+    with app.app_context():
+        db.session.add_all([BlogPost(title=f'Post {n}', slug=f'post-{n}', content='<p>Text</p>') for n in (1, 2)])
+        db.session.commit()
+        freeze.freeze(app)
+    return app
+
+
+def edit_post(app, post_id, title):
+    with app.app_context():
+        db.session.get(BlogPost, post_id).title = title
+        db.session.commit()
+
+
+def test_edit_re_renders_only_pages_with_its_key(frozen_app):
+    manifest = freeze.read_manifest(freeze.freeze_dir(frozen_app))
+    assert manifest['pages']['/blog/post-1']['keys'] == ['post-1']
+    assert 'post-1' not in manifest['pages']['/blog/post-2']['keys']
+
+    edit_post(frozen_app, 1, 'Edited')
+    # Run like the CLI, inside one app context.
+    with frozen_app.app_context():
+        result = freeze.freeze(frozen_app)
+    assert '/blog/post-1' in result['rendered']
+    assert '/blog/post-2' not in result['rendered']
+    assert not set(result['rendered']) - {url for url, page in manifest['pages'].items() if 'post-1' in page['keys']}
+
+
+def test_fresh_pages_are_served_from_disk_until_stale(frozen_app):
+    folder = freeze.freeze_dir(frozen_app)
+    name = freeze.read_manifest(folder)['pages']['/portfolio']['file']
+    with open(os.path.join(folder, name), 'w', encoding='utf-8') as f:
+        f.write('frozen copy')
+    client = frozen_app.test_client()
+    assert client.get('/portfolio').get_data(as_text=True) == 'frozen copy'
+    # Another host than the one frozen for renders live.
+    assert client.get('/portfolio', base_url='http://other.example').get_data(as_text=True) != 'frozen copy'
+
+    page = client.get('/blog/post-1').get_data(as_text=True)
+    assert 'Post 1' in page
+    edit_post(frozen_app, 1, 'Edited')
+    assert 'Edited' in client.get('/blog/post-1').get_data(as_text=True)
+    # Stale keys are shared with other workers through the folder.
+    assert freeze.FrozenSite(folder).lookup('/blog/post-1', 'localhost') is None
+    assert freeze.FrozenSite(folder).lookup('/blog/post-2', 'localhost') is not None
+
+
+def test_frozen_forms_get_a_csrf_token_per_visitor(frozen_app):
+    # The public forms fetch their token; a page rendering csrf_token() is frozen like this.
+    folder = freeze.freeze_dir(frozen_app)
+    manifest = freeze.read_manifest(folder)
+    entry = manifest['pages']['/blog/post-1']
+    entry['csrf'] = True
+    with open(os.path.join(folder, entry['file']), 'w', encoding='utf-8') as f:
+        f.write(f'<input name="csrf_token" value="{freeze.CSRF_PLACEHOLDER}">')
+    freeze._write(os.path.join(folder, freeze.MANIFEST), json.dumps(manifest).encode('utf-8'))
+
+    pages = [frozen_app.test_client().get('/blog/post-1').get_data(as_text=True) for _ in range(2)]
+    for page in pages:
+        assert page.startswith('<input name="csrf_token" value="')
+        assert freeze.CSRF_PLACEHOLDER not in page
+    assert pages[0] != pages[1]
+
+
+def test_freeze_needs_a_base_url(make_app):
+    app = make_app(SITEMAP_BASE_URL='')
+    with app.app_context(), pytest.raises(click.ClickException):
+        freeze.freeze(app)
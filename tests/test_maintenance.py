@@ -0,0 +1,71 @@
+import os
+import sqlite3
+
+import pytest
+from click import ClickException
+
+import maintenance
+from extension import db
+from model import BlogPost, UploadedImage
+
+
+def add_images(app, count, size=64 * 1024):
+    with app.app_context():
+        db.session.add_all([UploadedImage(filename=f'{n}.png', data=os.urandom(size)) for n in range(count)])
+        db.session.commit()
+
+
+def test_snapshot_is_a_consistent_copy(app, tmp_path):
+    add_images(app, 3)
+    with app.app_context():
+        dest = maintenance.snapshot_sqlite(maintenance.sqlite_path(db.engine), str(tmp_path / 'copy.db'), pages=4)
+    connection = sqlite3.connect(dest)
+    assert connection.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    assert connection.execute('SELECT count(*) FROM uploaded_image').fetchone()[0] == 3
+
+
+def test_compact_reclaims_deleted_blobs(app):
+    add_images(app, 10)
+    with app.app_context():
+        path = maintenance.sqlite_path(db.engine)
+        db.engine.dispose()
+        with pytest.raises(ClickException):
+            maintenance.compact_sqlite(path)
+        maintenance.compact_sqlite(path, full=True)
+        db.session.execute(db.delete(UploadedImage))
+        db.session.commit()
+        db.session.remove()
+        assert maintenance.sqlite_stats(path)['free_pages'] > 100
+        result = maintenance.compact_sqlite(path, pages=50)
+    assert result['after']['free_pages'] == 0
+    assert result['reclaimed'] >= 10 * 64 * 1024
+
+
+def test_run_records_snapshot_and_prunes(make_app, tmp_path):
+    app = make_app(BACKUP_KEEP=1)
+    add_images(app, 1)
+    with app.app_context():
+        first = maintenance.run(app)
+        os.rename(first['snapshot'], os.path.join(os.path.dirname(first['snapshot']), 'site-00000000-000000.db'))
+        second = maintenance.run(app)
+    assert os.listdir(tmp_path / 'backups') == [os.path.basename(second['snapshot'])]
+    state = maintenance.read_state(str(tmp_path / 'maintenance.json'))
+    assert [run['snapshot'] for run in state['runs']] == [second['snapshot'], first['snapshot']]
+    assert 'auto_vacuum is off' in second['note']
+
+
+def test_deleting_blob_rows_schedules_a_run(app, post, tmp_path):
+    pending = tmp_path / 'maintenance.json.pending'
+    with app.app_context():
+        db.session.delete(db.session.scalars(db.select(BlogPost)).one())
+        db.session.commit()
+    assert pending.exists()
+    os.remove(pending)
+    with app.app_context():
+        maintenance.run(app)
+        db.session.add(BlogPost(title='Again', slug='again', content='<p>x</p>'))
+        db.session.commit()
+        db.session.delete(db.session.scalars(db.select(BlogPost)).one())
+        db.session.commit()
+    # The last run is recent: nothing is scheduled.
+    assert not pending.exists()
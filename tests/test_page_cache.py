@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import event
+
+from content_cache import ContentCache
+from extension import db
+from model import Comment
+from utils import file_lock
+
+
+@pytest.fixture
+def cached_app(make_app):
+    app = make_app(PAGE_CACHE=True)
+    from model import BlogPost
+
+    with app.app_context():
+        db.session.add(BlogPost(title='Deluge tips', slug='deluge-tips', content='<p>Use maps.</p>'))
+        db.session.commit()
+    return app
+
+
+def post_queries(app):
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM blog_post' in statement:
+            queries.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    return queries
+
+
+def test_hit_skips_the_view(cached_app):
+    client = cached_app.test_client()
+    first = client.get('/blog/deluge-tips')
+    queries = post_queries(cached_app)
+    second = client.get('/blog/deluge-tips')
+    assert second.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert 'post-1' in second.headers['Surrogate-Key'].split()
+    assert second.headers['Cache-Control'].startswith('public')
+    assert not queries
+    assert cached_app.extensions['page_cache'].stats['hits'] == 1
+
+
+def test_comment_invalidates_pages(cached_app):
+    client = cached_app.test_client()
+    client.get('/blog/deluge-tips')
+    with cached_app.app_context():
+        db.session.add(Comment(content='Nice one', post_id=1))
+        db.session.commit()
+    assert 'Nice one' in client.get('/blog/deluge-tips').get_data(as_text=True)
+
+
+def test_logged_in_pages_are_not_cached(cached_app):
+    client = cached_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1:x'
+    client.get('/blog/deluge-tips')
+    assert not cached_app.extensions['page_cache']._entries
+
+
+def test_concurrent_misses_build_once(app):
+    cache = ContentCache(version=lambda: 1)
+    started, builds, results = threading.Event(), [], []
+
+    def build():
+        builds.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'page'
+
+    def get():
+        results.append(cache.get_or_build('key', build))
+
+    threads = [threading.Thread(target=get) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['page'] * 5
+    assert len(builds) == 1
+    assert cache.stats['coalesced'] == 4
+
+
+def test_stale_value_served_while_rebuilding(app):
+    version = [1]
+    cache = ContentCache(version=lambda: version[0])
+    cache.get_or_build('key', lambda: 'old')
+    version[0] = 2
+    value, flight = cache.begin('key')
+    assert value is None and flight is not None
+    # Another caller gets the previous value instead of waiting.
+    assert cache.begin('key') == ('old', None)
+    flight.finish('new')
+    assert cache.begin('key') == ('new', None)
+
+
+def test_failed_build_lets_the_next_caller_retry(app):
+    cache = ContentCache(version=lambda: 1)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_build('key', fail)
+    assert cache.get_or_build('key', lambda: 'page') == 'page'
+
+
+def test_non_blocking_file_lock(tmp_path):
+    path = str(tmp_path / 'key')
+    with file_lock(path) as held:
+        assert held
+        # flock locks belong to the open file, so a second open contends.
+        with file_lock(path, blocking=False) as other:
+            assert not other
+    with file_lock(path, blocking=False) as held:
+        assert held
@@ -0,0 +1,100 @@
+import logging
+
+import pytest
+
+import rate_limit
+from extension import db
+from model import Comment
+
+
+def test_feedback_over_burst_gets_429(make_app, post):
+    app = make_app(RATE_LIMITS={'feedback': {'rate': 1, 'per': 60, 'burst': 2}})
+    client = app.test_client()
+    assert [client.post(f'/blog/{post}', data={'content': 'Hi'}).status_code for _ in range(3)] == [302, 302, 429]
+    response = client.post(f'/blog/{post}', data={'content': 'Hi'})
+    assert response.status_code == 429 and 50 <= int(response.headers['Retry-After']) <= 60
+    # Reading the page is not limited, and rejected posts wrote nothing.
+    assert client.get(f'/blog/{post}').status_code == 200
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(Comment)) == 2
+
+
+def test_limits_are_per_client(make_app, post):
+    app = make_app(RATE_LIMITS={'feedback': {'rate': 1, 'per': 60, 'burst': 1}})
+    client = app.test_client()
+    assert client.post(f'/blog/{post}', data={'content': 'Hi'}).status_code == 302
+    assert client.post(f'/blog/{post}', data={'content': 'Hi'}).status_code == 429
+    other = {'REMOTE_ADDR': '10.0.0.2'}
+    assert client.post(f'/blog/{post}', data={'content': 'Hi'}, environ_base=other).status_code == 302
+
+
+def test_clients_behind_a_proxy_get_their_own_buckets(make_app, post):
+    app = make_app(RATE_LIMITS={'feedback': {'rate': 1, 'per': 60, 'burst': 1}}, RATE_LIMIT_PROXY_COUNT=1)
+    client = app.test_client()
+
+    def send(forwarded_for):
+        return client.post(f'/blog/{post}', data={'content': 'Hi'},
+                           headers={'X-Forwarded-For': forwarded_for}).status_code
+
+    assert send('203.0.113.1') == 302
+    assert send('203.0.113.2') == 302
+    # Only the entry added by the proxy counts, not what the client sent.
+    assert send('198.51.100.9, 203.0.113.1') == 429
+
+
+def test_key_header(make_app, post):
+    app = make_app(RATE_LIMITS={'feedback': {'rate': 1, 'per': 60, 'burst': 1}},
+                   RATE_LIMIT_KEY_HEADER='CF-Connecting-IP')
+    client = app.test_client()
+    for address, status in (('203.0.113.1', 302), ('203.0.113.2', 302), ('203.0.113.1', 429)):
+        assert client.post(f'/blog/{post}', data={'content': 'Hi'},
+                           headers={'CF-Connecting-IP': address}).status_code == status
+
+
+def test_rejections_are_cheap_and_sampled(make_app, caplog):
+    app = make_app(RATE_LIMITS={'login': {'rate': 1, 'per': 60, 'burst': 1}}, ERROR_LOG_SAMPLE=3)
+    client = app.test_client()
+    form = {'username': 'admin', 'password': 'wrong'}
+    client.post('/auth/login', data=form)
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        responses = [client.post('/auth/login', data=form, headers={'Accept': 'text/html'}) for _ in range(3)]
+    assert {response.status_code for response in responses} == {429}
+    assert 'Retry-After' in responses[0].headers
+    assert responses[0].get_data() == responses[1].get_data()
+    assert app.extensions['error_pages'][429]
+    assert len([record for record in caplog.records if ' 429 ' in record.getMessage()]) == 2
+    assert client.post('/auth/login', data=form).mimetype == 'text/plain'
+
+
+def test_login_is_limited(make_app):
+    app = make_app(RATE_LIMITS={'login': {'rate': 1, 'per': 60, 'burst': 1}})
+    client = app.test_client()
+    form = {'username': 'admin', 'password': 'wrong'}
+    assert client.post('/auth/login', data=form).status_code == 200
+    assert client.post('/auth/login', data=form).status_code == 429
+
+
+def test_bucket_refills():
+    backend = rate_limit.MemoryBackend()
+    assert backend.take('k', 1, 1, 100.0) == (True, 0)
+    allowed, retry_after = backend.take('k', 1, 1, 100.5)
+    assert not allowed and retry_after == pytest.approx(0.5)
+    assert backend.take('k', 1, 1, 101.0)[0]
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    path = str(tmp_path / 'ratelimit.db')
+    # Two backends on one file stand for two workers.
+    first, second = rate_limit.SQLiteBackend(path), rate_limit.SQLiteBackend(path)
+    assert first.take('k', 1, 2, 100.0)[0]
+    assert second.take('k', 1, 2, 100.0)[0]
+    assert not first.take('k', 1, 2, 100.0)[0]
+
+
+def test_unusable_storage_falls_back_to_memory(make_app, tmp_path, post):
+    (tmp_path / 'not-a-dir').write_text('')
+    app = make_app(RATE_LIMIT_STORAGE=str(tmp_path / 'not-a-dir' / 'ratelimit.db'),
+                   RATE_LIMITS={'feedback': {'rate': 1, 'per': 60, 'burst': 1}})
+    client = app.test_client()
+    assert client.post(f'/blog/{post}', data={'content': 'Hi'}).status_code == 302
+    assert client.post(f'/blog/{post}', data={'content': 'Hi'}).status_code == 429
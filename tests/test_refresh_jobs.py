@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+import refresh_jobs
+import related_index
+import skill_analytics
+from extension import db
+from model import BlogPost, Project, Skill, SubSkill, related_content
+
+
+def run(app, *args):
+    result = app.test_cli_runner().invoke(args=list(args))
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_commit_queues_related_refresh(app):
+    with app.app_context():
+        db.session.add_all([
+            BlogPost(title='Zoho Deluge webhooks', slug='a', content='<p>Deluge webhooks in Zoho Creator</p>'),
+            BlogPost(title='More Zoho Deluge webhooks', slug='b', content='<p>Zoho Creator Deluge webhooks</p>'),
+            BlogPost(title='Tailwind layouts', slug='c', content='<p>Responsive grids with Tailwind CSS</p>'),
+        ])
+        db.session.commit()
+        path = related_index.index_path(app)
+        with open(refresh_jobs.pending_path(path)) as f:
+            assert sorted(map(tuple, json.load(f)['keys'])) == [('blog', 1), ('blog', 2), ('blog', 3)]
+        # Nothing was computed in the committing process.
+        assert db.session.execute(db.select(db.func.count()).select_from(related_content)).scalar() == 0
+
+    assert 'Re-indexed 3 documents' in run(app, 'related', 'refresh')
+    with app.app_context():
+        assert [item['id'] for item in related_index.related_items('blog', 1)] == [2]
+    assert not os.path.exists(refresh_jobs.pending_path(path))
+    assert 'No pending changes' in run(app, 'related', 'refresh')
+
+
+def test_commit_queues_skill_analytics_refresh(app):
+    with app.app_context():
+        skill = Skill(name='Automation')
+        subskills = [SubSkill(name='Deluge', skill=skill), SubSkill(name='Python', skill=skill)]
+        db.session.add(Project(title='Sync', slug='sync', description='d', content='<p>c</p>', subskills=subskills))
+        db.session.commit()
+        path = skill_analytics.snapshot_path(app)
+        assert os.path.exists(refresh_jobs.pending_path(path))
+        assert not os.path.exists(path)
+
+    run(app, 'skills', 'refresh-analytics')
+    with app.app_context():
+        (first, second, count), = skill_analytics.top_pairs()
+        assert {first['name'], second['name']} == {'Deluge', 'Python'} and count == 1
+
+
+def test_failed_refresh_keeps_changes(app, tmp_path):
+    path = str(tmp_path / 'index')
+    with app.app_context():
+        refresh_jobs.queue(path, {'keys': [('blog', 1)], 'rebuild': False}, ('related', 'refresh'))
+
+        def fail(pending):
+            raise RuntimeError('database went away')
+
+        with pytest.raises(RuntimeError):
+            refresh_jobs.apply_pending(path, fail)
+        refresh_jobs.queue(path, {'keys': [('blog', 2)], 'rebuild': True}, ('related', 'refresh'))
+        assert refresh_jobs.apply_pending(path, lambda pending: None) == {
+            'keys': [['blog', 1], ['blog', 2]], 'rebuild': True}
+
+
+def test_queue_starts_refresh_process(app, tmp_path, monkeypatch):
+    started = []
+    monkeypatch.setattr(subprocess, 'Popen', lambda args, **kwargs: started.append((args, kwargs['cwd'])))
+    app.config['BACKGROUND_REFRESH'] = True
+    with app.app_context():
+        refresh_jobs.queue(str(tmp_path / 'index'), {'keys': []}, ('related', 'refresh'))
+    (args, cwd), = started
+    assert args[-4:] == ['--app', 'app', 'related', 'refresh'] and cwd == app.root_path
@@ -0,0 +1,82 @@
+from sqlalchemy import inspect
+
+import search_index
+from extension import db
+from model import BlogPost, Project
+
+
+def found(query, **kwargs):
+    results, cursor = search_index.search(db.session.connection(), query, **kwargs)
+    return [(result['kind'], result['slug']) for result in results], cursor
+
+
+def test_commits_keep_the_index_in_sync(app):
+    with app.app_context():
+        post = BlogPost(title='Deluge tips', slug='deluge-tips', content='<p>Use <b>maps</b>.</p>')
+        db.session.add_all([post, Project(title='Invoice sync', slug='invoice-sync', description='Zoho Books',
+                                          content='<p>Deluge functions</p>')])
+        db.session.commit()
+        assert found('maps')[0] == [('blog', 'deluge-tips')]
+        assert sorted(found('deluge')[0]) == [('blog', 'deluge-tips'), ('project', 'invoice-sync')]
+
+        post.title = 'Creator widgets'
+        db.session.commit()
+        assert found('widgets')[0] == [('blog', 'deluge-tips')]
+        assert found('deluge')[0] == [('project', 'invoice-sync')]
+
+        db.session.delete(post)
+        db.session.commit()
+        assert found('maps')[0] == []
+
+
+def test_rolled_back_changes_are_not_indexed(app):
+    with app.app_context():
+        db.session.add(BlogPost(title='Draft', slug='draft', content='<p>Unsaved</p>'))
+        db.session.flush()
+        db.session.rollback()
+        assert found('draft')[0] == []
+
+
+def test_terms_match_as_prefixes(app):
+    with app.app_context():
+        db.session.add(BlogPost(title='Deluge scripting', slug='deluge', content='<p>Automation</p>'))
+        db.session.commit()
+        assert found('delu autom')[0] == [('blog', 'deluge')]
+        results, _ = search_index.search(db.session.connection(), 'scrip')
+        assert '<mark>' in results[0]['title']
+        assert found('delu other')[0] == []
+
+
+def test_cursor_pages_through_results(app):
+    with app.app_context():
+        db.session.add_all([BlogPost(title=f'Deluge {n}', slug=f'deluge-{n}', content='<p>Text</p>') for n in range(5)])
+        db.session.commit()
+        pages, cursor = [], None
+        while True:
+            page, cursor = found('deluge', limit=2, after=cursor)
+            pages.append(page)
+            if cursor is None:
+                break
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert len({slug for page in pages for _, slug in page}) == 5
+
+
+def test_malformed_cursors_start_over(app, client):
+    assert search_index.decode_cursor('not a cursor!') is None
+    assert search_index.decode_cursor(search_index.encode_cursor(1.5, 3)) == (1.5, 3)
+    with app.app_context():
+        db.session.add(BlogPost(title='Deluge tips', slug='deluge-tips', content='<p>Text</p>'))
+        db.session.commit()
+        assert found('deluge', after='e30')[0] == [('blog', 'deluge-tips')]
+    response = client.get('/search/?q=deluge&after=%%%')
+    assert response.status_code == 200
+    assert 'deluge-tips' in response.get_data(as_text=True)
+
+
+def test_table_follows_create_and_drop_all(app):
+    with app.app_context():
+        assert inspect(db.engine).has_table('search_document')
+        db.drop_all()
+        assert not inspect(db.engine).has_table('search_document')
+        db.create_all()
+        assert inspect(db.engine).has_table('search_document')
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import delete, insert, select
+
+from extension import db
+from model import Project, Skill, SubSkill, skill_project
+
+
+@pytest.fixture
+def skills(app):
+    """Ids of two skills with two subskills each and a project using one of the first."""
+    with app.app_context():
+        automation, web = Skill(name='Automation'), Skill(name='Web')
+        deluge, python = SubSkill(name='Deluge', skill=automation), SubSkill(name='Python', skill=automation)
+        flask, css = SubSkill(name='Flask', skill=web), SubSkill(name='CSS', skill=web)
+        project = Project(title='Invoice sync', slug='invoice-sync', description='d', content='<p>c</p>',
+                          subskills=[deluge])
+        db.session.add_all([automation, web, deluge, python, flask, css, project])
+        db.session.commit()
+        return {obj.name if not isinstance(obj, Project) else 'project': obj.id
+                for obj in (automation, web, deluge, python, flask, css, project)}
+
+
+def index_state():
+    pairs = set(db.session.execute(select(skill_project.c.skill_id, skill_project.c.project_id)).all())
+    counts = dict(db.session.execute(select(Skill.id, Skill.project_count)).all())
+    return pairs, counts
+
+
+def test_adding_and_removing_subskills_updates_the_index(app, skills):
+    with app.app_context():
+        assert index_state() == ({(skills['Automation'], skills['project'])}, {skills['Automation']: 1, skills['Web']: 0})
+
+        project = db.session.get(Project, skills['project'])
+        project.subskills.append(db.session.get(SubSkill, skills['Flask']))
+        db.session.commit()
+        assert index_state() == ({(skills['Automation'], skills['project']), (skills['Web'], skills['project'])},
+                                 {skills['Automation']: 1, skills['Web']: 1})
+
+        # Still one project for Automation while any of its subskills is used.
+        project.subskills.append(db.session.get(SubSkill, skills['Python']))
+        project.subskills.remove(db.session.get(SubSkill, skills['Deluge']))
+        db.session.commit()
+        assert index_state()[1] == {skills['Automation']: 1, skills['Web']: 1}
+
+        project.subskills = [db.session.get(SubSkill, skills['Flask'])]
+        db.session.commit()
+        assert index_state() == ({(skills['Web'], skills['project'])}, {skills['Automation']: 0, skills['Web']: 1})
+
+
+def test_moving_a_subskill_and_deleting_the_project(app, skills):
+    with app.app_context():
+        db.session.get(SubSkill, skills['Deluge']).skill_id = skills['Web']
+        db.session.commit()
+        assert index_state() == ({(skills['Web'], skills['project'])}, {skills['Automation']: 0, skills['Web']: 1})
+
+        db.session.delete(db.session.get(Project, skills['project']))
+        db.session.commit()
+        assert index_state() == (set(), {skills['Automation']: 0, skills['Web']: 0})
+
+
+def test_check_index_reports_drift(app, skills):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['skills', 'check-index'])
+    assert result.exit_code == 0
+    assert 'consistent' in result.output
+
+    with app.app_context():
+        db.session.execute(delete(skill_project))
+        db.session.execute(insert(skill_project).values(skill_id=skills['Web'], project_id=skills['project']))
+        db.session.get(Skill, skills['Web']).project_count = 5
+        db.session.commit()
+    result = runner.invoke(args=['skills', 'check-index'])
+    assert result.exit_code == 1
+    assert f"missing pair: skill {skills['Automation']} -> project {skills['project']}" in result.output
+    assert f"stale pair: skill {skills['Web']} -> project {skills['project']}" in result.output
+    assert f"skill {skills['Web']}: project_count is 5, expected 0" in result.output
+
+    assert runner.invoke(args=['skills', 'rebuild-index']).exit_code == 0
+    assert runner.invoke(args=['skills', 'check-index']).exit_code == 0
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import event
+
+import skill_taxonomy
+from extension import db
+from model import Project, Skill, SubSkill, User
+
+
+@pytest.fixture
+def admin_client(app):
+    with app.app_context():
+        user = User(username='admin')
+        user.set_password('password')
+        skill = Skill(name='Automation', description='Workflows')
+        db.session.add_all([user, skill, SubSkill(name='Deluge', skill=skill), SubSkill(name='Python', skill=skill)])
+        db.session.commit()
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'password'})
+    return client
+
+
+def skill_queries(app):
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM skill' in statement:
+            queries.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    return queries
+
+
+def test_taxonomy_is_loaded_once(app, admin_client):
+    queries = skill_queries(app)
+    for _ in range(2):
+        assert 'Automation' in admin_client.get('/home').get_data(as_text=True)
+        assert 'Deluge' in admin_client.get('/admin/project/new').get_data(as_text=True)
+    assert len(queries) == 1
+    with app.app_context():
+        (skill,) = skill_taxonomy.taxonomy().skills
+        assert [subskill.name for subskill in skill.subskills] == ['Deluge', 'Python']
+
+
+def test_admin_edit_refreshes_taxonomy(app, admin_client):
+    admin_client.get('/admin/project/new')
+    assert admin_client.post('/admin/subskill/edit/1', data={'name': 'Zoho Deluge', 'skill_id': 1}).status_code == 302
+    assert 'Zoho Deluge' in admin_client.get('/admin/project/new').get_data(as_text=True)
+
+
+def test_project_form_saves_selected_rows(app, admin_client):
+    data = {'title': 'Invoice sync', 'description': 'd', 'content': '<p>c</p>', 'subskills': ['2']}
+    assert admin_client.post('/admin/project/new', data=data).status_code == 302
+    with app.app_context():
+        assert [subskill.name for subskill in db.session.scalars(db.select(Project)).one().subskills] == ['Python']
+    # An id that isn't in the taxonomy fails validation: the form is shown again.
+    assert admin_client.post('/admin/project/new', data=dict(data, title='Unknown skill', subskills=['99'])).status_code == 200
+
+
+def test_subskill_filter(app, admin_client):
+    admin_client.post('/admin/project/new', data={'title': 'Invoice sync', 'description': 'd',
+                                                  'content': '<p>c</p>', 'subskills': ['2']})
+    assert 'Invoice sync' in admin_client.get('/portfolio/subskill/2').get_data(as_text=True)
+    assert 'Invoice sync' not in admin_client.get('/portfolio/subskill/1').get_data(as_text=True)
+    assert admin_client.get('/portfolio/subskill/99').status_code == 404
+    assert admin_client.get('/portfolio/skill/99').status_code == 404
+
+
+def test_edit_form_marks_current_subskills(app, admin_client):
+    admin_client.post('/admin/project/new', data={'title': 'Invoice sync', 'description': 'd',
+                                                  'content': '<p>c</p>', 'subskills': ['2']})
+    body = admin_client.get('/admin/project/1/edit').get_data(as_text=True)
+    assert '<option selected value="2">Python</option>' in body
+    assert '<option value="1">Deluge</option>' in body
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import event
+
+from extension import db
+from model import User
+
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        user = User(username='admin')
+        user.set_password('old-password')
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def login(app, password='old-password'):
+    client = app.test_client()
+    response = client.post('/auth/login', data={'username': 'admin', 'password': password})
+    assert response.status_code == 302, response.get_data(as_text=True)
+    return client
+
+
+def user_queries(app):
+    """Record the user loader's lookups by id."""
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM user' in statement and 'WHERE user.id = ?' in statement:
+            queries.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    return queries
+
+
+def test_logged_in_requests_skip_user_lookup(admin):
+    client = login(admin)
+    queries = user_queries(admin)
+    for _ in range(3):
+        assert client.get('/admin/dashboard').status_code == 200
+    assert len(queries) == 1
+
+
+def test_password_change_logs_out_other_sessions(admin):
+    other = login(admin)
+    assert other.get('/admin/dashboard').status_code == 200
+    editor = login(admin)
+    assert editor.post('/admin/user/1/edit', data={'username': 'admin', 'password': 'new-password',
+                                                   'remember': False}).status_code == 302
+    assert other.get('/admin/dashboard').status_code == 302
+    assert login(admin, 'new-password').get('/admin/dashboard').status_code == 200
+
+
+def test_user_commit_invalidates_other_workers(admin, make_app):
+    client = login(admin)
+    assert 'admin' in client.get('/admin/users').get_data(as_text=True)
+    # A second app stands for another worker with the same database and stamp file.
+    with make_app().app_context():
+        db.session.get(User, 1).username = 'renamed'
+        db.session.commit()
+    queries = user_queries(admin)
+    assert client.get('/admin/dashboard').status_code == 200
+    assert len(queries) == 1
+
+
+def test_deleted_user_is_logged_out(admin):
+    client = login(admin)
+    assert client.get('/admin/dashboard').status_code == 200
+    assert client.post('/admin/user/1/delete').status_code == 302
+    assert client.get('/admin/dashboard').status_code == 302
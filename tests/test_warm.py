@@ -0,0 +1,70 @@
+import pytest
+from flask_login import login_user
+
+import warm
+from extension import db
+from model import BlogPost, User
+
+
+@pytest.fixture
+def warm_app(make_app):
+    app = make_app(PAGE_CACHE=True, CACHE_WARM=True, CACHE_WARM_LIMIT=2, CACHE_WARM_DELAY=0,
+                   SITEMAP_BASE_URL='http://localhost')
+    with app.app_context():
+        db.session.add_all([BlogPost(title=f'Post {n}', slug=f'post-{n}', content='<p>Text</p>') for n in range(3)])
+        db.session.add(BlogPost(title='With image', slug='with-image', content='<p>Text</p>',
+                                image_data=b'\xff\xd8 jpeg', image_mimetype='image/jpeg'))
+        db.session.commit()
+    return app
+
+
+def test_warm_fills_the_page_cache(warm_app):
+    statuses = warm.warm(warm_app)
+    assert set(statuses.values()) == {200}
+    # The two latest posts (and the image of one of them), not the older ones.
+    assert {'/blog/with-image', '/blog/post-2', '/image/blog/4'} <= set(statuses)
+    assert '/blog/post-0' not in statuses
+    cache = warm_app.extensions['page_cache']
+    cache.stats['hits'] = 0
+    client = warm_app.test_client()
+    assert client.get('/').status_code == 200
+    image = client.get('/image/blog/4')
+    assert image.get_data() == b'\xff\xd8 jpeg'
+    assert image.mimetype == 'image/jpeg'
+    assert 'Content-Encoding' not in image.headers
+    assert cache.stats['hits'] == 2
+
+
+def test_no_base_url_warms_no_pages(make_app):
+    app = make_app(PAGE_CACHE=True, CACHE_WARM=True, SITEMAP_BASE_URL='')
+    assert warm.warm(app) == {}
+    assert not app.extensions['page_cache']._entries
+
+
+def test_admin_edit_schedules_warming(warm_app):
+    with warm_app.app_context():
+        user = User(username='admin')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+    warmer = warm_app.extensions['cache_warmer']
+    assert warmer.thread is None
+    with warm_app.test_request_context():
+        login_user(db.session.get(User, 1))
+        post = db.session.get(BlogPost, 1)
+        post.title = 'Edited'
+        db.session.commit()
+    assert warmer.thread is not None
+    assert warmer.wait(10)
+    cache = warm_app.extensions['page_cache']
+    hits = cache.stats['hits']
+    assert 'Edited' in warm_app.test_client().get('/blog').get_data(as_text=True)
+    assert cache.stats['hits'] == hits + 1
+
+
+def test_visitor_commits_do_not_warm(warm_app):
+    with warm_app.test_request_context():
+        post = db.session.get(BlogPost, 1)
+        post.title = 'Edited'
+        db.session.commit()
+    assert warm_app.extensions['cache_warmer'].thread is None
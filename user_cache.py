@@ -0,0 +1,124 @@
+"""Per-worker cache of the logged-in user for Flask-Login.
+
+`current_user` is resolved on every request that carries a session, and
+every template reads it. Instead of loading the `User` row each time, the
+user loader keeps a slim, detached `CachedUser` (id, username and the
+password version) per user id for USER_CACHE_TTL seconds.
+
+Session ids are `<id>:<password version>` (see `User.get_id`), so a
+password change invalidates every other session; a session whose version
+no longer matches loads as anonymous. Commits that create, change or
+delete users drop the entries in the committing worker and touch a stamp
+file (USER_STAMP_PATH, instance/users.stamp by default) whose mtime makes
+every other worker drop its cached users on their next lookup.
+"""
+import os
+import threading
+import time
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from content_cache import file_version, touch_file
+from model import User, password_version
+
+_CHANGED_KEY = 'user_cache_changed'
+
+
+class CachedUser(UserMixin):
+    """What `current_user` needs from a User, without holding a session-bound row."""
+
+    def __init__(self, id, username, version):
+        self.id = id
+        self.username = username
+        self.password_version = version
+
+    def get_id(self):
+        return f'{self.id}:{self.password_version}'
+
+    def __repr__(self):
+        return f"CachedUser('{self.username}')"
+
+
+def stamp_path(app):
+    return app.config.get('USER_STAMP_PATH') or os.path.join(app.instance_path, 'users.stamp')
+
+
+class UserCache:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            expires, user = self._entries.get(user_id, (0, None))
+            return user if expires > time.monotonic() else None
+
+    def set(self, user_id, user, version):
+        with self._lock:
+            if version == self._version:
+                self._entries[user_id] = (time.monotonic() + self.ttl, user)
+
+    def discard(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+
+def load_user(session_id):
+    """Flask-Login user loader: the CachedUser for `<id>:<version>`, or None."""
+    user_id, _, version = session_id.partition(':')
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return None
+    cache = current_app.extensions['user_cache']
+    stamp = file_version(stamp_path(current_app))
+    user = cache.get(user_id, stamp)
+    if user is None:
+        from extension import db
+
+        row = db.session.execute(
+            select(User.id, User.username, User.password_hash).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        user = CachedUser(row.id, row.username, password_version(row.password_hash))
+        cache.set(user_id, user, stamp)
+    return user if user.password_version == version else None
+
+
+def init_user_cache(app):
+    app.extensions['user_cache'] = UserCache(app.config.get('USER_CACHE_TTL', 60))
+
+
+# --- Invalidate on user commits ---
+
+@event.listens_for(Session, 'after_flush')
+def _record_changes(session, flush_context):
+    changed = {obj.id for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault(_CHANGED_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate(session):
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if not changed or not has_app_context() or 'user_cache' not in current_app.extensions:
+        return
+    current_app.extensions['user_cache'].discard(changed)
+    try:
+        touch_file(stamp_path(current_app))
+    except OSError:
+        current_app.logger.error('Failed to update user stamp', exc_info=True)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_CHANGED_KEY, None)
@@ -1,13 +1,15 @@
 from flask import current_app
+import contextlib
+import functools
 import io
-from PIL import Image
-import bleach
-from bleach.css_sanitizer import CSSSanitizer
+import os
 
-# Define your CSS sanitizer
-css_sanitizer = CSSSanitizer(
-    allowed_css_properties=['color', 'font-size', 'text-align', 'width', 'height', 'max-width', 'max-height', 'margin', 'padding', 'border'] 
-)
+# Pillow and bleach are comparatively slow to import and are only needed
+# when an admin saves content, so they are imported inside the functions
+# that use them instead of at module import time.
+
+# CSS properties allowed through the sanitizer
+ALLOWED_CSS_PROPERTIES = ['color', 'font-size', 'text-align', 'width', 'height', 'max-width', 'max-height', 'margin', 'padding', 'border']
 
 # List of allowed HTML tags for content
 ALLOWED_TAGS = ['a', 'abbr', 'acronym', 'b', 'blockquote', 'code', 'em', 'i', 'li', 'ol', 'p', 
@@ -22,6 +24,12 @@ ALLOWED_ATTRIBUTES = {
     '*': ['class', 'style'],
 }
 
+@functools.lru_cache(maxsize=None)
+def get_css_sanitizer():
+    """Return the shared CSS sanitizer, building it on first use."""
+    from bleach.css_sanitizer import CSSSanitizer
+    return CSSSanitizer(allowed_css_properties=ALLOWED_CSS_PROPERTIES)
+
 def save_image_to_db(form_picture, output_size=None):
     """
     Process and save an uploaded image to be stored in the database.
@@ -34,6 +42,8 @@ def save_image_to_db(form_picture, output_size=None):
         Tuple of (image_binary_data, mimetype, filename) or (None, None, None) if error
     """
     if form_picture:
+        from PIL import Image
+
         try:
             in_memory_file = io.BytesIO()
             form_picture.save(in_memory_file)
@@ -91,8 +101,41 @@ def clean_content(content):
     Returns:
         str: The cleaned and sanitized HTML content
     """
+    import bleach
+
     return bleach.clean(content,
                        tags=ALLOWED_TAGS,
                        attributes=ALLOWED_ATTRIBUTES,
-                       css_sanitizer=css_sanitizer,
-                       strip=True)
\ No newline at end of file
+                       css_sanitizer=get_css_sanitizer(),
+                       strip=True)
+
+
+@contextlib.contextmanager
+def file_lock(path, blocking=True):
+    """
+    Hold an exclusive advisory lock on `path` + '.lock'.
+
+    Used to serialize read-modify-write updates of snapshot files shared
+    by several worker processes. A no-op where fcntl is unavailable.
+
+    Args:
+        path: The file the lock protects
+        blocking: False to give up at once if another process holds the lock
+
+    Yields:
+        bool: Whether the lock is held (always True when blocking)
+    """
+    lock_path = f'{path}.lock'
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
@@ -0,0 +1,150 @@
+"""Cache warming: render the pages first visitors would otherwise wait for.
+
+`warm(app)` loads the skill taxonomy, then requests the home page, the
+blog and portfolio indexes and the CACHE_WARM_LIMIT most recent posts and
+projects (with their images) through the app's test client, as an
+anonymous visitor on SITEMAP_BASE_URL's host (without it, only the
+taxonomy is loaded: pages cached for another host would never be hit).
+With PAGE_CACHE on, the responses land in the page cache; either way
+templates are compiled and the rows and image BLOBs read once before a
+real visitor asks for them.
+
+Each worker warms itself from a background thread (`Warmer`):
+
+- gunicorn's `post_worker_init` schedules a run when a worker boots;
+- a commit by a logged-in admin schedules one CACHE_WARM_DELAY seconds
+  later in the committing worker, so a burst of edits shares one run.
+  The other workers rebuild each page on its next request, once per page
+  (see `ContentCache.begin`).
+
+Runs issue at most CACHE_WARM_CONCURRENCY requests at a time (default 1),
+so warming only ever takes that many of a worker's threads away from live
+traffic.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_request_context, url_for
+from flask_login import current_user
+from sqlalchemy import select
+
+import skill_taxonomy
+from cache_policy import on_purge
+from extension import db
+from model import BlogPost, Project
+
+
+def warm_urls(limit):
+    """The index pages plus the `limit` latest posts and projects and their images."""
+    # The home page answers on both `/` and `/home`.
+    urls = [rule.rule for rule in current_app.url_map.iter_rules('home')]
+    urls += [url_for('blog'), url_for('portfolio')]
+    connection = db.session.connection()
+    for model, endpoint, model_name in ((BlogPost, 'blog_post', 'blog'), (Project, 'project_detail', 'project')):
+        rows = connection.execute(select(model.id, model.slug, model.image_data.isnot(None))
+                                  .order_by(model.date_posted.desc(), model.id.desc()).limit(limit))
+        for item_id, slug, has_image in rows:
+            urls.append(url_for(endpoint, slug=slug))
+            if has_image:
+                urls.append(url_for('get_image', model_name=model_name, image_id=item_id))
+    return urls
+
+
+def warm(app):
+    """Load reference data and request `warm_urls()` in-process.
+
+    Returns:
+        Dict of {url: status code}; URLs that raised are logged and left out
+    """
+    base_url = (app.config.get('SITEMAP_BASE_URL') or '').rstrip('/')
+    with app.test_request_context(base_url=base_url or None):
+        skill_taxonomy.taxonomy()
+        if not base_url:
+            # Cached pages are keyed by host; pages warmed for another host
+            # would never be served.
+            app.logger.warning('SITEMAP_BASE_URL is not set; warming reference data only, not pages')
+            return {}
+        urls = warm_urls(app.config.get('CACHE_WARM_LIMIT', 10))
+
+    def fetch(url):
+        try:
+            response = app.test_client().get(url, base_url=base_url, buffered=True)
+        except Exception:
+            app.logger.error(f'Failed to warm {url}', exc_info=True)
+            return url, None
+        response.close()
+        return url, response.status_code
+
+    with ThreadPoolExecutor(max_workers=max(app.config.get('CACHE_WARM_CONCURRENCY', 1), 1),
+                            thread_name_prefix='cache-warm-request') as pool:
+        return {url: status for url, status in pool.map(fetch, urls) if status is not None}
+
+
+class Warmer:
+    """Runs `warm(app)` in a background thread of the current worker.
+
+    `schedule(delay)` asks for a run `delay` seconds from now; calls made
+    before it starts push it back and are served by the same run.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._reset()
+
+    def _reset(self):
+        # Also run in a forked worker, which must start its own thread.
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.due = None
+        self.running = False
+        self.thread = None
+
+    def schedule(self, delay=0):
+        with self.condition:
+            if self.pid != os.getpid():
+                self._reset()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='cache-warm', daemon=True)
+                self.thread.start()
+            due = time.monotonic() + delay
+            self.due = due if self.due is None else max(self.due, due)
+            self.condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Wait until scheduled runs are done."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.due is None and not self.running, timeout)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.due is not None)
+                while self.due - time.monotonic() > 0:
+                    self.condition.wait(self.due - time.monotonic())
+                self.due, self.running = None, True
+            start = time.perf_counter()
+            try:
+                statuses = warm(self.app)
+                self.app.logger.info('Warmed %d URLs in %.1f s', len(statuses), time.perf_counter() - start)
+            except Exception:
+                self.app.logger.error('Cache warming failed', exc_info=True)
+            finally:
+                with self.condition:
+                    self.running = False
+                    self.condition.notify_all()
+
+
+def _warm_after_edit(keys):
+    # Only admins log in; visitors' comments and likes don't trigger a run.
+    if has_request_context() and current_user.is_authenticated:
+        current_app.extensions['cache_warmer'].schedule(current_app.config.get('CACHE_WARM_DELAY', 2))
+
+
+def init_warm(app):
+    if not app.config.get('CACHE_WARM'):
+        return
+    app.extensions['cache_warmer'] = Warmer(app)
+    # Registered after the page cache's listener, which drops the old pages.
+    on_purge(app, _warm_after_edit)